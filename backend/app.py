@@ -1,10 +1,11 @@
 import os
+import click
 from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 
 from config import config
-from models import db
+from models import db, ensure_indexes
 
 
 def create_app(env: str = "development") -> Flask:
@@ -34,10 +35,16 @@ def create_app(env: str = "development") -> Flask:
     from routes.items     import items_bp
     from routes.forecast  import forecast_bp
     from routes.dashboard import dashboard_bp
+    from routes.restock   import restock_bp
+    from routes.metrics   import metrics_bp
 
-    for bp in (auth_bp, items_bp, forecast_bp, dashboard_bp):
+    for bp in (auth_bp, items_bp, forecast_bp, dashboard_bp, restock_bp, metrics_bp):
         app.register_blueprint(bp)
 
+    # ── Instrumentation: Server-Timing, /api/metrics, slow-request profiles ──
+    from src.instrumentation import init_instrumentation
+    init_instrumentation(app)
+
     # ── Health check ──────────────────────────────────────────────────────
     @app.route("/api/health")
     def health():
@@ -52,9 +59,61 @@ def create_app(env: str = "development") -> Flask:
     def server_error(e):
         return jsonify({"error": "Internal server error."}), 500
 
+    # ── CLI commands ──────────────────────────────────────────────────────
+    @app.cli.command("retournament")
+    @click.option("--store-id", default=None, help="Only this store (default: all).")
+    @click.option("--seasonal-period", default=config[env].DEFAULT_SEASONAL_PERIOD, type=int)
+    def retournament_cmd(store_id, seasonal_period):
+        """Re-select the champion model of every item (method=auto)."""
+        from src.model_selection import retournament
+        counts = retournament(store_id, seasonal_period)
+        click.echo(
+            f"{counts['selected']}/{counts['items']} champions selected, "
+            f"{counts['changed']} changed, {counts['failed']} failed."
+        )
+
+    @app.cli.command("refit-hw")
+    @click.option("--store-id", default=None, help="Only this store (default: all).")
+    @click.option("--seasonal-period", default=config[env].DEFAULT_SEASONAL_PERIOD, type=int)
+    def refit_hw_cmd(store_id, seasonal_period):
+        """Fully re-optimise every item's stored Holt-Winters fit."""
+        from src.warm_start import refit_all
+        counts = refit_all(store_id, seasonal_period)
+        click.echo(f"{counts['fitted']} fits stored, {counts['failed']} failed.")
+
+    @app.cli.command("materialize")
+    @click.option("--store-id", default=None, help="Only this store (default: all).")
+    @click.option("--method", "methods", multiple=True, default=("holt_winters",),
+                  help="Forecast method to snapshot; repeat for several.")
+    def materialize_cmd(store_id, methods):
+        """Precompute forecast snapshots for every item (run nightly)."""
+        from src.snapshots import materialize
+        counts = materialize(store_id, methods)
+        click.echo(f"{counts['written']} snapshots written, {counts['failed']} failed.")
+
+    @app.cli.command("backfill-parquet")
+    @click.option("--store-id", default=None, help="Only this store (default: all).")
+    def backfill_parquet_cmd(store_id):
+        """Export sales_records to the Parquet store (SALES_STORE=parquet) and read from it."""
+        from src.columnar_store import backfill
+        counts = backfill(store_id)
+        click.echo(f"{counts['rows']} rows exported for {counts['stores']} stores.")
+
+    @app.cli.command("fail-orphaned-jobs")
+    def fail_orphaned_jobs_cmd():
+        """Mark forecast jobs left queued/running by stopped processes as failed."""
+        from src.job_queue import fail_orphaned_jobs
+        click.echo(f"{fail_orphaned_jobs()} orphaned jobs marked failed.")
+
     # ── DB init ───────────────────────────────────────────────────────────
     with app.app_context():
         db.create_all()
+        ensure_indexes()
+        # Serving processes only, not one-off CLI commands (flask materialize, …) run beside them
+        cli = click.get_current_context(silent=True)
+        if app.config.get("JOB_RECOVER_ON_START") and (cli is None or cli.info_name == "run"):
+            from src.job_queue import fail_orphaned_jobs
+            fail_orphaned_jobs()
         os.makedirs(app.config.get("UPLOAD_FOLDER", "uploads"), exist_ok=True)
 
     return app
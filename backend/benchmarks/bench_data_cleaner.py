@@ -0,0 +1,177 @@
+"""
+benchmarks/bench_data_cleaner.py — clean_dataframe vs. the former
+groupby().apply() / per-group reindex implementation.
+
+    cd backend && python -m benchmarks.bench_data_cleaner
+
+Checks that both produce the same frame and report, then times them at
+1k, 10k and 100k SKU-days.
+"""
+import time
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.data_cleaner import clean_dataframe
+
+SCALES = (1_000, 10_000, 100_000)
+DAYS   = 100
+
+
+def make_raw_sales(sku_days: int, days: int = DAYS, seed: int = 0) -> pd.DataFrame:
+    """Raw upload-like frame with ~5% missing days, a few spikes and duplicates."""
+    rng    = np.random.default_rng(seed)
+    n_skus = max(1, sku_days // days)
+    dates  = pd.date_range("2023-01-01", periods=days, freq="D")
+    df = pd.DataFrame({
+        "date":     np.tile(dates.strftime("%Y-%m-%d"), n_skus),
+        "store_id": "store_1",
+        "item_id":  np.repeat([f"item_{i}" for i in range(n_skus)], days),
+        "sales":    rng.poisson(20, n_skus * days).astype(float),
+        "price":    9.99,
+    })
+    spikes = rng.random(len(df)) < 0.002
+    df.loc[spikes, "sales"] *= 50
+    df = df[rng.random(len(df)) > 0.05]
+    return pd.concat([df, df.sample(frac=0.001, random_state=seed)], ignore_index=True)
+
+
+# ── Former implementation, kept verbatim as the reference ────────────────
+
+def legacy_clean_dataframe(df: pd.DataFrame) -> Tuple[pd.DataFrame, dict]:
+    report = {
+        'original_shape':   df.shape,
+        'steps':            [],
+    }
+    df = df.copy()
+
+    df.columns = [c.strip().lower().replace(' ', '_') for c in df.columns]
+    report['steps'].append('Column names standardised (lowercase, underscores)')
+
+    required = {'date', 'item_id', 'sales'}
+    missing_cols = required - set(df.columns)
+    if missing_cols:
+        raise ValueError(f"Missing required columns: {missing_cols}")
+
+    df['date']  = pd.to_datetime(df['date'], errors='coerce')
+    df['sales'] = pd.to_numeric(df['sales'], errors='coerce')
+    report['steps'].append('Types cast: date → datetime, sales → numeric')
+
+    n_null_dates  = df['date'].isna().sum()
+    n_null_sales  = df['sales'].isna().sum()
+    n_null_item   = df['item_id'].isna().sum() if 'item_id' in df.columns else 0
+
+    before = len(df)
+    df = df.dropna(subset=['date', 'item_id'])
+    dropped_key = before - len(df)
+
+    df['sales'] = df['sales'].fillna(0)
+
+    report['steps'].append(
+        f'Nulls: date={n_null_dates}, item_id={n_null_item}, '
+        f'sales={n_null_sales} (sales→0). Dropped {dropped_key} rows with null date/item_id.'
+    )
+
+    key_cols = ['date', 'item_id'] + (['store_id'] if 'store_id' in df.columns else [])
+    n_dupes = df.duplicated(subset=key_cols).sum()
+    if n_dupes > 0:
+        df = df.groupby(key_cols, as_index=False)['sales'].sum()
+        report['steps'].append(f'Duplicates: {n_dupes} merged by summing sales')
+    else:
+        report['steps'].append('Duplicates: none found')
+
+    n_neg = (df['sales'] < 0).sum()
+    df['sales'] = df['sales'].clip(lower=0)
+    report['steps'].append(f'Negative sales clipped to 0: {n_neg} rows')
+
+    total_capped = 0
+    def cap_outliers(group):
+        nonlocal total_capped
+        key = getattr(group, 'name', None)
+        group = group.copy()
+        if 'item_id' not in group.columns and key is not None:
+            group['item_id'] = key
+
+        q1  = group['sales'].quantile(0.25)
+        q3  = group['sales'].quantile(0.75)
+        iqr = q3 - q1
+        upper = q3 + 3.0 * iqr          
+        n = (group['sales'] > upper).sum()
+        total_capped += n
+        group['sales'] = group['sales'].clip(upper=upper)
+        return group
+
+    df = df.groupby('item_id', group_keys=False).apply(cap_outliers)
+    df = df.reset_index()
+    df['sales'] = df['sales'].round(0).astype(int)
+    report['steps'].append(f'Outliers capped at Q3 + 3×IQR per item: {total_capped} values')
+
+    df, filled_rows = _legacy_fill_missing_dates(df)
+    report['steps'].append(f'Missing calendar days filled with 0 sales: {filled_rows} rows added')
+
+    sort_cols = ['item_id', 'date'] + (['store_id'] if 'store_id' in df.columns else [])
+    df = df.sort_values(sort_cols).reset_index(drop=True)
+    report['steps'].append('Sorted by item_id, date')
+
+    report['final_shape'] = df.shape
+    return df, report
+
+
+def _legacy_fill_missing_dates(df: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
+    group_cols = ['item_id']
+    if 'store_id' in df.columns:
+        group_cols = ['store_id'] + group_cols
+
+    full_date_range = pd.date_range(df['date'].min(), df['date'].max(), freq='D')
+    pieces  = []
+    filled  = 0
+
+    for keys, grp in df.groupby(group_cols):
+        grp = grp.set_index('date').reindex(full_date_range)
+        grp.index.name = 'date'
+        grp = grp.reset_index()
+
+        if isinstance(keys, str):
+            keys = (keys,)
+        for col, val in zip(group_cols, keys):
+            if col in grp.columns:
+                grp[col] = grp[col].fillna(val)
+            else:
+                grp[col] = val
+
+        n_before = grp['sales'].isna().sum()
+        grp['sales'] = grp['sales'].fillna(0).astype(int)
+        filled += int(n_before)
+        pieces.append(grp)
+
+    return pd.concat(pieces, ignore_index=True), filled
+
+
+# ─────────────────────────────────────────────────────────────────────────
+
+def _best_of(fn, df, repeat=3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(df)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'SKU-days':>10} {'legacy (s)':>12} {'vectorized (s)':>15} {'speedup':>9}")
+    for scale in SCALES:
+        raw = make_raw_sales(scale)
+        new_df, new_report = clean_dataframe(raw)
+        old_df, old_report = legacy_clean_dataframe(raw)
+        pd.testing.assert_frame_equal(new_df, old_df)
+        assert new_report == old_report, (new_report, old_report)
+
+        old_t = _best_of(legacy_clean_dataframe, raw)
+        new_t = _best_of(clean_dataframe, raw)
+        print(f"{scale:>10,} {old_t:>12.3f} {new_t:>15.3f} {old_t / new_t:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
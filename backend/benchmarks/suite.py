@@ -0,0 +1,272 @@
+"""
+benchmarks/suite.py — Timings for the ingestion and forecasting hot paths.
+
+    cd backend && python -m benchmarks.suite                  # small + medium
+    python -m benchmarks.suite --scales large --cases upsert_records
+    python -m benchmarks.suite --save                         # write baselines
+    python -m benchmarks.suite --check                        # exit 1 on regression
+
+Every case runs in a fresh spawned process on synthetic data
+(benchmarks/synthetic.py). Each process reports three numbers:
+
+  wall_s        best of --repeat timed runs
+  alloc_peak_mb peak Python-level allocation during one extra run under
+                tracemalloc (kept out of the timed runs, which it slows down)
+  peak_rss_mb   the process's high-water resident set size, including setup
+
+The database cases use a throwaway SQLite file. With --check, a case fails
+when its wall time or allocation peak exceeds the saved baseline by more
+than --threshold (default 25%). Differences below MIN_DELTA_S and
+MIN_DELTA_MB are treated as noise. Baselines are machine specific, so record them on the machine
+that runs the check.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+# SKUs × days per scale; forecast cases use one SKU's `days`-long series
+SCALES = {
+    "small":  {"skus": 50,   "days": 180},
+    "medium": {"skus": 300,  "days": 365},
+    "large":  {"skus": 2000, "days": 730},
+}
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+MIN_DELTA_S   = 0.005
+MIN_DELTA_MB  = 0.5
+
+
+# ── Cases: scale → {"run": timed callable, "before": untimed reset} ──────
+
+def _raw(scale):
+    from benchmarks.synthetic import make_sales
+    return make_sales(scale["skus"], scale["days"])
+
+
+def _series(scale):
+    from benchmarks.synthetic import make_sales, item_series
+    return item_series(make_sales(1, scale["days"]))
+
+
+def case_clean_dataframe(scale):
+    from src.data_cleaner import clean_dataframe
+    raw = _raw(scale)
+    return {"run": lambda: clean_dataframe(raw)}
+
+
+def case_fill_missing_dates(scale):
+    import pandas as pd
+    from src.data_cleaner import _fill_missing_dates
+    df = _raw(scale)
+    df["date"] = pd.to_datetime(df["date"])
+    return {"run": lambda: _fill_missing_dates(df)}
+
+
+def _app():
+    """App on a throwaway SQLite file; must run before anything imports config."""
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    from app import create_app
+    app = create_app("development")
+    app.app_context().push()
+    return app
+
+
+def case_upsert_records(scale):
+    app = _app()
+    from models import db
+    from routes.items import _upsert_records
+    from src.data_cleaner import clean_dataframe
+    df, _ = clean_dataframe(_raw(scale))
+
+    def before():
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+
+    return {"run": lambda: _upsert_records(df), "before": before}
+
+
+def case_full_forecast(scale):
+    from src.forecast_service import ForecastService
+    series, service = _series(scale), ForecastService()
+    return {"run": lambda: service.full_forecast(series)}
+
+
+def case_fast_restock_forecast(scale):
+    from src.forecast_service import ForecastService
+    series, service = _series(scale), ForecastService()
+    return {"run": lambda: service.fast_restock_forecast(series)}
+
+
+def case_decompose(scale):
+    from src.forecast_service import ForecastService
+    series, service = _series(scale), ForecastService()
+    return {"run": lambda: service.decompose(series)}
+
+
+def case_dashboard(scale):
+    app = _app()
+    from flask_jwt_extended import create_access_token
+    from routes.items import _upsert_records
+    from src.data_cleaner import clean_dataframe
+    df, _ = clean_dataframe(_raw(scale))
+    _upsert_records(df)
+
+    client  = app.test_client()
+    headers = {"Authorization": f"Bearer {create_access_token(identity='1')}"}
+
+    def run():
+        resp = client.get("/api/dashboard?store_id=store_1", headers=headers)
+        assert resp.status_code == 200, resp.get_data(as_text=True)
+
+    return {"run": run}
+
+
+CASES: Dict[str, Callable[[dict], Dict[str, Callable]]] = {
+    "clean_dataframe":       case_clean_dataframe,
+    "fill_missing_dates":    case_fill_missing_dates,
+    "upsert_records":        case_upsert_records,
+    "full_forecast":         case_full_forecast,
+    "fast_restock_forecast": case_fast_restock_forecast,
+    "decompose":             case_decompose,
+    "dashboard":             case_dashboard,
+}
+
+
+# ── Measurement (runs inside the spawned process) ────────────────────────
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:      # pragma: no cover - Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _measure(case: str, scale: str, repeat: int) -> Dict[str, Any]:
+    import warnings
+    warnings.filterwarnings("ignore")
+
+    fns    = CASES[case](SCALES[scale])
+    run    = fns["run"]
+    before = fns.get("before") or (lambda: None)
+
+    best = float("inf")
+    for _ in range(repeat):
+        before()
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+
+    before()
+    tracemalloc.start()
+    run()
+    _, alloc_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rss = _peak_rss_mb()
+    return {
+        "wall_s":        round(best, 4),
+        "alloc_peak_mb": round(alloc_peak / (1024 * 1024), 2),
+        "peak_rss_mb":   round(rss, 1) if rss is not None else None,
+    }
+
+
+def run_case(case: str, scale: str, repeat: int = 3) -> Dict[str, Any]:
+    """_measure in a fresh spawned process, so setup and RSS don't leak between cases."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+        return pool.submit(_measure, case, scale, repeat).result()
+
+
+# ── Baselines ────────────────────────────────────────────────────────────
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> list:
+    """Messages for every case whose wall time or allocation peak regressed."""
+    failures = []
+    for key, res in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if (res["wall_s"] > base["wall_s"] * (1 + threshold)
+                and res["wall_s"] - base["wall_s"] > MIN_DELTA_S):
+            failures.append(f"{key}: wall {base['wall_s']:.4f}s → {res['wall_s']:.4f}s")
+        if (res["alloc_peak_mb"] > base["alloc_peak_mb"] * (1 + threshold)
+                and res["alloc_peak_mb"] - base["alloc_peak_mb"] > MIN_DELTA_MB):
+            failures.append(f"{key}: alloc peak {base['alloc_peak_mb']:.2f}MB → {res['alloc_peak_mb']:.2f}MB")
+    return failures
+
+
+def _load_baseline(path: str) -> Dict[str, dict]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get("results", {})
+
+
+def _save_baseline(path: str, results: Dict[str, dict]) -> None:
+    merged = {**_load_baseline(path), **results}
+    with open(path, "w") as f:
+        json.dump({
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "machine":    {"platform": platform.platform(), "python": platform.python_version(),
+                           "cpus": os.cpu_count()},
+            "results":    dict(sorted(merged.items())),
+        }, f, indent=2)
+        f.write("\n")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scales", default="small,medium", help=f"comma list of {', '.join(SCALES)}")
+    parser.add_argument("--cases", default=",".join(CASES), help="comma list of case names")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="merge these results into the baseline file")
+    parser.add_argument("--check", action="store_true", help="exit 1 when a case regressed")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    cases  = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = [s for s in scales if s not in SCALES] + [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"unknown scale/case: {', '.join(unknown)}")
+
+    baseline = _load_baseline(args.baseline)
+    results  = {}
+    print(f"{'case':<24} {'scale':<8} {'wall (s)':>10} {'alloc (MB)':>11} {'RSS (MB)':>9} {'vs base':>8}")
+    for scale in scales:
+        for case in cases:
+            key = f"{case}/{scale}"
+            res = results[key] = run_case(case, scale, args.repeat)
+            base = baseline.get(key)
+            delta = f"{res['wall_s'] / base['wall_s']:.2f}x" if base and base["wall_s"] else "-"
+            print(f"{case:<24} {scale:<8} {res['wall_s']:>10.4f} {res['alloc_peak_mb']:>11.2f} "
+                  f"{res['peak_rss_mb'] or 0:>9.1f} {delta:>8}", flush=True)
+
+    if args.save:
+        _save_baseline(args.baseline, results)
+        print(f"Baseline written to {args.baseline}")
+    if args.check:
+        failures = compare(results, baseline, args.threshold)
+        for msg in failures:
+            print(f"REGRESSION {msg}")
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
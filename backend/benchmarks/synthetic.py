@@ -0,0 +1,58 @@
+"""
+benchmarks/synthetic.py — Synthetic sales uploads for the benchmark suite.
+
+make_sales() builds an upload-shaped frame (date, store_id, item_id, sales,
+price, promo) for any number of SKUs × days. Each SKU gets its own level and
+trend, weekly and yearly seasonality, promo days with an uplift, and a
+fraction of rows dropped as gaps. A few rows are spiked so the outlier
+capping has something to do. The same seed always gives the same frame.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+
+def make_sales(n_skus: int, days: int, stores: int = 1, seasonality: float = 0.3,
+               promo_rate: float = 0.05, promo_uplift: float = 0.5,
+               gap_rate: float = 0.05, spike_rate: float = 0.002,
+               start: str = "2023-01-01", seed: int = 0) -> pd.DataFrame:
+    """
+    Raw sales for n_skus items spread over `stores` stores. `seasonality` is
+    the relative amplitude of the weekly and yearly cycles, `promo_rate` the
+    share of promo days and `gap_rate` the share of rows left out.
+    """
+    rng   = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=days, freq="D")
+    t     = np.arange(days)
+
+    level  = rng.uniform(5, 60, n_skus)[:, None]
+    trend  = rng.normal(0, 0.02, n_skus)[:, None] * level / 30
+    phase  = rng.uniform(0, 2 * np.pi, n_skus)[:, None]
+    weekly = np.sin(2 * np.pi * t / 7 + phase)
+    yearly = np.sin(2 * np.pi * t / 365.25 + phase / 2)
+    promo  = rng.random((n_skus, days)) < promo_rate
+
+    mean  = level * (1 + seasonality * (0.7 * weekly + 0.3 * yearly)) + trend * t
+    mean  = np.maximum(mean, 0.1) * np.where(promo, 1 + promo_uplift, 1.0)
+    sales = rng.poisson(mean).astype(float)
+    spike = rng.random(sales.shape) < spike_rate
+    sales[spike] *= 20
+
+    price = np.round(rng.uniform(2, 100, n_skus), 2)[:, None] * np.where(promo, 0.8, 1.0)
+    df = pd.DataFrame({
+        "date":     np.tile(dates.strftime("%Y-%m-%d"), n_skus),
+        "store_id": np.repeat([f"store_{i % stores + 1}" for i in range(n_skus)], days),
+        "item_id":  np.repeat([f"item_{i}" for i in range(n_skus)], days),
+        "sales":    sales.ravel(),
+        "price":    np.round(price, 2).ravel(),
+        "promo":    promo.ravel().astype(int),
+    })
+    return df[rng.random(len(df)) >= gap_rate].reset_index(drop=True)
+
+
+def item_series(df: pd.DataFrame, item_id: str = "item_0") -> pd.Series:
+    """Daily sales series of one item, gaps as zero, as ForecastService builds it."""
+    one = df[df["item_id"] == item_id]
+    s   = pd.Series(one["sales"].to_numpy(), index=pd.DatetimeIndex(pd.to_datetime(one["date"]), name="date"))
+    return s.resample("D").sum().fillna(0).rename("sales")
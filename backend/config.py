@@ -20,6 +20,24 @@ class Config:
     # Upload
     UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), "uploads")
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB
+    INGEST_CHUNK_SIZE = 5000               # rows per INSERT ... ON CONFLICT batch
+    UPLOAD_CHUNK_ROWS = 100_000            # CSV rows per chunk in ?mode=stream uploads
+
+    # GET /api/items/<pk>/history: page sizes (json) and rows per fetch (ndjson/csv streams)
+    HISTORY_PAGE_SIZE     = 500
+    HISTORY_MAX_PAGE_SIZE = 5000
+    HISTORY_STREAM_BATCH  = 1000
+
+    # GET /api/forecast/store/<store_id>/export (src/store_export.py)
+    EXPORT_BATCH_SKUS          = int(os.getenv("EXPORT_BATCH_SKUS", "100"))   # SKUs loaded/forecast per batch
+    EXPORT_PARQUET_COMPRESSION = os.getenv("EXPORT_PARQUET_COMPRESSION", "zstd")
+
+    # Sales history read path: sql | parquet (src/columnar_store.py, needs pyarrow;
+    # a store is read from Parquet once `flask backfill-parquet` has exported it)
+    SALES_STORE                  = os.getenv("SALES_STORE", "sql")
+    SALES_PARQUET_DIR            = os.getenv("SALES_PARQUET_DIR", os.path.join(os.path.dirname(__file__), "data", "sales"))
+    SALES_PARQUET_MAX_PARTS      = int(os.getenv("SALES_PARQUET_MAX_PARTS", "16"))        # compact beyond this
+    SALES_PARQUET_RETIRE_SECONDS = int(os.getenv("SALES_PARQUET_RETIRE_SECONDS", "600"))  # compacted-away files kept this long
 
     # Forecasting defaults
     DEFAULT_HORIZON = 30
@@ -27,8 +45,46 @@ class Config:
     DEFAULT_LEAD_TIME = 7
     DEFAULT_SAFETY_FACTOR = 1.2
     DEFAULT_CURRENT_STOCK = 300
+    DEFAULT_SERVICE_LEVEL = 0.95     # store order plans (src/inventory_plan.py)
     TEST_SPLIT_DAYS = 30
 
+    # Rolling-origin backtests
+    BACKTEST_FOLDS = 8
+    BACKTEST_STEP  = 7      # days between cutoffs
+
+    # method=auto: champions older than this are re-selected on request
+    CHAMPION_MAX_AGE_DAYS = int(os.getenv("CHAMPION_MAX_AGE_DAYS", "7"))
+
+    # Holt-Winters updates from stored fits (src/warm_start.py), which only
+    # `flask refit-hw` writes: warm (seeded optimiser) | propagate (no
+    # optimisation, parameters up to HW_REFIT_MAX_AGE_DAYS old) | full (cold fit)
+    HW_UPDATE_MODE        = os.getenv("HW_UPDATE_MODE", "warm")
+    HW_REFIT_MAX_AGE_DAYS = int(os.getenv("HW_REFIT_MAX_AGE_DAYS", "7"))
+    HW_DRIFT_RATIO        = float(os.getenv("HW_DRIFT_RATIO", "1.5"))   # new-residual RMSE / fit sigma
+
+    # Forecast result cache (entries per process, seconds)
+    FORECAST_CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", "256"))
+    FORECAST_CACHE_TTL  = int(os.getenv("FORECAST_CACHE_TTL",  "600"))
+
+    # Bulk forecasting (0 → one worker per CPU core)
+    FORECAST_WORKERS = int(os.getenv("FORECAST_WORKERS", "0"))
+
+    # Instrumentation (src/instrumentation.py): /api/metrics, Server-Timing headers,
+    # and collapsed-stack profiles of requests slower than PROFILE_SLOW_MS (0 → off)
+    METRICS_ENABLED     = os.getenv("METRICS_ENABLED", "1") == "1"
+    SERVER_TIMING       = os.getenv("SERVER_TIMING",   "1") == "1"
+    PROFILE_SLOW_MS     = int(os.getenv("PROFILE_SLOW_MS",     "0"))
+    PROFILE_INTERVAL_MS = int(os.getenv("PROFILE_INTERVAL_MS", "5"))
+    PROFILE_DIR         = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(__file__), "profiles"))
+
+    # Background forecast jobs
+    JOB_WORKERS    = int(os.getenv("JOB_WORKERS",    "2"))
+    JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "32"))   # pending jobs before 503
+    JOB_MAX_SKUS   = int(os.getenv("JOB_MAX_SKUS",   "10000"))
+    # Fail jobs left queued/running by a previous process when the server starts. Turn off
+    # when several web processes share the database; run `flask fail-orphaned-jobs` on deploy instead
+    JOB_RECOVER_ON_START = os.getenv("JOB_RECOVER_ON_START", "1") == "1"
+
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -0,0 +1,31 @@
+import pytest
+from flask_jwt_extended import create_access_token
+
+from config import Config
+
+
+@pytest.fixture()
+def app(tmp_path, monkeypatch):
+    """The app on an empty SQLite database of its own."""
+    monkeypatch.setattr(Config, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(Config, "UPLOAD_FOLDER", str(tmp_path / "uploads"))
+    from app import create_app
+    from src.forecast_cache import forecast_cache
+    from src.decomposition import decomposition_cache
+
+    # Per-process caches are keyed by item pk, which every test database reuses
+    forecast_cache.clear()
+    decomposition_cache.clear()
+    app = create_app("development")
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture()
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture()
+def auth(app):
+    return {"Authorization": f"Bearer {create_access_token(identity='1')}"}
@@ -1,5 +1,8 @@
+import json
+import logging
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect as sa_inspect
 
 db = SQLAlchemy()
 
@@ -37,6 +40,16 @@ class Item(db.Model):
 
     sales = db.relationship("SalesRecord", backref="item", lazy="dynamic",
                             cascade="all, delete-orphan")
+    summary = db.relationship("ItemSalesSummary", uselist=False,
+                              cascade="all, delete-orphan")
+    backtests = db.relationship("BacktestResult", lazy="dynamic",
+                                cascade="all, delete-orphan")
+    champions = db.relationship("ChampionModel", lazy="dynamic",
+                                cascade="all, delete-orphan")
+    hw_states = db.relationship("HoltWintersState", lazy="dynamic",
+                                cascade="all, delete-orphan")
+    snapshots = db.relationship("ForecastSnapshot", lazy="dynamic",
+                                cascade="all, delete-orphan")
 
     def to_dict(self):
         return {
@@ -61,6 +74,13 @@ class SalesRecord(db.Model):
     weekday  = db.Column(db.Integer, nullable=True)
     month    = db.Column(db.Integer, nullable=True)
 
+    # (item_pk, date): conflict target for the bulk upsert and the per-item
+    # history scan; (date): store-wide trend queries.
+    __table_args__ = (
+        db.Index("ux_sales_item_date", "item_pk", "date", unique=True),
+        db.Index("ix_sales_date", "date"),
+    )
+
     def to_dict(self):
         return {
             "id":      self.id,
@@ -71,3 +91,266 @@ class SalesRecord(db.Model):
             "weekday": self.weekday,
             "month":   self.month,
         }
+
+
+class ItemSalesSummary(db.Model):
+    """Per-item aggregates maintained by src/rollups.py on every upload."""
+    __tablename__ = "item_sales_summaries"
+
+    item_pk        = db.Column(db.Integer, db.ForeignKey("items.id"), primary_key=True)
+    total_sales    = db.Column(db.Float, nullable=False, default=0)
+    record_count   = db.Column(db.Integer, nullable=False, default=0)
+    first_date     = db.Column(db.Date, nullable=True)
+    last_date      = db.Column(db.Date, nullable=True)
+    last_90d_sales = db.Column(db.Float, nullable=False, default=0)   # 90 days ending at last_date
+    updated_at     = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "total_sales":    round(float(self.total_sales or 0), 2),
+            "record_count":   self.record_count or 0,
+            "first_date":     self.first_date.isoformat() if self.first_date else None,
+            "last_date":      self.last_date.isoformat() if self.last_date else None,
+            "last_90d_sales": round(float(self.last_90d_sales or 0), 2),
+        }
+
+
+class DailyStoreSales(db.Model):
+    """Per-store daily totals maintained by src/rollups.py (dashboard trend and totals)."""
+    __tablename__ = "daily_store_sales"
+
+    store_id    = db.Column(db.String(100), primary_key=True)
+    date        = db.Column(db.Date, primary_key=True)
+    total_sales = db.Column(db.Float, nullable=False, default=0)
+    sku_count   = db.Column(db.Integer, nullable=False, default=0)   # items with a record that day
+    updated_at  = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class StoreRollupState(db.Model):
+    """Stores whose daily_store_sales rows cover their whole history (src/rollups.py)."""
+    __tablename__ = "store_rollup_states"
+
+    store_id          = db.Column(db.String(100), primary_key=True)
+    daily_complete_at = db.Column(db.DateTime, default=datetime.utcnow)   # full backfill done
+
+
+class BacktestResult(db.Model):
+    """One (method, cutoff) fold of a rolling-origin backtest run (src/backtest.py)."""
+    __tablename__ = "backtest_results"
+
+    id              = db.Column(db.Integer, primary_key=True)
+    item_pk         = db.Column(db.Integer, db.ForeignKey("items.id"), nullable=False)
+    method          = db.Column(db.String(30), nullable=False)
+    cutoff          = db.Column(db.Date, nullable=False)      # last training day
+    horizon         = db.Column(db.Integer, nullable=False)
+    seasonal_period = db.Column(db.Integer, nullable=False)
+    n_folds         = db.Column(db.Integer, nullable=False)
+    step            = db.Column(db.Integer, nullable=False)
+    refit           = db.Column(db.Boolean, nullable=False, default=False)
+    series_hash     = db.Column(db.String(40), nullable=False)  # series_fingerprint at run time
+    mae             = db.Column(db.Float, nullable=False)
+    rmse            = db.Column(db.Float, nullable=False)
+    mape            = db.Column(db.Float, nullable=False)
+    created_at      = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ix_backtest_item_params", "item_pk", "horizon", "seasonal_period"),
+    )
+
+    def to_dict(self):
+        return {
+            "method": self.method,
+            "cutoff": self.cutoff.isoformat(),
+            "MAE":    self.mae,
+            "RMSE":   self.rmse,
+            "MAPE%":  self.mape,
+        }
+
+
+class ChampionModel(db.Model):
+    """Per-item winner of the backtest tournament (src/model_selection.py)."""
+    __tablename__ = "champion_models"
+
+    id              = db.Column(db.Integer, primary_key=True)
+    item_pk         = db.Column(db.Integer, db.ForeignKey("items.id"), nullable=False)
+    seasonal_period = db.Column(db.Integer, nullable=False)
+    method          = db.Column(db.String(30), nullable=False)
+    params          = db.Column(db.Text, nullable=False)    # JSON: hw_state dict, or {"window": n} for MA
+    metrics         = db.Column(db.Text, nullable=False)    # JSON: backtest summary, all methods
+    series_hash     = db.Column(db.String(40), nullable=False)
+    selected_at     = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ux_champion_item_sp", "item_pk", "seasonal_period", unique=True),
+    )
+
+    def to_dict(self):
+        return {
+            "method":      self.method,
+            "params":      json.loads(self.params),
+            "metrics":     json.loads(self.metrics),
+            "selected_at": self.selected_at.isoformat() if self.selected_at else None,
+        }
+
+
+class HoltWintersState(db.Model):
+    """Last optimised Holt-Winters fit per (item, seasonal_period); src/warm_start.py."""
+    __tablename__ = "hw_states"
+
+    id              = db.Column(db.Integer, primary_key=True)
+    item_pk         = db.Column(db.Integer, db.ForeignKey("items.id"), nullable=False)
+    seasonal_period = db.Column(db.Integer, nullable=False)
+    state           = db.Column(db.Text, nullable=False)     # JSON: pre-sample hw_state dict
+    series_start    = db.Column(db.Date, nullable=False)     # first day the state was fitted from
+    fit_nobs        = db.Column(db.Integer, nullable=False)  # observations seen by the optimiser
+    fit_sigma       = db.Column(db.Float, nullable=False)    # in-sample residual std at fit time
+    fit_mode        = db.Column(db.String(10), nullable=False, default="full")   # full | warm
+    fitted_at       = db.Column(db.DateTime, default=datetime.utcnow)   # last full re-optimisation
+    updated_at      = db.Column(db.DateTime, default=datetime.utcnow)   # last full or warm fit
+
+    __table_args__ = (
+        db.Index("ux_hw_state_item_sp", "item_pk", "seasonal_period", unique=True),
+    )
+
+
+class ForecastSnapshot(db.Model):
+    """Precomputed full_forecast output, written by `flask materialize` (src/snapshots.py)."""
+    __tablename__ = "forecast_snapshots"
+
+    id              = db.Column(db.Integer, primary_key=True)
+    item_pk         = db.Column(db.Integer, db.ForeignKey("items.id"), nullable=False)
+    method          = db.Column(db.String(30), nullable=False)
+    horizon         = db.Column(db.Integer, nullable=False)
+    seasonal_period = db.Column(db.Integer, nullable=False)
+    current_stock   = db.Column(db.Integer, nullable=False)
+    lead_time       = db.Column(db.Integer, nullable=False)
+    data_through    = db.Column(db.Date, nullable=False)        # last sales day in the input
+    payload         = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed JSON result
+    created_at      = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ux_snapshot_item_params", "item_pk", "method", "horizon", "seasonal_period",
+                 unique=True),
+    )
+
+
+class ForecastJob(db.Model):
+    __tablename__ = "forecast_jobs"
+
+    id          = db.Column(db.String(32), primary_key=True)
+    status      = db.Column(db.String(20), nullable=False, default="queued")
+    store_id    = db.Column(db.String(100), nullable=False)
+    params      = db.Column(db.Text, nullable=False)          # JSON
+    total       = db.Column(db.Integer, default=0)
+    completed   = db.Column(db.Integer, default=0)
+    failed      = db.Column(db.Integer, default=0)
+    error       = db.Column(db.Text, nullable=True)
+    created_at  = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at  = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    results = db.relationship("ForecastJobResult", backref="job", lazy="dynamic",
+                              cascade="all, delete-orphan")
+
+    def to_dict(self):
+        done = (self.completed or 0) + (self.failed or 0)
+        return {
+            "id":          self.id,
+            "status":      self.status,
+            "store_id":    self.store_id,
+            "params":      json.loads(self.params),
+            "total":       self.total,
+            "completed":   self.completed,
+            "failed":      self.failed,
+            "progress":    round(done / self.total, 4) if self.total else 0.0,
+            "error":       self.error,
+            "created_at":  self.created_at.isoformat(),
+            "started_at":  self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class ForecastJobResult(db.Model):
+    __tablename__ = "forecast_job_results"
+
+    id         = db.Column(db.Integer, primary_key=True)
+    job_id     = db.Column(db.String(32), db.ForeignKey("forecast_jobs.id"), nullable=False, index=True)
+    item_pk    = db.Column(db.Integer, nullable=True)
+    sku        = db.Column(db.String(100), nullable=False)
+    result     = db.Column(db.Text, nullable=True)             # JSON full_forecast payload
+    error      = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "sku":     self.sku,
+            "item_pk": self.item_pk,
+            "result":  json.loads(self.result) if self.result else None,
+            "error":   self.error,
+        }
+
+
+def upsert_stmt(table, index_elements: list, update_cols: list):
+    """
+    INSERT ... ON CONFLICT (index_elements) DO UPDATE for the bound dialect;
+    DO NOTHING when update_cols is empty.
+    """
+    if db.engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    stmt = insert(table)
+    if not update_cols:
+        return stmt.on_conflict_do_nothing(index_elements=index_elements)
+    return stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={c: stmt.excluded[c] for c in update_cols},
+    )
+
+
+def dedupe_sales_records() -> int:
+    """
+    Collapse duplicate (item_pk, date) rows, which the old per-row ingest
+    could write, to the most recent one (highest id), matching what a
+    re-upload does today. Returns the number of rows deleted. Caller commits.
+    """
+    dupes = (
+        db.session.query(SalesRecord.item_pk, SalesRecord.date, db.func.max(SalesRecord.id).label("keep"))
+        .group_by(SalesRecord.item_pk, SalesRecord.date)
+        .having(db.func.count(SalesRecord.id) > 1)
+        .subquery()
+    )
+    doomed = (
+        db.select(SalesRecord.id)
+        .join(dupes, (SalesRecord.item_pk == dupes.c.item_pk) & (SalesRecord.date == dupes.c.date))
+        .where(SalesRecord.id != dupes.c.keep)
+    )
+    ids = [i for (i,) in db.session.execute(doomed)]
+    for start in range(0, len(ids), 500):
+        db.session.execute(db.delete(SalesRecord).where(SalesRecord.id.in_(ids[start:start + 500])))
+    return len(ids)
+
+
+def ensure_indexes():
+    """
+    create_all() skips tables that already exist, so indexes added to an
+    existing model have to be created explicitly on older databases. The
+    unique (item_pk, date) index needs legacy duplicates removed first.
+    """
+    existing = {
+        table.name: {ix["name"] for ix in sa_inspect(db.engine).get_indexes(table.name)}
+        for table in db.metadata.sorted_tables
+    }
+    if "ux_sales_item_date" not in existing["sales_records"]:
+        removed = dedupe_sales_records()
+        db.session.commit()
+        if removed:
+            logging.getLogger(__name__).warning(
+                "Removed %d duplicate (item_pk, date) sales records before creating ux_sales_item_date.",
+                removed,
+            )
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in existing[table.name]:
+                index.create(bind=db.engine)
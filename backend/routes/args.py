@@ -0,0 +1,18 @@
+"""
+routes/args.py — Query-string parsing shared by the blueprints
+"""
+from datetime import date
+from typing import Optional
+
+from flask import request
+
+
+def date_arg(name: str) -> Optional[date]:
+    """?<name>=YYYY-MM-DD as a date; None when absent. ValueError when malformed."""
+    raw = request.args.get(name)
+    if not raw:
+        return None
+    try:
+        return date.fromisoformat(raw)
+    except ValueError:
+        raise ValueError(f"'{name}' must be a date (YYYY-MM-DD), got '{raw}'.")
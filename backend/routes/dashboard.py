@@ -3,8 +3,9 @@ routes/dashboard.py — Dashboard summary stats
 """
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from models import db, Item, SalesRecord
+from models import db, Item, DailyStoreSales
 import sqlalchemy as sa
+from src.rollups import ensure_item_summaries, ensure_daily_store_sales
 
 dashboard_bp = Blueprint("dashboard", __name__, url_prefix="/api/dashboard")
 
@@ -26,47 +27,46 @@ def get_dashboard():
             "trend_chart":   [],
         }), 200
 
-    # Aggregate stats
-    total_sales = db.session.query(
-        sa.func.sum(SalesRecord.sales)
-    ).filter(SalesRecord.item_pk.in_(item_pks)).scalar() or 0
-
-    total_records = db.session.query(
-        sa.func.count(SalesRecord.id)
-    ).filter(SalesRecord.item_pk.in_(item_pks)).scalar() or 1
-
+    # Totals and trend from the maintained daily store rollup (no fact-table scan)
+    ensure_daily_store_sales(store_id)
+    total_sales, total_records = (
+        db.session.query(
+            sa.func.coalesce(sa.func.sum(DailyStoreSales.total_sales), 0),
+            sa.func.coalesce(sa.func.sum(DailyStoreSales.sku_count), 0),
+        )
+        .filter(DailyStoreSales.store_id == store_id)
+        .one()
+    )
     avg_demand = total_sales / total_records if total_records else 0
 
     low_stock = sum(1 for i in items if (i.current_stock or 0) < 100)
 
     # Daily trend (last 90 days) across all items
-    from sqlalchemy import func
     trend_rows = (
-        db.session.query(SalesRecord.date, func.sum(SalesRecord.sales).label("total"))
-        .filter(SalesRecord.item_pk.in_(item_pks))
-        .group_by(SalesRecord.date)
-        .order_by(SalesRecord.date.desc())
+        DailyStoreSales.query
+        .filter(DailyStoreSales.store_id == store_id)
+        .order_by(DailyStoreSales.date.desc())
         .limit(90)
         .all()
     )
     trend_chart = [
-        {"date": r.date.isoformat(), "value": round(float(r.total), 2)}
+        {"date": r.date.isoformat(), "value": round(float(r.total_sales), 2)}
         for r in reversed(trend_rows)
     ]
 
+    summaries = ensure_item_summaries(item_pks)
+
     # Per-SKU mini stats
-    sku_stats = []
-    for item in items:
-        total = db.session.query(
-            sa.func.sum(SalesRecord.sales)
-        ).filter_by(item_pk=item.id).scalar() or 0
-        sku_stats.append({
+    sku_stats = [
+        {
             "item_id":       item.item_id,
             "store_id":      item.store_id,
             "item_pk":       item.id,
             "current_stock": item.current_stock,
-            "total_sales":   round(float(total), 2),
-        })
+            "total_sales":   round(float(summaries[item.id].total_sales or 0), 2),
+        }
+        for item in items
+    ]
 
     return jsonify({
         "total_skus":    len(items),
@@ -1,51 +1,171 @@
-from flask import Blueprint, request, jsonify, Response
+import queue
+import numpy as np
+from flask import Blueprint, request, jsonify, Response, current_app, stream_with_context
 from flask_jwt_extended import jwt_required
-from models import db, Item, SalesRecord
-from src.forecast_service import ForecastService
+from models import db, Item, SalesRecord, ForecastJob, ForecastJobResult
+from src.forecast_service import (METHODS, ForecastService, to_compact, parse_include, select_components,
+                                  needs_full_hw)
+from src import columnar_store
+from src.forecast_cache import forecast_cache, series_fingerprint
+from src.job_queue import get_job_queue
+from src.backtest_store import run_or_load_backtest
+from src.model_selection import auto_forecast
+from src.warm_start import holt_winters_update
+from src.snapshots import load_snapshot
+from src.intervals import parse_levels
+from src.instrumentation import stage
+from src.fast_json import json_response, parse_fields, project
+from src.decomposition import summary_stamp, current_state, store_state, render
+from src.downsample import downsample_rows, parse_max_points
+from src.store_export import FORMATS as EXPORT_FORMATS, iter_store_forecasts, csv_chunks, parquet_chunks
+from routes.args import date_arg
 from config import Config
 
 forecast_bp = Blueprint("forecast", __name__, url_prefix="/api/forecast")
 
+# Methods a job or store export accepts; auto uses each SKU's champion (src/model_selection.py)
+JOB_METHODS = METHODS + ("auto",)
 
-def _get_item_and_series(sku: str):
+
+def _get_item(sku: str):
+    store_id = request.args.get("store_id", "store_1")
+    return Item.query.filter_by(item_id=sku, store_id=store_id).first()
+
+
+def _get_item_and_series(sku: str, item=None):
     """Resolve SKU → (Item, pd.Series). Returns 404 dict on failure."""
     store_id = request.args.get("store_id", "store_1")
-    item     = Item.query.filter_by(item_id=sku, store_id=store_id).first()
+    item     = item or _get_item(sku)
     if not item:
         return None, None, f"Item '{sku}' not found for store '{store_id}'."
 
-    records = item.sales.order_by(SalesRecord.date).all()
-    if not records:
+    with stage("load_series"):
+        if columnar_store.serves(item.store_id):
+            dates, sales = columnar_store.item_history(item.store_id, item.item_id)
+        else:
+            # Columnar read: (date, sales) tuples off the (item_pk, date) index, no ORM objects
+            rows = (
+                db.session.query(SalesRecord.date, SalesRecord.sales)
+                .filter(SalesRecord.item_pk == item.id)
+                .order_by(SalesRecord.date)
+                .all()
+            )
+            dates, sales = zip(*rows) if rows else ((), ())
+    if len(dates) == 0:
         return item, None, f"No sales records for '{sku}'."
 
     sp      = request.args.get("seasonal_period", Config.DEFAULT_SEASONAL_PERIOD, type=int)
     service = ForecastService(seasonal_period=sp)
-    series  = service.build_series(records)
+    with stage("build_series"):
+        series = service.build_series_from_arrays(
+            np.array(dates, dtype="datetime64[D]"), np.array(sales, dtype=float)
+        )
     return item, series, None
 
 
+def _forecast_params(item) -> dict:
+    stock = Config.DEFAULT_CURRENT_STOCK if item.current_stock is None else item.current_stock
+    return {
+        "horizon":       request.args.get("horizon",       Config.DEFAULT_HORIZON, type=int),
+        "method":        request.args.get("method",        "holt_winters"),
+        "current_stock": request.args.get("current_stock", stock, type=int),
+        "lead_time":     request.args.get("lead_time",     item.lead_time     or Config.DEFAULT_LEAD_TIME,     type=int),
+        # Optional: order from the demand distribution / add forecast quantiles (src/intervals.py)
+        "service_level": request.args.get("service_level", type=float),
+        "quantiles":     parse_levels(request.args.get("quantiles")),
+        # format=compact: series as {start, freq, values} (src/fast_json.py encodes the arrays)
+        "compact":       request.args.get("format") == "compact",
+        # include=forecast,restock: compute only these components (COMPONENTS in src/forecast_service.py)
+        "include":       parse_include(request.args.get("include")),
+        # max_points=500: LTTB-downsample the history (src/downsample.py)
+        "max_points":    parse_max_points(request.args.get("max_points")),
+    }
+
+
+def _stored_snapshot(item, params: dict):
+    """Nightly snapshot for these parameters, if current; skipped with snapshot=0 or an explicit update mode."""
+    if item is None or request.args.get("snapshot", "1") == "0" or "update" in request.args:
+        return None
+    if params["service_level"] is not None or params["quantiles"]:
+        return None
+    sp = request.args.get("seasonal_period", Config.DEFAULT_SEASONAL_PERIOD, type=int)
+    return load_snapshot(item, params["method"], params["horizon"], sp,
+                         params["current_stock"], params["lead_time"])
+
+
+def _cached_full_forecast(item, series, params: dict):
+    """full_forecast through the result cache. Returns (result, cache_hit)."""
+    sp     = request.args.get("seasonal_period", Config.DEFAULT_SEASONAL_PERIOD, type=int)
+    update = request.args.get("update", Config.HW_UPDATE_MODE)
+    key    = (
+        item.id, series_fingerprint(series), params["horizon"], sp,
+        params["method"], params["lead_time"], params["current_stock"], update,
+        params["service_level"], tuple(params["quantiles"] or ()), params["compact"],
+        tuple(sorted(params["include"] or ())), params["max_points"],
+    )
+    result = forecast_cache.get(key)
+    if result is not None:
+        return dict(result), True
+
+    with stage("forecast"):
+        if params["method"] == "auto":
+            result = auto_forecast(item, series, sp, horizon=params["horizon"],
+                                   current_stock=params["current_stock"], lead_time=params["lead_time"],
+                                   update=request.args.get("update"), service_level=params["service_level"],
+                                   quantiles=params["quantiles"], compact=params["compact"],
+                                   include=params["include"], max_points=params["max_points"])
+        else:
+            # Full-series Holt-Winters from the stored fit, only if a requested
+            # component uses it; the holdout fits stay cold
+            hw_full = None
+            if needs_full_hw(params["method"], params["include"]):
+                hw_full = holt_winters_update(item.id, series, sp, params["horizon"], update)
+            service = ForecastService(seasonal_period=sp)
+            result  = service.full_forecast(series, hw_full=hw_full, **params)
+            if hw_full is not None:
+                result["hw_update"] = hw_full["update"]
+    forecast_cache.set(key, result)
+    return dict(result), False
+
+
 @forecast_bp.route("/<sku>", methods=["GET"])
 @jwt_required()
 def get_forecast(sku):
-    item, series, error = _get_item_and_series(sku)
+    item = _get_item(sku)
+    try:
+        params = _forecast_params(item) if item else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 422
+
+    # fields=forecast,restock: only these top-level keys in the response
+    fields   = parse_fields(request.args.get("fields"))
+    snapshot = _stored_snapshot(item, params) if item else None
+    if snapshot is not None:
+        snapshot = select_components(snapshot, params["include"])
+        if "historical" in snapshot:
+            snapshot["historical"] = downsample_rows(snapshot["historical"], params["max_points"])
+        if params["compact"]:
+            snapshot = to_compact(snapshot)
+        snapshot["sku"]      = sku
+        snapshot["store_id"] = item.store_id
+        with stage("serialize"):
+            resp = json_response(project(snapshot, fields, keep=("sku", "store_id")))
+        resp.headers["X-Forecast-Snapshot"] = "hit"
+        return resp
+
+    item, series, error = _get_item_and_series(sku, item)
     if error:
         return jsonify({"error": error}), 404
 
-    horizon       = request.args.get("horizon",        Config.DEFAULT_HORIZON,         type=int)
-    method        = request.args.get("method",         "holt_winters")
-    current_stock = request.args.get("current_stock",  item.current_stock or Config.DEFAULT_CURRENT_STOCK, type=int)
-    lead_time     = request.args.get("lead_time",      item.lead_time     or Config.DEFAULT_LEAD_TIME,     type=int)
-    sp            = request.args.get("seasonal_period", Config.DEFAULT_SEASONAL_PERIOD, type=int)
-
     try:
-        service = ForecastService(seasonal_period=sp)
-        result  = service.full_forecast(
-            series, horizon=horizon, current_stock=current_stock,
-            lead_time=lead_time, method=method
-        )
+        result, hit = _cached_full_forecast(item, series, params)
         result["sku"]      = sku
         result["store_id"] = request.args.get("store_id", "store_1")
-        return jsonify(result), 200
+        with stage("serialize"):
+            resp = json_response(project(result, fields, keep=("sku", "store_id")))
+        resp.headers["X-Forecast-Cache"]    = "hit" if hit else "miss"
+        resp.headers["X-Forecast-Snapshot"] = "miss"
+        return resp
     except ValueError as e:
         return jsonify({"error": str(e)}), 422
     except Exception as e:
@@ -55,35 +175,61 @@ def get_forecast(sku):
 @forecast_bp.route("/decompose/<sku>", methods=["GET"])
 @jwt_required()
 def get_decomposition(sku):
-    _, series, error = _get_item_and_series(sku)
-    if error:
-        return jsonify({"error": error}), 404
+    item = _get_item(sku)
+    if not item:
+        store_id = request.args.get("store_id", "store_1")
+        return jsonify({"error": f"Item '{sku}' not found for store '{store_id}'."}), 404
 
-    sp      = request.args.get("seasonal_period", Config.DEFAULT_SEASONAL_PERIOD, type=int)
-    service = ForecastService(seasonal_period=sp)
+    # Cached per (item, seasonal_period) and extended with new days (src/decomposition.py)
+    sp     = request.args.get("seasonal_period", Config.DEFAULT_SEASONAL_PERIOD, type=int)
+    stamp  = summary_stamp(item)
     try:
-        result          = service.decompose(series)
-        result["sku"]   = sku
-        return jsonify(result), 200
+        start = date_arg("from")
+        end   = date_arg("to")
+        state, status = current_state(item, sp, stamp)
+        if state is None:
+            item, series, error = _get_item_and_series(sku, item)
+            if error:
+                return jsonify({"error": error}), 404
+            with stage("decompose"):
+                state = store_state(item, sp, series, stamp)
+        with stage("serialize"):
+            result = render(state, start, end, request.args.get("freq", "D"),
+                            parse_max_points(request.args.get("max_points")))
     except ValueError as e:
         return jsonify({"error": str(e)}), 422
 
+    result["sku"] = sku
+    resp = json_response(result)
+    resp.headers["X-Decomposition-Cache"] = status
+    return resp
+
 
 @forecast_bp.route("/<sku>/export", methods=["GET"])
 @jwt_required()
 def export_forecast(sku):
-    item, series, error = _get_item_and_series(sku)
-    if error:
-        return jsonify({"error": error}), 404
-
-    horizon = request.args.get("horizon", Config.DEFAULT_HORIZON, type=int)
     sp      = request.args.get("seasonal_period", Config.DEFAULT_SEASONAL_PERIOD, type=int)
     service = ForecastService(seasonal_period=sp)
+    item    = _get_item(sku)
+    try:
+        params = _forecast_params(item) if item else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 422
+    if params:
+        # The CSV always has the forecast and both bands
+        params["include"] = None
+    result  = _stored_snapshot(item, params) if item else None
+
+    if result is None:
+        item, series, error = _get_item_and_series(sku, item)
+        if error:
+            return jsonify({"error": error}), 404
 
     try:
-        result  = service.full_forecast(series, horizon=horizon,
-                                        current_stock=item.current_stock or Config.DEFAULT_CURRENT_STOCK)
-        csv_str = service.export_csv(result)
+        # Same parameters as GET /<sku>, so an export right after viewing is a cache hit
+        if result is None:
+            result, _ = _cached_full_forecast(item, series, params)
+        csv_str   = service.export_csv(result)
         return Response(
             csv_str,
             mimetype="text/csv",
@@ -91,3 +237,114 @@ def export_forecast(sku):
         )
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+@forecast_bp.route("/store/<store_id>/export", methods=["GET"])
+@jwt_required()
+def export_store_forecasts(store_id):
+    """Every SKU of the store in one CSV or Parquet file, streamed as forecasts finish."""
+    fmt    = request.args.get("format", "csv")
+    method = request.args.get("method", "holt_winters")
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unknown format '{fmt}'; expected {' or '.join(EXPORT_FORMATS)}."}), 422
+    if method not in JOB_METHODS:
+        return jsonify({"error": f"method must be one of {', '.join(JOB_METHODS)}, got '{method}'."}), 422
+    if Item.query.filter_by(store_id=store_id).first() is None:
+        return jsonify({"error": f"No items for store '{store_id}'."}), 404
+
+    skus = iter_store_forecasts(
+        store_id,
+        horizon=request.args.get("horizon", Config.DEFAULT_HORIZON, type=int),
+        seasonal_period=request.args.get("seasonal_period", Config.DEFAULT_SEASONAL_PERIOD, type=int),
+        method=method,
+    )
+    try:
+        chunks = csv_chunks(skus) if fmt == "csv" else parquet_chunks(skus)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 501
+    return Response(
+        stream_with_context(chunks),
+        mimetype="text/csv" if fmt == "csv" else "application/vnd.apache.parquet",
+        headers={"Content-Disposition": f'attachment; filename="forecast_{store_id}.{fmt}"'},
+    )
+
+
+@forecast_bp.route("/jobs", methods=["POST"])
+@jwt_required()
+def create_forecast_job():
+    data = request.get_json(silent=True) or {}
+    skus = data.get("skus") or ([data["sku"]] if data.get("sku") else [])
+    if not isinstance(skus, list) or not skus:
+        return jsonify({"error": "Provide 'sku' or a non-empty 'skus' list."}), 400
+    if len(skus) > Config.JOB_MAX_SKUS:
+        return jsonify({"error": f"Too many SKUs: max {Config.JOB_MAX_SKUS} per job."}), 400
+
+    include = data.get("include") or ""
+    try:
+        params = {
+            "horizon":         int(data.get("horizon", Config.DEFAULT_HORIZON)),
+            "seasonal_period": int(data.get("seasonal_period", Config.DEFAULT_SEASONAL_PERIOD)),
+            "method":          data.get("method", "holt_winters"),
+            # None → per-item current_stock / lead_time
+            "current_stock":   int(data["current_stock"]) if "current_stock" in data else None,
+            "lead_time":       int(data["lead_time"])     if "lead_time"     in data else None,
+            "safety_factor":   float(data.get("safety_factor", Config.DEFAULT_SAFETY_FACTOR)),
+            "service_level":   float(data["service_level"]) if "service_level" in data else None,
+            "include":         parse_include(include if isinstance(include, str) else ",".join(include)),
+            "max_points":      parse_max_points(data.get("max_points")),
+        }
+        if params["method"] not in JOB_METHODS:
+            raise ValueError(f"method must be one of {', '.join(JOB_METHODS)}, got '{params['method']}'.")
+        if params["service_level"] is not None and not 0 < params["service_level"] < 1:
+            raise ValueError("service_level must lie strictly between 0 and 1.")
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+
+    store_id = data.get("store_id", "store_1")
+    skus     = list(dict.fromkeys(str(s) for s in skus))
+    try:
+        job = get_job_queue(current_app._get_current_object()).create_job(store_id, skus, params)
+    except queue.Full:
+        resp = jsonify({"error": "Forecast job queue is full. Retry later."})
+        resp.headers["Retry-After"] = "30"
+        return resp, 503
+
+    return jsonify({"job": job.to_dict()}), 202
+
+
+@forecast_bp.route("/jobs/<job_id>", methods=["GET"])
+@jwt_required()
+def get_forecast_job(job_id):
+    job = db.session.get(ForecastJob, job_id)
+    if job is None:
+        return jsonify({"error": f"Job '{job_id}' not found."}), 404
+
+    include_results = request.args.get("results", "1") != "0"
+    payload = {"job": job.to_dict()}
+    if include_results:
+        payload["results"] = [r.to_dict() for r in job.results.order_by(ForecastJobResult.id)]
+    return jsonify(payload), 200
+
+
+@forecast_bp.route("/<sku>/backtest", methods=["GET"])
+@jwt_required()
+def get_backtest(sku):
+    item, series, error = _get_item_and_series(sku)
+    if error:
+        return jsonify({"error": error}), 404
+
+    horizon   = request.args.get("horizon",         Config.DEFAULT_HORIZON,         type=int)
+    sp        = request.args.get("seasonal_period", Config.DEFAULT_SEASONAL_PERIOD, type=int)
+    n_folds   = request.args.get("folds",           Config.BACKTEST_FOLDS,          type=int)
+    step      = request.args.get("step",            Config.BACKTEST_STEP,           type=int)
+    refit     = request.args.get("refit",     "0") == "1"
+    recompute = request.args.get("recompute", "0") == "1"
+
+    try:
+        result = run_or_load_backtest(item, series, horizon, sp, n_folds, step, refit, recompute)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 422
+
+    result.update({"sku": sku, "store_id": item.store_id, "horizon": horizon,
+                   "seasonal_period": sp, "refit": refit})
+    return jsonify(result), 200
@@ -1,9 +1,22 @@
 import io
+import csv
+import json
+import time
+import numpy as np
 import pandas as pd
-from flask import Blueprint, request, jsonify
+import sqlalchemy as sa
+from flask import Blueprint, request, jsonify, current_app, g, Response, stream_with_context
 from flask_jwt_extended import jwt_required
-from models import db, Item, SalesRecord
-from src.data_cleaner import clean_dataframe
+from models import db, Item, SalesRecord, upsert_stmt
+from src.data_cleaner import clean_dataframe, StreamingCleaner
+from src.forecast_cache import forecast_cache
+from src.decomposition import decomposition_cache
+from src.downsample import lttb_indices, parse_max_points
+from src.rollups import (refresh_item_summaries, ensure_item_summaries, refresh_daily_store_sales,
+                         refresh_store_days)
+from src import columnar_store
+from routes.args import date_arg
+from config import Config
 
 items_bp = Blueprint("items", __name__, url_prefix="/api/items")
 
@@ -33,13 +46,12 @@ def get_items():
         q = q.filter_by(store_id=store_id)
 
     pagination = q.paginate(page=page, per_page=per_page, error_out=False)
+    summaries  = ensure_item_summaries([item.id for item in pagination.items])
+
     items_data = []
     for item in pagination.items:
         d = item.to_dict()
-        d["total_sales"] = db.session.query(
-            db.func.sum(SalesRecord.sales)
-        ).filter_by(item_pk=item.id).scalar() or 0
-        d["record_count"] = item.sales.count()
+        d.update(summaries[item.id].to_dict())
         items_data.append(d)
 
     return jsonify({
@@ -55,10 +67,99 @@ def get_items():
 @jwt_required()
 def get_item(item_pk):
     item = Item.query.get_or_404(item_pk)
-    records = item.sales.order_by(SalesRecord.date).all()
+    try:
+        max_points = parse_max_points(request.args.get("max_points"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 422
+    rows = db.session.execute(_history_query(item.id)).all()
+    if max_points is not None and len(rows) > max_points:
+        # LTTB on sales over the record dates; only the kept rows are serialised
+        x    = np.array([r.date for r in rows], dtype="datetime64[D]").astype(float)
+        y    = np.array([r.sales or 0.0 for r in rows], dtype=float)
+        rows = [rows[i] for i in lttb_indices(y, max_points, x)]
     return jsonify({
         "item":    item.to_dict(),
-        "history": [r.to_dict() for r in records],
+        "history": [_history_row(r) for r in rows],
+    }), 200
+
+
+# ── Sales history: keyset pages and streams ─────────────────────────────
+
+HISTORY_COLUMNS = ("id", "date", "sales", "price", "promo", "weekday", "month")
+
+
+def _history_query(item_pk: int, start=None, end=None, after=None):
+    """Column select (no ORM objects) of an item's records, by date; keys as SalesRecord.to_dict."""
+    stmt = (
+        sa.select(*(getattr(SalesRecord, c) for c in HISTORY_COLUMNS))
+        .where(SalesRecord.item_pk == item_pk)
+        .order_by(SalesRecord.date)
+    )
+    if start is not None:
+        stmt = stmt.where(SalesRecord.date >= start)
+    if end is not None:
+        stmt = stmt.where(SalesRecord.date <= end)
+    if after is not None:
+        stmt = stmt.where(SalesRecord.date > after)
+    return stmt
+
+
+def _history_row(row) -> dict:
+    d = dict(row._mapping)
+    d["date"] = row.date.isoformat()
+    return d
+
+
+def _stream_history(stmt, fmt: str):
+    """NDJSON or CSV chunks, HISTORY_STREAM_BATCH rows at a time off a server-side cursor."""
+    result = db.session.execute(stmt.execution_options(yield_per=Config.HISTORY_STREAM_BATCH))
+    if fmt == "csv":
+        yield ",".join(HISTORY_COLUMNS) + "\r\n"
+    for batch in result.partitions():
+        if fmt == "csv":
+            buf = io.StringIO()
+            csv.writer(buf).writerows(batch)
+            yield buf.getvalue()
+        else:
+            yield "".join(json.dumps(_history_row(r)) + "\n" for r in batch)
+
+
+@items_bp.route("/<int:item_pk>/history", methods=["GET"])
+@jwt_required()
+def get_item_history(item_pk):
+    """
+    Sales history of an item between `from` and `to`. format=json (default)
+    returns one page of `limit` rows after the `cursor` date and the cursor of
+    the next page. format=ndjson|csv streams the whole range.
+    """
+    item = Item.query.get_or_404(item_pk)
+    fmt  = request.args.get("format", "json")
+    try:
+        if fmt not in ("json", "ndjson", "csv"):
+            raise ValueError(f"Unknown format '{fmt}'; expected json, ndjson or csv.")
+        start, end, after = date_arg("from"), date_arg("to"), date_arg("cursor")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 422
+
+    if fmt != "json":
+        stmt = _history_query(item.id, start, end, after)
+        return Response(
+            stream_with_context(_stream_history(stmt, fmt)),
+            mimetype="text/csv" if fmt == "csv" else "application/x-ndjson",
+            headers={"Content-Disposition": f'attachment; filename="history_{item.item_id}.{fmt}"'},
+        )
+
+    limit = request.args.get("limit", Config.HISTORY_PAGE_SIZE, type=int)
+    if not 1 <= limit <= Config.HISTORY_MAX_PAGE_SIZE:
+        return jsonify({"error": f"limit must be between 1 and {Config.HISTORY_MAX_PAGE_SIZE}."}), 422
+    # One row past the page tells whether there is a next one
+    rows = db.session.execute(_history_query(item.id, start, end, after).limit(limit + 1)).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return jsonify({
+        "item_pk":     item.id,
+        "history":     [_history_row(r) for r in rows],
+        "next_cursor": rows[-1].date.isoformat() if more else None,
     }), 200
 
 
@@ -72,15 +173,24 @@ def update_item(item_pk):
     if "lead_time" in data:
         item.lead_time = int(data["lead_time"])
     db.session.commit()
+    forecast_cache.invalidate(item.id)
     return jsonify({"item": item.to_dict()}), 200
 
 
 @items_bp.route("/<int:item_pk>", methods=["DELETE"])
 @jwt_required()
 def delete_item(item_pk):
-    item = Item.query.get_or_404(item_pk)
+    item    = Item.query.get_or_404(item_pk)
+    summary = ensure_item_summaries([item.id])[item.id]
     db.session.delete(item)
+    db.session.flush()
+    if summary.first_date is not None:
+        refresh_daily_store_sales(item.store_id, start=summary.first_date, end=summary.last_date)
     db.session.commit()
+    forecast_cache.invalidate(item_pk)
+    decomposition_cache.invalidate(item_pk)
+    if columnar_store.enabled():
+        columnar_store.compact(item.store_id, drop_item_ids=[item.item_id])
     return jsonify({"message": f"Item {item.item_id} deleted."}), 200
 
 
@@ -96,6 +206,9 @@ def upload_csv():
     if not f.filename.lower().endswith(".csv"):
         return jsonify({"error": "Only .csv files are accepted."}), 400
 
+    if request.args.get("mode") == "stream":
+        return _stream_upload(f.stream)
+
     try:
         raw_bytes = f.read()
         df = pd.read_csv(io.BytesIO(raw_bytes), encoding='utf-8-sig')
@@ -127,79 +240,244 @@ def upload_csv():
         return jsonify({"error": f"Data cleaning failed: {e}"}), 422
 
     try:
-        inserted = _upsert_records(df)
+        ingest = _upsert_records(df)
     except Exception as e:
         db.session.rollback()
+        columnar_store.discard(g.pop("sales_parts", []))
         return jsonify({"error": f"Database write failed: {e}"}), 500
 
     return jsonify({
         "success":         True,
-        "message":         f"Upload successful. {inserted} new records saved.",
+        "message":         f"Upload successful. {ingest['inserted']} new records saved.",
         "rows_processed":  int(report["final_shape"][0]),
         "cleaning_report": report["steps"],
         "original_shape":  list(report["original_shape"]),
         "final_shape":     list(report["final_shape"]),
+        "ingest":          ingest,
     }), 201
 
 
-def _upsert_records(df: pd.DataFrame) -> int:
-    inserted = 0
-
+def _resolve_items(keys: pd.DataFrame) -> dict:
+    """Map every (store_id, item_id) pair to Item.id, creating missing items in one batch."""
+    stores = keys["store_id"].unique().tolist()
+
+    def _load():
+        rows = (
+            db.session.query(Item.store_id, Item.item_id, Item.id)
+            .filter(Item.store_id.in_(stores))
+            .all()
+        )
+        return {(r.store_id, r.item_id): r.id for r in rows}
+
+    item_map = _load()
+    missing  = [
+        {"store_id": store_id, "item_id": item_id}
+        for store_id, item_id in keys.itertuples(index=False)
+        if (store_id, item_id) not in item_map
+    ]
+    if missing:
+        db.session.execute(sa.insert(Item), missing)
+        item_map = _load()
+    return item_map
+
+
+def _existing_keys(keys: list) -> int:
+    """How many of the distinct (item_pk, date) keys already have a sales row."""
+    found = 0
+    for start in range(0, len(keys), 500):
+        found += (
+            db.session.query(sa.func.count(SalesRecord.id))
+            .filter(sa.tuple_(SalesRecord.item_pk, SalesRecord.date).in_(keys[start:start + 500]))
+            .scalar() or 0
+        )
+    return found
+
+
+def _ingest_frame(df: pd.DataFrame, fill_only: bool = False) -> tuple:
+    """
+    Resolve items and write one cleaned frame in INGEST_CHUNK_SIZE batches,
+    without committing. Existing (item_pk, date) rows get their sales
+    overwritten, or are left untouched with fill_only (gap filling).
+    Returns (item pks touched, rows inserted); the latter is counted per
+    batch from the keys already present, not from table-wide counts.
+    """
+    df = df.copy()
     if "store_id" not in df.columns:
-        df = df.copy()
         df["store_id"] = "default"
+    df["store_id"] = df["store_id"].astype(str)
+    df["item_id"]  = df["item_id"].astype(str)
+
+    keys     = df[["store_id", "item_id"]].drop_duplicates()
+    item_map = _resolve_items(keys)
+
+    item_pk = pd.Series(
+        [item_map[k] for k in zip(df["store_id"], df["item_id"])], index=df.index
+    )
+
+    def _optional(col, as_int=False, default=None):
+        if col not in df.columns:
+            return pd.Series(default, index=df.index, dtype=object)
+        values = pd.to_numeric(df[col], errors="coerce")
+        if as_int:
+            values = values.round().astype("Int64")
+        return values.astype(object).where(values.notna(), default)
+
+    dates   = pd.to_datetime(df["date"]).dt.date
+    records = pd.DataFrame({
+        "item_pk": item_pk,
+        "date":    dates,
+        "sales":   pd.to_numeric(df["sales"], errors="coerce").fillna(0).astype(float),
+        "price":   _optional("price"),
+        "promo":   _optional("promo",   as_int=True, default=0),
+        "weekday": _optional("weekday", as_int=True),
+        "month":   _optional("month",   as_int=True),
+    }).to_dict("records")
+
+    stmt  = upsert_stmt(SalesRecord.__table__, ["item_pk", "date"], [] if fill_only else ["sales"])
+    chunk    = current_app.config.get("INGEST_CHUNK_SIZE", 5000)
+    inserted = 0
+    for start in range(0, len(records), chunk):
+        batch = records[start:start + chunk]
+        keys  = list(dict.fromkeys((r["item_pk"], r["date"]) for r in batch))
+        inserted += len(keys) - _existing_keys(keys)
+        db.session.execute(stmt, batch)
+
+    g.setdefault("touched_days", set()).update(zip(df["store_id"], dates))
+    if columnar_store.enabled():
+        # Removed again by the caller if the transaction rolls back
+        g.setdefault("sales_parts", []).extend(columnar_store.append(df, filled=fill_only))
+    return item_pk.unique().tolist(), inserted
+
+
+def _finish_ingest(item_pks) -> None:
+    refresh_item_summaries(item_pks)
+    days_by_store = {}
+    for store_id, day in g.pop("touched_days", ()):
+        days_by_store.setdefault(store_id, set()).add(day)
+    for store_id, days in days_by_store.items():
+        refresh_store_days(store_id, days)
+    db.session.commit()
+    for pk in item_pks:
+        forecast_cache.invalidate(int(pk))
+    if columnar_store.enabled() and g.pop("sales_parts", None):
+        stores = [s for (s,) in db.session.query(Item.store_id)
+                  .filter(Item.id.in_([int(pk) for pk in item_pks])).distinct()]
+        columnar_store.maybe_compact(stores)
+
+
+def _ingest_stats(rows: int, inserted: int, started: float) -> dict:
+    elapsed = time.perf_counter() - started
+    return {
+        "rows":         rows,
+        "inserted":     inserted,
+        "updated":      rows - inserted,
+        "seconds":      round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def _upsert_records(df: pd.DataFrame) -> dict:
+    """
+    Set-based ingest: resolve all items in one pass, then upsert sales in
+    INGEST_CHUNK_SIZE batches. Existing (item_pk, date) rows only have their
+    sales overwritten; new rows carry price/promo/weekday/month as well.
+    Rows clean_dataframe added for missing days only fill gaps, as in
+    mode=stream: they never overwrite a stored day.
+    """
+    started  = time.perf_counter()
+    # Gap-fill rows are the ones without an original row label
+    filled   = df["index"].isna() if "index" in df.columns else pd.Series(False, index=df.index)
+    item_pks = set()
+    inserted = 0
+    for part, fill_only in ((df[~filled], False), (df[filled], True)):
+        if not part.empty:
+            pks, n = _ingest_frame(part, fill_only=fill_only)
+            item_pks.update(pks)
+            inserted += n
+    _finish_ingest(sorted(item_pks))
+    return _ingest_stats(len(df), inserted, started)
+
+
+def _stream_upload(stream) -> tuple:
+    """
+    mode=stream: three chunked passes over the (spooled) upload instead of
+    parsing it whole. Pass 1 finds duplicated keys and the date range, pass 2
+    gathers per-item outlier statistics with duplicates merged, pass 3 cleans
+    and writes each chunk, then the merged duplicates and the missing days
+    are written in batches. Peak memory follows UPLOAD_CHUNK_ROWS plus an
+    8-byte key hash per row, not the size of the parsed file.
+    """
+    chunk_rows = current_app.config.get("UPLOAD_CHUNK_ROWS", 100_000)
+    started    = time.perf_counter()
+    cleaner    = StreamingCleaner()
+
+    def _chunks():
+        stream.seek(0)
+        for chunk in pd.read_csv(stream, chunksize=chunk_rows, encoding="utf-8-sig"):
+            yield _normalise_columns(chunk)
 
-    group_cols = ["store_id", "item_id"]
-
-    for (store_id, item_id), grp in df.groupby(group_cols):
-        item = Item.query.filter_by(item_id=item_id, store_id=store_id).first()
-        if not item:
-            item = Item(item_id=item_id, store_id=store_id)
-            db.session.add(item)
-            db.session.flush()   
-
-        for _, row in grp.iterrows():
-            row_dict = row.to_dict()
-
-            date_val = row_dict["date"]
-            if hasattr(date_val, "date"):
-                date_val = date_val.date()
-
-            existing = SalesRecord.query.filter_by(
-                item_pk=item.id, date=date_val
-            ).first()
-
-            if existing:
-                existing.sales = float(row_dict["sales"])
-            else:
-                def _is_nan(x):
-                    try:
-                        return pd.isna(x)
-                    except Exception:
-                        return False
-
-                def _safe_float(x):
-                    return None if _is_nan(x) else float(x)
-
-                def _safe_int(x, default=None):
-                    if _is_nan(x):
-                        return default
-                    try:
-                        return int(x)
-                    except Exception:
-                        return default
-
-                rec = SalesRecord(
-                    item_pk = item.id,
-                    date    = date_val,
-                    sales   = float(row_dict.get("sales") or 0),
-                    price   = _safe_float(row_dict.get("price")),
-                    promo   = _safe_int(row_dict.get("promo"), default=0),
-                    weekday = _safe_int(row_dict.get("weekday"), default=None),
-                    month   = _safe_int(row_dict.get("month"), default=None),
-                )
-                db.session.add(rec)
-                inserted += 1
+    try:
+        # Passes 1 and 2: statistics, then histograms with duplicates merged
+        first = True
+        for chunk in _chunks():
+            if first:
+                missing = REQUIRED_COLS - set(chunk.columns)
+                if missing:
+                    return jsonify({
+                        "error": f"Missing required columns: {', '.join(sorted(missing))}. "
+                                 f"Found: {', '.join(sorted(chunk.columns.tolist()))}"
+                    }), 400
+                first = False
+            cleaner.observe(chunk)
+        if cleaner.rows_read == 0:
+            return jsonify({"error": "The uploaded CSV is empty."}), 400
+        for chunk in _chunks():
+            cleaner.measure(chunk)
+        cleaner.finalize()
+    except ValueError as e:
+        return jsonify({"error": f"Data validation failed: {e}"}), 422
+    except Exception as e:
+        return jsonify({"error": f"Cannot parse CSV: {e}"}), 400
 
-    db.session.commit()
-    return inserted
+    try:
+        item_pks = set()
+        rows     = 0
+        inserted = 0
+        for chunk in _chunks():
+            cleaned = cleaner.clean_chunk(chunk)
+            if not cleaned.empty:
+                pks, n = _ingest_frame(cleaned)
+                item_pks.update(pks)
+                inserted += n
+                rows     += len(cleaned)
+        merged = cleaner.merged_frame()
+        if not merged.empty:
+            pks, n = _ingest_frame(merged)
+            item_pks.update(pks)
+            inserted += n
+            rows     += len(merged)
+
+        filled = 0
+        for gaps in cleaner.missing_date_frames(max_rows=chunk_rows):
+            pks, n = _ingest_frame(gaps, fill_only=True)
+            item_pks.update(pks)
+            filled += n
+
+        _finish_ingest(sorted(item_pks))
+    except Exception as e:
+        db.session.rollback()
+        columnar_store.discard(g.pop("sales_parts", []))
+        return jsonify({"error": f"Database write failed: {e}"}), 500
+
+    report = cleaner.report(rows + filled, filled)
+    ingest = _ingest_stats(rows + filled, inserted + filled, started)
+    return jsonify({
+        "success":         True,
+        "message":         f"Upload successful. {ingest['inserted']} new records saved.",
+        "rows_processed":  int(report["final_shape"][0]),
+        "cleaning_report": report["steps"],
+        "original_shape":  list(report["original_shape"]),
+        "final_shape":     list(report["final_shape"]),
+        "ingest":          ingest,
+        "mode":            "stream",
+    }), 201
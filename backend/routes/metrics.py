@@ -0,0 +1,15 @@
+"""
+routes/metrics.py — Prometheus scrape endpoint (src/instrumentation.py)
+"""
+from flask import Blueprint, Response, current_app, jsonify
+from src.instrumentation import render_metrics
+
+metrics_bp = Blueprint("metrics", __name__, url_prefix="/api/metrics")
+
+
+@metrics_bp.route("", methods=["GET"])
+def get_metrics():
+    # Unauthenticated like /api/health so scrapers need no token; METRICS_ENABLED=0 hides it
+    if not current_app.config.get("METRICS_ENABLED", True):
+        return jsonify({"error": "Resource not found."}), 404
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
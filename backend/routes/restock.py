@@ -0,0 +1,104 @@
+"""
+routes/restock.py — Bulk restock recommendations for every SKU in a store
+"""
+import json
+from flask import Blueprint, request, Response, jsonify
+from flask_jwt_extended import jwt_required
+from models import Item
+from src.bulk_forecast import load_store_series, make_payload, iter_restock, iter_restock_batched
+from src.inventory_plan import plan_store_orders
+from config import Config
+
+restock_bp = Blueprint("restock", __name__, url_prefix="/api/restock")
+
+ENGINES = ("pool", "batch")
+
+
+@restock_bp.route("", methods=["GET"])
+@jwt_required()
+def get_restock():
+    store_id      = request.args.get("store_id", "store_1")
+    horizon       = request.args.get("horizon",         Config.DEFAULT_HORIZON,         type=int)
+    sp            = request.args.get("seasonal_period", Config.DEFAULT_SEASONAL_PERIOD, type=int)
+    safety_factor = request.args.get("safety_factor",   Config.DEFAULT_SAFETY_FACTOR,   type=float)
+    # Optional: order up to this quantile of demand instead of applying safety_factor
+    service_level = request.args.get("service_level",   type=float)
+    # "pool": statsmodels fits on the process pool; "batch": one vectorized NumPy fit
+    engine        = request.args.get("engine", "pool")
+    if engine not in ENGINES:
+        return jsonify({"error": f"engine must be one of {', '.join(ENGINES)}, got '{engine}'."}), 422
+
+    items          = {i.id: i for i in Item.query.filter_by(store_id=store_id).all()}
+    series_by_item = load_store_series(store_id)
+
+    payloads = [
+        make_payload(item, series_by_item[item.id], horizon=horizon,
+                     seasonal_period=sp, safety_factor=safety_factor,
+                     service_level=service_level)
+        for item in items.values() if item.id in series_by_item
+    ]
+    no_data = [item for item in items.values() if item.id not in series_by_item]
+
+    def generate():
+        # NDJSON: one line per SKU as soon as its fit finishes, then a summary
+        for item in no_data:
+            yield json.dumps({
+                "item_pk":  item.id,
+                "item_id":  item.item_id,
+                "store_id": item.store_id,
+                "error":    f"No sales records for '{item.item_id}'.",
+            }) + "\n"
+
+        completed = 0
+        failed    = len(no_data)
+        results = iter_restock_batched(payloads) if engine == "batch" else iter_restock(payloads)
+        for result in results:
+            if "error" in result:
+                failed += 1
+            else:
+                completed += 1
+            yield json.dumps(result) + "\n"
+
+        yield json.dumps({
+            "done":      True,
+            "store_id":  store_id,
+            "total":     len(items),
+            "completed": completed,
+            "failed":    failed,
+        }) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+@restock_bp.route("/plan", methods=["GET", "POST"])
+@jwt_required()
+def get_restock_plan():
+    """Whole-store order plan in one response; POST a JSON body to pass `unit_costs`."""
+    data = request.get_json(silent=True) or request.args
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 422
+    try:
+        horizon         = int(data.get("horizon", Config.DEFAULT_HORIZON))
+        seasonal_period = int(data.get("seasonal_period", Config.DEFAULT_SEASONAL_PERIOD))
+        unit_costs      = data.get("unit_costs")
+        if horizon < 1:
+            raise ValueError("horizon must be at least 1.")
+        if seasonal_period < 1:
+            raise ValueError("seasonal_period must be at least 1.")
+        if unit_costs is not None and not (
+            isinstance(unit_costs, dict)
+            and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in unit_costs.values())
+        ):
+            raise ValueError("unit_costs must be an object of item_id → number.")
+        plan = plan_store_orders(
+            data.get("store_id", "store_1"),
+            horizon=horizon,
+            seasonal_period=seasonal_period,
+            service_level=float(data.get("service_level", Config.DEFAULT_SERVICE_LEVEL)),
+            budget=float(data["budget"]) if data.get("budget") is not None else None,
+            capacity=float(data["capacity"]) if data.get("capacity") is not None else None,
+            unit_costs=unit_costs,
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 422
+    return jsonify(plan), 200
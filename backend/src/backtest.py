@@ -0,0 +1,132 @@
+"""
+src/backtest.py — Rolling-origin cross-validation for MA, SES and Holt-Winters.
+
+For each cutoff c the model sees series[:c] and is scored on the next
+`horizon` days. Two modes:
+
+  incremental (default) — SES/Holt-Winters are optimised once, on the
+      earliest training window (so no fold sees its own test data), and
+      their states are then propagated through each later window with
+      src/hw_state.py. One fit and one pass over the series per method,
+      however many folds.
+  refit — every (method, fold) is refitted from scratch with
+      DemandForecaster, fanned out over the shared process pool.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from src.forecasting_engine import DemandForecaster
+from src.hw_state import propagate, forecast_from_state
+
+METHODS   = ("moving_average", "ses", "holt_winters")
+MIN_TRAIN = 14
+MA_WINDOW = 7
+
+
+def make_cutoffs(n: int, horizon: int, n_folds: int, step: int) -> List[int]:
+    """Training-window lengths, ascending; folds that would leave < MIN_TRAIN days are dropped."""
+    for name, value in (("horizon", horizon), ("folds", n_folds), ("step", step)):
+        if value < 1:
+            raise ValueError(f"{name} must be at least 1, got {value}.")
+    cutoffs = sorted(c for c in (n - horizon - k * step for k in range(n_folds)) if c >= MIN_TRAIN)
+    if not cutoffs:
+        raise ValueError(
+            f"Insufficient data for backtesting: need ≥{MIN_TRAIN + horizon} days, got {n}."
+        )
+    return cutoffs
+
+
+def _fold(engine, series, cutoff, horizon, method, forecast) -> Dict[str, Any]:
+    test    = series.iloc[cutoff:cutoff + horizon]
+    metrics = engine.evaluate(test, pd.Series(forecast[:len(test)], index=test.index))
+    return {
+        "method": method,
+        "cutoff": series.index[cutoff - 1].strftime("%Y-%m-%d"),
+        **{k: float(v) for k, v in metrics.items()},
+    }
+
+
+def incremental_backtest(series: pd.Series, cutoffs: List[int], horizon: int,
+                         seasonal_period: int) -> List[Dict[str, Any]]:
+    engine = DemandForecaster(seasonal_period=seasonal_period)
+    values = series.to_numpy(dtype=float)
+    first  = series.iloc[:cutoffs[0]]
+    folds  = []
+
+    for c in cutoffs:
+        ma = np.full(horizon, values[max(0, c - MA_WINDOW):c].mean())
+        folds.append(_fold(engine, series, c, horizon, "moving_average", ma))
+
+    initial = {
+        "ses":          engine.exponential_smoothing_forecast(first, horizon=horizon)["state"],
+        "holt_winters": engine.holt_winters_forecast(first, horizon=horizon)["state"],
+    }
+    for method, state in initial.items():
+        consumed = 0
+        for c in cutoffs:
+            state, _ = propagate(state, values[consumed:c])
+            consumed = c
+            folds.append(_fold(engine, series, c, horizon, method,
+                               forecast_from_state(state, horizon)))
+    return folds
+
+
+def _refit_task(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """One (method, cutoff) refit; runs in a worker process."""
+    engine  = DemandForecaster(seasonal_period=payload["seasonal_period"])
+    series  = payload["series"]
+    c, h    = payload["cutoff"], payload["horizon"]
+    train   = series.iloc[:c]
+    fitters = {
+        "moving_average": lambda: engine.moving_average_forecast(train, window=MA_WINDOW, horizon=h),
+        "ses":            lambda: engine.exponential_smoothing_forecast(train, horizon=h),
+        "holt_winters":   lambda: engine.holt_winters_forecast(train, horizon=h),
+    }
+    forecast = fitters[payload["method"]]()["forecast"].to_numpy()
+    return _fold(engine, series, c, h, payload["method"], forecast)
+
+
+def refit_backtest(series: pd.Series, cutoffs: List[int], horizon: int,
+                   seasonal_period: int) -> List[Dict[str, Any]]:
+    from concurrent.futures import as_completed
+    from src.bulk_forecast import submit
+
+    futures = [
+        submit(_refit_task, {
+            "series": series, "cutoff": c, "horizon": horizon,
+            "method": m, "seasonal_period": seasonal_period,
+        })
+        for m in METHODS for c in cutoffs
+    ]
+    return [f.result() for f in as_completed(futures)]
+
+
+def summarise(folds: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    df = pd.DataFrame(folds)
+    summary = {}
+    for method, grp in df.groupby("method"):
+        summary[method] = {
+            "MAE":   round(float(grp["MAE"].mean()), 2),
+            "RMSE":  round(float(grp["RMSE"].mean()), 2),
+            "MAPE%": round(float(grp["MAPE%"].mean()), 2),
+            "folds": int(len(grp)),
+        }
+    return summary
+
+
+def run_backtest(series: pd.Series, horizon: int, n_folds: int, step: int,
+                 seasonal_period: int, refit: bool = False) -> Dict[str, Any]:
+    cutoffs = make_cutoffs(len(series), horizon, n_folds, step)
+    runner  = refit_backtest if refit else incremental_backtest
+    folds   = runner(series, cutoffs, horizon, seasonal_period)
+    folds.sort(key=lambda f: (f["method"], f["cutoff"]))
+    summary = summarise(folds)
+    return {
+        "folds":       folds,
+        "summary":     summary,
+        "best_method": min(summary, key=lambda m: summary[m]["MAE"]),
+    }
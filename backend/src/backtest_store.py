@@ -0,0 +1,67 @@
+"""
+src/backtest_store.py — Persisted backtest runs.
+
+A run is stored as one BacktestResult row per (method, cutoff) and reused
+while the item's series fingerprint is unchanged, so repeated requests (and
+model selection) read evidence instead of recomputing it.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Any, Dict
+
+import pandas as pd
+
+from models import db, BacktestResult
+from src.backtest import run_backtest, summarise
+from src.forecast_cache import series_fingerprint
+
+
+def run_or_load_backtest(item, series: pd.Series, horizon: int, seasonal_period: int,
+                         n_folds: int, step: int, refit: bool = False,
+                         recompute: bool = False) -> Dict[str, Any]:
+    fingerprint = str(series_fingerprint(series))
+    q = BacktestResult.query.filter_by(
+        item_pk=item.id, horizon=horizon, seasonal_period=seasonal_period,
+        n_folds=n_folds, step=step, refit=refit,
+    )
+    rows = q.order_by(BacktestResult.method, BacktestResult.cutoff).all()
+
+    if rows and not recompute and all(r.series_hash == fingerprint for r in rows):
+        folds   = [r.to_dict() for r in rows]
+        summary = summarise(folds)
+        return {
+            "folds":       folds,
+            "summary":     summary,
+            "best_method": min(summary, key=lambda m: summary[m]["MAE"]),
+            "cached":      True,
+            "computed_at": rows[0].created_at.isoformat(),
+        }
+
+    result = run_backtest(series, horizon, n_folds, step, seasonal_period, refit=refit)
+    saved  = save_backtest(item.id, fingerprint, result, horizon, seasonal_period, n_folds, step, refit)
+    db.session.commit()
+
+    result["cached"]      = False
+    result["computed_at"] = saved.isoformat()
+    return result
+
+
+def save_backtest(item_pk: int, fingerprint: str, result: Dict[str, Any], horizon: int,
+                  seasonal_period: int, n_folds: int, step: int, refit: bool = False) -> datetime:
+    """Replace the stored run for these parameters; returns its created_at. Caller commits."""
+    now = datetime.utcnow()
+    BacktestResult.query.filter_by(
+        item_pk=item_pk, horizon=horizon, seasonal_period=seasonal_period,
+        n_folds=n_folds, step=step, refit=refit,
+    ).delete(synchronize_session=False)
+    db.session.add_all([
+        BacktestResult(
+            item_pk=item_pk, method=f["method"], cutoff=date.fromisoformat(f["cutoff"]),
+            horizon=horizon, seasonal_period=seasonal_period, n_folds=n_folds, step=step,
+            refit=refit, series_hash=fingerprint,
+            mae=f["MAE"], rmse=f["RMSE"], mape=f["MAPE%"], created_at=now,
+        )
+        for f in result["folds"]
+    ])
+    return now
@@ -0,0 +1,301 @@
+"""
+src/bulk_forecast.py — Store-wide forecasting fanned out over a process pool.
+
+Holt-Winters fits are CPU bound and hold the GIL, so bulk runs are spread
+across a ProcessPoolExecutor sized to the machine. Workers never touch the
+database: the route loads every series up front and ships plain pandas
+objects to the pool. Workers are started with forkserver (spawn where that
+is unavailable), and a pool broken by a dead worker is replaced on the
+next submit.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+import pandas as pd
+
+from config import Config
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _mp_context():
+    # Workers are started from a threaded server; a forked child would inherit
+    # whatever locks other threads held, so start them from a clean interpreter
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Lazily create one pool per (web) process and reuse it across requests."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = Config.FORECAST_WORKERS or os.cpu_count() or 1
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context())
+        return _pool
+
+
+def reset_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a pool broken by a dead worker; the next get_process_pool starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit(pool: ProcessPoolExecutor, task, payload) -> Tuple[ProcessPoolExecutor, Future]:
+    try:
+        return pool, pool.submit(task, payload)
+    except BrokenProcessPool:
+        reset_pool(pool)
+        pool = get_process_pool()
+        return pool, pool.submit(task, payload)
+
+
+def submit(task, payload) -> Future:
+    """pool.submit on the shared pool, replacing it first if it is broken."""
+    return _submit(get_process_pool(), task, payload)[1]
+
+
+def series_from_rows(rows: Iterable[Tuple[int, Any, float]]) -> Dict[int, pd.Series]:
+    """
+    Turn (item_pk, date, sales) rows from a single query into one daily
+    series per item, with the same resampling as ForecastService.build_series.
+    """
+    return series_from_frame(pd.DataFrame(list(rows), columns=["item_pk", "date", "sales"]))
+
+
+def series_from_frame(df: pd.DataFrame) -> Dict[int, pd.Series]:
+    """series_from_rows for an (item_pk, date, sales) DataFrame."""
+    if df.empty:
+        return {}
+    df = df.assign(date=pd.to_datetime(df["date"]))
+    out = {}
+    for item_pk, grp in df.groupby("item_pk", sort=False):
+        series = grp.set_index("date")["sales"].sort_index()
+        out[int(item_pk)] = series.resample("D").sum().fillna(0)
+    return out
+
+
+def load_store_series(store_id: str, item_pks: Iterable[int] | None = None) -> Dict[int, pd.Series]:
+    """All daily series for a store (optionally a subset of items) in one query."""
+    from models import db, Item, SalesRecord
+    from src import columnar_store
+
+    if columnar_store.serves(store_id):
+        q = db.session.query(Item.item_id, Item.id).filter(Item.store_id == store_id)
+        if item_pks is not None:
+            q = q.filter(Item.id.in_(list(item_pks)))
+        pk_by_item = dict(q.all())
+        df = columnar_store.read_frame(
+            store_id, ("item_id", "date", "sales"),
+            item_ids=list(pk_by_item) if item_pks is not None else None,
+        )
+        df["item_pk"] = df["item_id"].map(pk_by_item)
+        return series_from_frame(df.dropna(subset=["item_pk"]).astype({"item_pk": int}))
+
+    q = (
+        db.session.query(SalesRecord.item_pk, SalesRecord.date, SalesRecord.sales)
+        .join(Item, Item.id == SalesRecord.item_pk)
+        .filter(Item.store_id == store_id)
+    )
+    if item_pks is not None:
+        q = q.filter(SalesRecord.item_pk.in_(list(item_pks)))
+    return series_from_rows(q.order_by(SalesRecord.item_pk, SalesRecord.date).all())
+
+
+def make_payload(item, series: pd.Series, **params) -> Dict[str, Any]:
+    """Picklable task payload for one Item; params override the item defaults."""
+    payload = {
+        "item_pk":         item.id,
+        "item_id":         item.item_id,
+        "store_id":        item.store_id,
+        "series":          series,
+        "horizon":         Config.DEFAULT_HORIZON,
+        "seasonal_period": Config.DEFAULT_SEASONAL_PERIOD,
+        "current_stock":   Config.DEFAULT_CURRENT_STOCK if item.current_stock is None else item.current_stock,
+        "lead_time":       item.lead_time     or Config.DEFAULT_LEAD_TIME,
+        "safety_factor":   Config.DEFAULT_SAFETY_FACTOR,
+        "service_level":   None,
+        "method":          "holt_winters",
+        "include":         None,
+        "max_points":      None,
+        "compact":         False,
+        # Set both to fit the full-series Holt-Winters like a live request
+        # (src/warm_start.py update_fit): the update mode and the stored fit
+        "hw_update":       None,
+        "hw_fit":          None,
+    }
+    payload.update({k: v for k, v in params.items() if v is not None})
+    return payload
+
+
+def _restock_task(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs inside a worker process; must stay importable at module level."""
+    from src.forecast_service import ForecastService
+
+    result = {
+        "item_pk":  payload["item_pk"],
+        "item_id":  payload["item_id"],
+        "store_id": payload["store_id"],
+    }
+    try:
+        service = ForecastService(seasonal_period=payload["seasonal_period"])
+        result.update(service.fast_restock_forecast(
+            payload["series"],
+            horizon=payload["horizon"],
+            current_stock=payload["current_stock"],
+            lead_time=payload["lead_time"],
+            safety_factor=payload["safety_factor"],
+            service_level=payload.get("service_level"),
+        ))
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def _forecast_task(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """full_forecast for one SKU; same payload shape as _restock_task plus method."""
+    from src.forecast_service import ForecastService, needs_full_hw
+
+    result = {
+        "item_pk":  payload["item_pk"],
+        "item_id":  payload["item_id"],
+        "store_id": payload["store_id"],
+    }
+    try:
+        service = ForecastService(seasonal_period=payload["seasonal_period"])
+        if payload["method"] == "auto":
+            result.update(_auto_forecast(service, payload))
+            return result
+        hw_full = None
+        if payload.get("hw_update") and needs_full_hw(payload["method"], payload.get("include")):
+            hw_full = _hw_full(payload)
+        result["forecast"] = service.full_forecast(
+            payload["series"],
+            horizon=payload["horizon"],
+            current_stock=payload["current_stock"],
+            lead_time=payload["lead_time"],
+            safety_factor=payload["safety_factor"],
+            service_level=payload.get("service_level"),
+            method=payload["method"],
+            include=payload.get("include"),
+            max_points=payload.get("max_points"),
+            compact=payload.get("compact", False),
+            hw_full=hw_full,
+        )
+        if hw_full is not None:
+            result["forecast"]["hw_update"] = hw_full["update"]
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def _hw_full(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from src.warm_start import update_fit
+
+    return update_fit(payload["series"], payload["seasonal_period"], payload["horizon"],
+                      payload["hw_update"], payload.get("hw_fit"))
+
+
+def _auto_forecast(service, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    method=auto inside a worker: use the champion the caller attached (from
+    its stored parameters when it has them), or run the tournament here and
+    hand the selection back for the caller to store.
+    """
+    from src.backtest import run_backtest
+
+    champion, out = payload.get("champion"), {}
+    if champion is None:
+        bt = run_backtest(payload["series"], Config.DEFAULT_HORIZON, Config.BACKTEST_FOLDS,
+                          Config.BACKTEST_STEP, payload["seasonal_period"])
+        champion = {"method": bt["best_method"], "metrics": bt["summary"]}
+        out["selection"] = champion
+    elif champion.get("params") is None:
+        out["refit"] = True     # series changed since the champion's fit
+    hw_full = None
+    if champion["method"] == "holt_winters" and not champion.get("params") and payload.get("hw_update"):
+        hw_full = _hw_full(payload)
+    out["forecast"] = service.champion_forecast(
+        payload["series"], champion["method"], champion["metrics"],
+        params=champion.get("params"), hw_full=hw_full,
+        horizon=payload["horizon"],
+        current_stock=payload["current_stock"],
+        lead_time=payload["lead_time"],
+        safety_factor=payload["safety_factor"],
+        service_level=payload.get("service_level"),
+        include=payload.get("include"),
+        max_points=payload.get("max_points"),
+        compact=payload.get("compact", False),
+    )
+    if hw_full is not None:
+        out["forecast"]["hw_update"] = hw_full["update"]
+    return out
+
+
+def iter_pool(task, payloads: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Submit every payload to the pool and yield results as they complete.
+    `task` must be a module-level function taking one payload dict. Fits
+    still queued are cancelled when the generator is closed early.
+    """
+    pool    = get_process_pool()
+    futures = {}
+    try:
+        for p in payloads:
+            pool, fut = _submit(pool, task, p)
+            futures[fut] = p
+        for fut in as_completed(futures):
+            try:
+                yield fut.result()
+            except BrokenProcessPool:
+                reset_pool(pool)
+                p = futures[fut]
+                yield {"item_pk": p["item_pk"], "item_id": p["item_id"], "error": "Worker process died."}
+    finally:
+        # Stops queued fits when the consumer goes away (e.g. a client leaves an NDJSON stream)
+        for fut in futures:
+            fut.cancel()
+
+
+def iter_restock(payloads: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    return iter_pool(_restock_task, payloads)
+
+
+def iter_full_forecasts(payloads: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    return iter_pool(_forecast_task, payloads)
+
+
+def iter_restock_batched(payloads: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    In-process alternative to iter_restock: one batched NumPy Holt-Winters
+    fit for all payloads (which must share horizon/seasonal_period/safety_factor/
+    service_level).
+    """
+    from src.forecast_service import ForecastService
+
+    payloads = list(payloads)
+    if not payloads:
+        return
+    first   = payloads[0]
+    service = ForecastService(seasonal_period=first["seasonal_period"])
+    results = service.batch_restock_forecast(
+        {p["item_pk"]: p["series"] for p in payloads},
+        current_stock={p["item_pk"]: p["current_stock"] for p in payloads},
+        lead_time={p["item_pk"]: p["lead_time"] for p in payloads},
+        horizon=first["horizon"],
+        safety_factor=first["safety_factor"],
+        service_level=first.get("service_level"),
+    )
+    for p in payloads:
+        yield {"item_pk": p["item_pk"], "item_id": p["item_id"], "store_id": p["store_id"],
+               **results[p["item_pk"]]}
@@ -0,0 +1,286 @@
+"""
+src/columnar_store.py — Optional Parquet copy of the sales history.
+
+With SALES_STORE=parquet every upload also appends its cleaned rows as a new
+Parquet partition under SALES_PARQUET_DIR/<store_id>/, sorted by
+(item_id, date) and written in small row groups, so per-item and date-range
+reads are pruned by row-group statistics. `sales_records` stays the system
+of record (items, rollups and backtests read it); forecasts, bulk runs and
+run_eda read history from here, with column projection, filter pushdown and
+memory-mapped files.
+
+Reads of a store only come from here once `flask backfill-parquet` has
+exported its existing `sales_records` rows and left a marker file in the
+store's directory (backfilled()); until then readers stay on SQL, while
+uploads already append.
+
+A store holding more than SALES_PARQUET_MAX_PARTS partitions is compacted
+into one after the upload commits; with a single partition, loading a
+store's history is one memory-mapped read with no de-duplication pass. A
+compacted partition (`*.compact.parquet`) is named after the newest
+partition it replaces, which hides those from new readers; the files
+themselves are only deleted SALES_PARQUET_RETIRE_SECONDS later, so readers
+that listed them before can still open them.
+
+For the same (item_id, date) later partitions win over earlier ones, except
+gap-fill rows (`filled`), which never replace a real observation: the same
+semantics as the SQL upsert.
+"""
+from __future__ import annotations
+
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+
+ROW_GROUP_SIZE  = 50_000
+KEY_COLUMNS     = ["item_id", "date"]
+BACKFILL_MARKER = "_BACKFILLED"
+COMPACT_SUFFIX  = ".compact.parquet"
+
+
+def enabled() -> bool:
+    return Config.SALES_STORE == "parquet"
+
+
+def backfilled(store_id: str) -> bool:
+    return (_store_dir(store_id) / BACKFILL_MARKER).exists()
+
+
+def serves(store_id: str) -> bool:
+    """Whether reads of this store's history come from Parquet."""
+    return enabled() and backfilled(store_id)
+
+
+def _pa():
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+    except ImportError as e:   # pragma: no cover - depends on the deployment
+        raise RuntimeError("SALES_STORE=parquet requires the 'pyarrow' package.") from e
+    return pa, pc, pq
+
+
+def _schema():
+    pa, _, _ = _pa()
+    return pa.schema([
+        ("item_id", pa.string()),
+        ("date",    pa.date32()),
+        ("sales",   pa.float64()),
+        ("price",   pa.float64()),
+        ("promo",   pa.int32()),
+        ("filled",  pa.bool_()),
+    ])
+
+
+def _store_dir(store_id: str) -> Path:
+    # Quoted so a store id can never escape the data directory
+    return Path(Config.SALES_PARQUET_DIR) / quote(str(store_id), safe="")
+
+
+def _part_ts(path: Path) -> int:
+    return int(path.name.split("-")[1])
+
+
+def _all_parts(store_id: str) -> List[Path]:
+    d = _store_dir(store_id)
+    return sorted(d.glob("part-*.parquet")) if d.exists() else []
+
+
+def _base(parts: List[Path]) -> Optional[Path]:
+    """The newest compacted partition, if any."""
+    compacted = [p for p in parts if p.name.endswith(COMPACT_SUFFIX)]
+    return max(compacted, key=lambda p: (_part_ts(p), p.name)) if compacted else None
+
+
+def _parts(store_id: str) -> List[Path]:
+    """
+    Live partitions oldest first (names start with a nanosecond timestamp):
+    the newest compacted partition and everything written after it.
+    """
+    parts = _all_parts(store_id)
+    base  = _base(parts)
+    if base is None:
+        return parts
+    return [base] + [p for p in parts if _part_ts(p) > _part_ts(base)]
+
+
+def _sweep(store_id: str) -> None:
+    """Delete partitions hidden by a compaction more than SALES_PARQUET_RETIRE_SECONDS ago."""
+    parts = _all_parts(store_id)
+    base  = _base(parts)
+    if base is None:
+        return
+    try:
+        if time.time() - base.stat().st_mtime < Config.SALES_PARQUET_RETIRE_SECONDS:
+            return
+    except FileNotFoundError:
+        return
+    live = set(_parts(store_id))
+    discard(p for p in parts if p not in live)
+
+
+def _write_part(store_id: str, frame: pd.DataFrame, ts: Optional[int] = None,
+                compacted: bool = False) -> Path:
+    pa, _, pq = _pa()
+    d = _store_dir(store_id)
+    d.mkdir(parents=True, exist_ok=True)
+    name  = f"part-{ts if ts is not None else time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+    path  = d / (name + (COMPACT_SUFFIX if compacted else ".parquet"))
+    tmp   = d / (name + ".tmp")
+    table = pa.Table.from_pandas(frame, schema=_schema(), preserve_index=False)
+    pq.write_table(table, tmp, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp, path)
+    return path
+
+
+def append(df: pd.DataFrame, filled: bool = False) -> List[Path]:
+    """
+    Write cleaned upload rows (store_id, item_id, date, sales[, price, promo])
+    as one new partition per store. Returns the paths written.
+    """
+    frame = pd.DataFrame({
+        "store_id": df["store_id"].astype(str) if "store_id" in df.columns else "default",
+        "item_id":  df["item_id"].astype(str),
+        "date":     pd.to_datetime(df["date"]).dt.date,
+        "sales":    pd.to_numeric(df["sales"], errors="coerce").fillna(0).astype(float),
+        "price":    (pd.to_numeric(df["price"], errors="coerce")
+                     if "price" in df.columns else np.nan),
+        "promo":    (pd.to_numeric(df["promo"], errors="coerce").fillna(0).round().astype("int32")
+                     if "promo" in df.columns else np.int32(0)),
+        "filled":   filled,
+    })
+    paths = []
+    for store_id, grp in frame.groupby("store_id", sort=False):
+        grp = grp.drop(columns="store_id").sort_values(KEY_COLUMNS, kind="stable")
+        paths.append(_write_part(store_id, grp))
+    return paths
+
+
+def discard(paths: Iterable[Path]) -> None:
+    """Remove partitions of an upload whose database transaction rolled back."""
+    for p in paths:
+        Path(p).unlink(missing_ok=True)
+
+
+def _filter(item_ids: Optional[Sequence[str]], start=None, end=None):
+    _, pc, _ = _pa()
+    expr = None
+    for cond in (
+        pc.field("item_id").isin([str(i) for i in item_ids]) if item_ids is not None else None,
+        pc.field("date") >= start if start is not None else None,
+        pc.field("date") <= end   if end   is not None else None,
+    ):
+        if cond is not None:
+            expr = cond if expr is None else expr & cond
+    return expr
+
+
+def read_frame(store_id: str, columns: Sequence[str] = ("item_id", "date", "sales"),
+               item_ids: Optional[Sequence[str]] = None, start=None, end=None) -> pd.DataFrame:
+    """
+    Sales history for a store as a DataFrame sorted by (item_id, date):
+    only `columns` are decoded and row groups outside item_ids/[start, end]
+    are skipped. Overlapping partitions are resolved as described above.
+    """
+    return _read_parts(_parts(store_id), columns, _filter(item_ids, start, end))
+
+
+def _read_parts(parts: List[Path], columns: Sequence[str], expr) -> pd.DataFrame:
+    pa, _, pq = _pa()
+    columns = list(columns)
+    if not parts:
+        return pd.DataFrame({c: pd.Series(dtype=object) for c in columns})
+
+    if len(parts) == 1:
+        table = pq.read_table(parts[0], columns=columns, filters=expr, memory_map=True)
+        return table.to_pandas(date_as_object=False)
+
+    read_cols = list(dict.fromkeys(KEY_COLUMNS + columns + ["filled"]))
+    tables    = []
+    for n, path in enumerate(parts):
+        t = pq.read_table(path, columns=read_cols, filters=expr, memory_map=True)
+        tables.append(t.append_column("_part", pa.array(np.full(len(t), n, dtype=np.int32))))
+    df = pa.concat_tables(tables).to_pandas(date_as_object=False)
+
+    # Real rows beat gap fills; among equals the newest partition wins
+    df["_real"] = ~df["filled"]
+    df = (df.sort_values(KEY_COLUMNS + ["_real", "_part"], kind="stable")
+            .drop_duplicates(KEY_COLUMNS, keep="last"))
+    return df[columns].reset_index(drop=True)
+
+
+def item_history(store_id: str, item_id: str):
+    """(dates, sales) arrays for one item, for ForecastService.build_series_from_arrays."""
+    df = read_frame(store_id, ("date", "sales"), item_ids=[item_id])
+    return df["date"].to_numpy(), df["sales"].to_numpy(dtype=float)
+
+
+def compact(store_id: str, drop_item_ids: Iterable[str] = ()) -> None:
+    """
+    Rewrite a store's partitions as one, optionally dropping items. The new
+    partition is written first; the ones it replaces are left for _sweep.
+    """
+    _sweep(store_id)
+    parts = _parts(store_id)
+    if not parts:
+        return
+    df = _read_parts(parts, ("item_id", "date", "sales", "price", "promo", "filled"), None)
+    drop = {str(i) for i in drop_item_ids}
+    if drop:
+        df = df[~df["item_id"].isin(drop)]
+    _write_part(store_id, df.sort_values(KEY_COLUMNS, kind="stable"),
+                ts=_part_ts(parts[-1]), compacted=True)
+
+
+def maybe_compact(store_ids: Iterable[str]) -> None:
+    for store_id in store_ids:
+        if len(_parts(store_id)) > Config.SALES_PARQUET_MAX_PARTS:
+            compact(store_id)
+        else:
+            _sweep(store_id)
+
+
+def backfill(store_id: Optional[str] = None) -> dict:
+    """
+    Export every store's (or one store's) `sales_records` as a compacted
+    partition and mark the store backfilled. Partitions appended after the
+    export started stay live on top of it. Returns counts.
+    """
+    from models import db, Item, SalesRecord
+
+    stores = [store_id] if store_id else [
+        s for (s,) in db.session.query(Item.store_id).distinct().order_by(Item.store_id)
+    ]
+    counts = {"stores": 0, "rows": 0}
+    for store in stores:
+        ts   = time.time_ns()     # before the read: later appends must win
+        rows = (
+            db.session.query(Item.item_id, SalesRecord.date, SalesRecord.sales,
+                             SalesRecord.price, SalesRecord.promo)
+            .join(Item, Item.id == SalesRecord.item_pk)
+            .filter(Item.store_id == store)
+            .all()
+        )
+        df = pd.DataFrame(rows, columns=["item_id", "date", "sales", "price", "promo"])
+        frame = pd.DataFrame({
+            "item_id": df["item_id"].astype(str),
+            "date":    pd.to_datetime(df["date"]).dt.date,
+            "sales":   pd.to_numeric(df["sales"], errors="coerce").fillna(0).astype(float),
+            "price":   pd.to_numeric(df["price"], errors="coerce").astype(float),
+            "promo":   pd.to_numeric(df["promo"], errors="coerce").fillna(0).astype("int32"),
+            "filled":  False,
+        })
+        _write_part(store, frame.sort_values(KEY_COLUMNS, kind="stable"), ts=ts, compacted=True)
+        (_store_dir(store) / BACKFILL_MARKER).write_text(pd.Timestamp.utcnow().isoformat())
+        counts["stores"] += 1
+        counts["rows"]   += len(frame)
+    return counts
@@ -1,6 +1,6 @@
 import pandas as pd
 import numpy as np
-from typing import Tuple
+from typing import Iterator, Optional, Tuple
 
 
 def clean_dataframe(df: pd.DataFrame) -> Tuple[pd.DataFrame, dict]:
@@ -49,24 +49,16 @@ def clean_dataframe(df: pd.DataFrame) -> Tuple[pd.DataFrame, dict]:
     df['sales'] = df['sales'].clip(lower=0)
     report['steps'].append(f'Negative sales clipped to 0: {n_neg} rows')
 
-    total_capped = 0
-    def cap_outliers(group):
-        nonlocal total_capped
-        key = getattr(group, 'name', None)
-        group = group.copy()
-        if 'item_id' not in group.columns and key is not None:
-            group['item_id'] = key
-
-        q1  = group['sales'].quantile(0.25)
-        q3  = group['sales'].quantile(0.75)
-        iqr = q3 - q1
-        upper = q3 + 3.0 * iqr          
-        n = (group['sales'] > upper).sum()
-        total_capped += n
-        group['sales'] = group['sales'].clip(upper=upper)
-        return group
-
-    df = df.groupby('item_id', group_keys=False).apply(cap_outliers)
+    # Per-item IQR bounds in one grouped pass, broadcast back by item_id
+    quartiles = df.groupby('item_id')['sales'].quantile([0.25, 0.75]).unstack()
+    upper_by_item = quartiles[0.75] + 3.0 * (quartiles[0.75] - quartiles[0.25])
+    upper = df['item_id'].map(upper_by_item)
+    total_capped = int((df['sales'] > upper).sum())
+    df['sales'] = df['sales'].clip(upper=upper)
+
+    # Same layout the former groupby().apply() produced: original row label
+    # kept as an 'index' column and item_id moved last.
+    df = df[[c for c in df.columns if c != 'item_id'] + ['item_id']]
     df = df.reset_index()
     df['sales'] = df['sales'].round(0).astype(int)
     report['steps'].append(f'Outliers capped at Q3 + 3×IQR per item: {total_capped} values')
@@ -87,29 +79,234 @@ def _fill_missing_dates(df: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
     if 'store_id' in df.columns:
         group_cols = ['store_id'] + group_cols
 
+    # Every (group, day) pair over the global date range, built as one
+    # MultiIndex and applied with a single reindex.
     full_date_range = pd.date_range(df['date'].min(), df['date'].max(), freq='D')
-    pieces  = []
-    filled  = 0
-
-    for keys, grp in df.groupby(group_cols):
-        grp = grp.set_index('date').reindex(full_date_range)
-        grp.index.name = 'date'
-        grp = grp.reset_index()
-
-        if isinstance(keys, str):
-            keys = (keys,)
-        for col, val in zip(group_cols, keys):
-            if col in grp.columns:
-                grp[col] = grp[col].fillna(val)
-            else:
-                grp[col] = val
-
-        n_before = grp['sales'].isna().sum()
-        grp['sales'] = grp['sales'].fillna(0).astype(int)
-        filled += int(n_before)
-        pieces.append(grp)
-
-    return pd.concat(pieces, ignore_index=True), filled
+    keys = df[group_cols].drop_duplicates().dropna().sort_values(group_cols)
+    keys = keys.loc[keys.index.repeat(len(full_date_range))]
+    full_index = pd.MultiIndex.from_arrays(
+        [keys[c] for c in group_cols]
+        + [np.tile(full_date_range.values, len(keys) // max(len(full_date_range), 1))],
+        names=group_cols + ['date'],
+    )
+
+    out = df.set_index(group_cols + ['date']).reindex(full_index)
+    filled = int(out['sales'].isna().sum())
+    out['sales'] = out['sales'].fillna(0).astype(int)
+
+    out = out.reset_index()
+    return out[['date'] + [c for c in df.columns if c != 'date']], filled
+
+
+class StreamingCleaner:
+    """
+    clean_dataframe for inputs too large to hold in memory, in three passes
+    over a re-readable source:
+
+      1. observe(chunk) for every chunk — null counts, global date range,
+         the set of (store, item) groups and a 64-bit hash of every row's
+         (date, item[, store]) key. The hashes show which keys occur more
+         than once anywhere in the input, across chunks included.
+      2. measure(chunk) for every chunk — per-item value histograms of the
+         keys that occur once, and the summed sales of the duplicated keys.
+         finalize() adds the merged values to the histograms and derives the
+         same Q3 + 3×IQR bounds as the in-memory pipeline (linear-interpolated
+         quantiles), i.e. after duplicate merging.
+      3. clean_chunk(chunk) for every chunk — cast, drop duplicated keys,
+         clip negatives, cap with the carried bounds, round. merged_frame()
+         returns the duplicated keys once each, cleaned the same way, and
+         missing_date_frames() yields the zero-sales rows for the global date
+         range in group batches.
+
+    State is per item (histograms), per group (keys) and per duplicated key;
+    per row only the 8-byte key hash is kept.
+    """
+
+    def __init__(self):
+        self.rows_read   = 0
+        self.n_cols      = 0
+        self.null_dates  = 0
+        self.null_sales  = 0
+        self.null_items  = 0
+        self.dropped_key = 0
+        self.n_negative  = 0
+        self.n_dupes     = 0
+        self.n_capped    = 0
+        self.min_date    = None
+        self.max_date    = None
+        self.has_store   = False
+        self.groups: set = set()
+        self.upper: Optional[pd.Series] = None
+        self._hist: Optional[pd.Series] = None
+        self._hashes: list = []
+        self._dup_hashes: Optional[np.ndarray] = None
+        self._merged: Optional[pd.Series] = None
+
+    @staticmethod
+    def _cast(df: pd.DataFrame) -> pd.DataFrame:
+        df = df.copy()
+        df.columns = [c.strip().lower().replace(' ', '_') for c in df.columns]
+        missing_cols = {'date', 'item_id', 'sales'} - set(df.columns)
+        if missing_cols:
+            raise ValueError(f"Missing required columns: {missing_cols}")
+        df['date']  = pd.to_datetime(df['date'], errors='coerce')
+        df['sales'] = pd.to_numeric(df['sales'], errors='coerce')
+        # Keys as strings, so a chunk read as ints matches one read as text
+        for col in ('item_id', 'store_id'):
+            if col in df.columns:
+                df[col] = df[col].astype(str).where(df[col].notna())
+        return df
+
+    @staticmethod
+    def _keyed(df: pd.DataFrame) -> Tuple[pd.DataFrame, list]:
+        """Rows that can be written (date, item and store present) and their key columns."""
+        df = df.dropna(subset=['date', 'item_id'])
+        if 'store_id' in df.columns:
+            df = df.dropna(subset=['store_id'])    # such rows never form a group
+        key_cols = ['date', 'item_id'] + (['store_id'] if 'store_id' in df.columns else [])
+        return df, key_cols
+
+    @staticmethod
+    def _hash(df: pd.DataFrame, key_cols: list) -> np.ndarray:
+        return pd.util.hash_pandas_object(df[key_cols], index=False).to_numpy()
+
+    def _is_dup(self, df: pd.DataFrame, key_cols: list) -> np.ndarray:
+        if self._dup_hashes is None:
+            hashes, counts = np.unique(np.concatenate(self._hashes or [np.empty(0, np.uint64)]),
+                                       return_counts=True)
+            self._dup_hashes = hashes[counts > 1]
+            self.n_dupes     = int((counts - 1).sum())
+            self._hashes     = []
+        return np.isin(self._hash(df, key_cols), self._dup_hashes)
+
+    def observe(self, chunk: pd.DataFrame) -> None:
+        df = self._cast(chunk)
+        self.rows_read  += len(df)
+        self.n_cols      = df.shape[1]
+        self.has_store   = 'store_id' in df.columns
+        self.null_dates += int(df['date'].isna().sum())
+        self.null_sales += int(df['sales'].isna().sum())
+        self.null_items += int(df['item_id'].isna().sum())
+
+        before = len(df)
+        df = df.dropna(subset=['date', 'item_id'])
+        self.dropped_key += before - len(df)
+        if df.empty:
+            return
+
+        lo, hi = df['date'].min(), df['date'].max()
+        self.min_date = lo if self.min_date is None else min(self.min_date, lo)
+        self.max_date = hi if self.max_date is None else max(self.max_date, hi)
+
+        group_cols = (['store_id'] if self.has_store else []) + ['item_id']
+        self.groups.update(map(tuple, df[group_cols].dropna().drop_duplicates().to_numpy()))
+
+        df, key_cols = self._keyed(df)
+        self._hashes.append(self._hash(df, key_cols))
+
+    def measure(self, chunk: pd.DataFrame) -> None:
+        df, key_cols = self._keyed(self._cast(chunk))
+        if df.empty:
+            return
+        sales = df['sales'].fillna(0)
+        dup   = self._is_dup(df, key_cols)
+
+        if dup.any():
+            sums = sales[dup].groupby([df.loc[dup, c] for c in key_cols]).sum()
+            self._merged = sums if self._merged is None else self._merged.add(sums, fill_value=0)
+
+        single = sales[~dup]
+        self.n_negative += int((single < 0).sum())
+        self._add_hist(df.loc[~dup, 'item_id'], single.clip(lower=0))
+
+    def _add_hist(self, items: pd.Series, sales: pd.Series) -> None:
+        hist = sales.groupby([items, sales]).size()
+        self._hist = hist if self._hist is None else self._hist.add(hist, fill_value=0)
+
+    def finalize(self) -> None:
+        """Merge the duplicated keys into the histograms, then turn those into upper outlier bounds."""
+        if self._merged is not None:
+            self.n_negative += int((self._merged < 0).sum())
+            self._merged = self._merged.clip(lower=0)
+            self._add_hist(pd.Series(self._merged.index.get_level_values('item_id')),
+                           pd.Series(self._merged.to_numpy(), name='sales'))
+        if self._hist is None:
+            self.upper = pd.Series(dtype=float)
+            return
+        hist   = self._hist.sort_index()
+        items  = hist.index.get_level_values(0)
+        values = hist.index.get_level_values(1).to_numpy(dtype=float)
+        counts = hist.to_numpy(dtype=np.int64)
+        cum    = np.cumsum(counts)
+
+        n      = hist.groupby(level=0, sort=False).sum()
+        offset = (cum - counts)[~items.duplicated()]      # elements before each item
+
+        def _quantile(q):
+            pos  = q * (n.to_numpy() - 1)
+            lo_k = np.floor(pos).astype(np.int64)
+            hi_k = np.ceil(pos).astype(np.int64)
+            v_lo = values[np.searchsorted(cum, offset + lo_k, side='right')]
+            v_hi = values[np.searchsorted(cum, offset + hi_k, side='right')]
+            return v_lo + (pos - lo_k) * (v_hi - v_lo)
+
+        q1, q3 = _quantile(0.25), _quantile(0.75)
+        self.upper = pd.Series(q3 + 3.0 * (q3 - q1), index=n.index)
+
+    def _cap(self, df: pd.DataFrame) -> pd.DataFrame:
+        df['sales'] = df['sales'].clip(lower=0)
+        upper = df['item_id'].map(self.upper)
+        self.n_capped += int((df['sales'] > upper).sum())
+        df['sales'] = df['sales'].clip(upper=upper).round(0).astype(int)
+        return df
+
+    def clean_chunk(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """The chunk's rows whose key occurs once; duplicated keys come from merged_frame()."""
+        df, key_cols = self._keyed(self._cast(chunk))
+        if df.empty:
+            return df
+        df = df[~self._is_dup(df, key_cols)].copy()
+        df['sales'] = df['sales'].fillna(0)
+        return self._cap(df)
+
+    def merged_frame(self) -> pd.DataFrame:
+        """One row per duplicated key with the summed (then clipped and capped) sales."""
+        if self._merged is None:
+            return pd.DataFrame(columns=['date', 'item_id', 'sales'])
+        return self._cap(self._merged.rename('sales').reset_index())
+
+    def missing_date_frames(self, max_rows: int = 100_000) -> Iterator[pd.DataFrame]:
+        """Zero-sales rows for every group × day in the global range, in batches."""
+        if self.min_date is None:
+            return
+        days       = pd.date_range(self.min_date, self.max_date, freq='D')
+        group_cols = (['store_id'] if self.has_store else []) + ['item_id']
+        groups     = sorted(self.groups)
+        per_batch  = max(1, max_rows // len(days))
+        for start in range(0, len(groups), per_batch):
+            batch = pd.DataFrame(groups[start:start + per_batch], columns=group_cols)
+            batch = batch.loc[batch.index.repeat(len(days))].reset_index(drop=True)
+            batch['date']  = np.tile(days.values, len(batch) // len(days))
+            batch['sales'] = 0
+            yield batch
+
+    def report(self, rows_written: int, filled: int) -> dict:
+        """Same shape as clean_dataframe's report, aggregated over all chunks."""
+        return {
+            'original_shape': (self.rows_read, self.n_cols),
+            'final_shape':    (rows_written, self.n_cols),
+            'steps': [
+                'Column names standardised (lowercase, underscores)',
+                'Types cast: date → datetime, sales → numeric',
+                f'Nulls: date={self.null_dates}, item_id={self.null_items}, '
+                f'sales={self.null_sales} (sales→0). Dropped {self.dropped_key} rows with null date/item_id.',
+                f'Duplicates: {self.n_dupes} merged by summing sales' if self.n_dupes
+                else 'Duplicates: none found',
+                f'Negative sales clipped to 0: {self.n_negative} rows',
+                f'Outliers capped at Q3 + 3×IQR per item: {self.n_capped} values',
+                f'Missing calendar days filled with 0 sales: {filled} rows added',
+            ],
+        }
 
 
 def print_cleaning_report(report: dict):
@@ -0,0 +1,210 @@
+"""
+src/decomposition.py — Cached, incrementally updated seasonal decompositions.
+
+Same result as statsmodels' additive `seasonal_decompose` (the centered
+moving-average trend, per-phase means of the detrended series as the
+seasonal component, the rest as residual), kept per (item, seasonal_period)
+in an in-process cache as a small state:
+
+  observed   the daily series
+  trend      the centered moving average, NaN for the first and last
+             period//2 days
+  sums/cnts  per-phase sums and counts of observed − trend
+
+When days are appended only the tail of the trend changes: the last
+period//2 values that were NaN and the new days. Those are computed from the
+new days and the 2 × (period//2) before them, and their detrended values are
+added to the phase sums. Seasonal and residual follow from the state in a couple of array
+operations.
+
+A cached state is checked against the item's ItemSalesSummary, which every
+upload refreshes. An unchanged summary is served without loading the
+history. If only later days were added (same first day, and the record count
+and sales total match the cached rows plus the new ones), just those rows are
+read. Anything else rebuilds from the full series.
+"""
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from models import db, SalesRecord
+from src.forecast_cache import ForecastCache
+from src.downsample import downsample
+from src.forecast_service import _series_to_list
+
+# freq= of a decomposition response → pandas resample rule (bucket means)
+FREQS = {"D": None, "W": "W", "M": "MS"}
+
+decomposition_cache = ForecastCache(
+    maxsize=Config.FORECAST_CACHE_SIZE,
+    ttl=Config.FORECAST_CACHE_TTL,
+)
+
+
+def _trend_weights(period: int) -> np.ndarray:
+    """statsmodels' centered moving-average filter; 2 * (period // 2) + 1 taps."""
+    if period % 2 == 0:
+        return np.r_[0.5, np.ones(period - 1), 0.5] / period
+    return np.ones(period) / period
+
+
+def _phase_sums(detrended: np.ndarray, first: int, period: int) -> Tuple[np.ndarray, np.ndarray]:
+    phase = (first + np.arange(len(detrended))) % period
+    return (np.bincount(phase, weights=detrended, minlength=period),
+            np.bincount(phase, minlength=period))
+
+
+def build_state(series: pd.Series, period: int) -> Dict[str, Any]:
+    """Decomposition state of a full daily series."""
+    if len(series) < 2 * period:
+        raise ValueError("Insufficient data for decomposition (need ≥ 2 seasonal periods).")
+    obs   = series.to_numpy(dtype=float)
+    half  = period // 2
+    trend = np.full(len(obs), np.nan)
+    trend[half:len(obs) - half] = np.convolve(obs, _trend_weights(period), mode="valid")
+    sums, counts = _phase_sums(obs[half:len(obs) - half] - trend[half:len(obs) - half], half, period)
+    return {
+        "start":    series.index[0].date(),
+        "period":   period,
+        "observed": obs,
+        "trend":    trend,
+        "sums":     sums,
+        "counts":   counts,
+    }
+
+
+def extend_state(state: Dict[str, Any], new_values: np.ndarray) -> Dict[str, Any]:
+    """The state with `new_values` appended as the following days; `state` is left as is."""
+    period, half = state["period"], state["period"] // 2
+    n0  = len(state["observed"])
+    obs = np.concatenate([state["observed"], np.asarray(new_values, dtype=float)])
+    n1  = len(obs)
+    if n1 == n0:
+        return state
+
+    # Trend becomes defined on [n0 - half, n1 - half): needs obs[n0 - 2*half:n1]
+    tail  = np.convolve(obs[n0 - 2 * half:], _trend_weights(period), mode="valid")
+    trend = np.concatenate([state["trend"][:n0 - half], tail, np.full(half, np.nan)])
+    sums, counts = _phase_sums(obs[n0 - half:n1 - half] - tail, n0 - half, period)
+    return {
+        **state,
+        "observed": obs,
+        "trend":    trend,
+        "sums":     state["sums"] + sums,
+        "counts":   state["counts"] + counts,
+    }
+
+
+def components(state: Dict[str, Any]) -> Dict[str, pd.Series]:
+    """observed, trend, seasonal and residual series of a state."""
+    period = state["period"]
+    avg    = state["sums"] / state["counts"]
+    avg   -= avg.mean()
+    n      = len(state["observed"])
+    index  = pd.date_range(state["start"], periods=n, freq="D", name="date")
+    season = avg[np.arange(n) % period]
+    return {
+        "observed": pd.Series(state["observed"], index=index),
+        "trend":    pd.Series(state["trend"], index=index),
+        "seasonal": pd.Series(season, index=index),
+        "residual": pd.Series(state["observed"] - state["trend"] - season, index=index),
+    }
+
+
+def render(state: Dict[str, Any], start: Optional[date] = None, end: Optional[date] = None,
+           freq: str = "D", max_points: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Response for the days in [start, end] (both optional), as bucket means
+    per week or month with freq W / M, each component LTTB-downsampled to
+    max_points. Trend and residual leave out the days where the trend is
+    undefined, like the uncached response.
+    """
+    if freq not in FREQS:
+        raise ValueError(f"Unknown freq '{freq}'; expected one of {', '.join(FREQS)}.")
+    n  = len(state["observed"])
+    lo = 0 if start is None else min(max((start - state["start"]).days, 0), n)
+    hi = n if end is None else min(max((end - state["start"]).days + 1, lo), n)
+
+    out = {}
+    for name, s in components(state).items():
+        s = s.iloc[lo:hi]
+        if FREQS[freq]:
+            s = s.resample(FREQS[freq]).mean()
+        out[name] = s
+    return {
+        "trend":    _series_to_list(downsample(out["trend"].dropna(), max_points)),
+        "seasonal": _series_to_list(downsample(out["seasonal"], max_points)),
+        "residual": _series_to_list(downsample(out["residual"].dropna(), max_points)),
+        "observed": _series_to_list(downsample(out["observed"], max_points)),
+    }
+
+
+# ── Cache ────────────────────────────────────────────────────────────────
+
+def summary_stamp(item) -> Optional[Dict[str, Any]]:
+    """What a cached state is checked against; read it before loading the series."""
+    from src.rollups import ensure_item_summaries
+
+    summary = ensure_item_summaries([item.id]).get(item.id)
+    if summary is None or summary.first_date is None:
+        return None
+    return {
+        "version":      (summary.first_date, summary.last_date, summary.record_count, summary.updated_at),
+        "first_date":   summary.first_date,
+        "last_date":    summary.last_date,
+        "record_count": summary.record_count,
+        "total_sales":  float(summary.total_sales),
+    }
+
+
+def _appended_days(state: Dict[str, Any], item_pk: int, stamp: Dict[str, Any]) -> Optional[np.ndarray]:
+    """Daily sales after the cached last day, or None unless they are the only change."""
+    last = state["start"] + timedelta(days=len(state["observed"]) - 1)
+    if stamp["first_date"] != state["start"] or stamp["last_date"] < last:
+        return None
+    rows = (
+        db.session.query(SalesRecord.date, SalesRecord.sales)
+        .filter(SalesRecord.item_pk == item_pk, SalesRecord.date > last)
+        .order_by(SalesRecord.date)
+        .all()
+    )
+    sales = np.array([s or 0.0 for _, s in rows], dtype=float)
+    if (state["stamp"]["record_count"] + len(rows) != stamp["record_count"]
+            or not np.isclose(state["stamp"]["total_sales"] + sales.sum(), stamp["total_sales"])):
+        return None
+    days = np.zeros((stamp["last_date"] - last).days)
+    days[[(d - last).days - 1 for d, _ in rows]] = sales
+    return days
+
+
+def current_state(item, period: int, stamp: Optional[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], str]:
+    """
+    (state, "hit" | "extended") from the cache when it is current or only
+    needs appended days, else (None, "miss"): rebuild with store_state.
+    """
+    state = decomposition_cache.get((item.id, period))
+    if state is None or stamp is None:
+        return None, "miss"
+    if stamp["version"] == state["stamp"]["version"]:
+        return state, "hit"
+
+    days = _appended_days(state, item.id, stamp)
+    if days is None:
+        return None, "miss"
+    state = {**extend_state(state, days), "stamp": stamp}
+    decomposition_cache.set((item.id, period), state)
+    return state, "extended"
+
+
+def store_state(item, period: int, series: pd.Series, stamp: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build the state of `series` and cache it under the stamp read before loading it."""
+    state = build_state(series, period)
+    if stamp is not None:
+        state["stamp"] = stamp
+        decomposition_cache.set((item.id, period), state)
+    return state
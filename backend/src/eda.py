@@ -8,7 +8,14 @@ from pathlib import Path
 COLORS = ['#2C3E50', '#3498DB', '#E67E22', '#27AE60', '#E74C3C']
 
 
-def run_eda(df: pd.DataFrame, output_dir: str = "outputs/eda") -> None:
+def run_eda(df: pd.DataFrame = None, output_dir: str = "outputs/eda",
+            store_id: str = None) -> None:
+    """Charts for `df`, or for a store's Parquet history (src/columnar_store.py) when df is None."""
+    if df is None:
+        from src import columnar_store
+        if not store_id or not columnar_store.serves(store_id):
+            raise ValueError(f"Store '{store_id}' is not read from Parquet; pass df or run backfill-parquet.")
+        df = columnar_store.read_frame(store_id, columns=("item_id", "date", "sales"))
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     items = sorted(df['item_id'].unique())
 
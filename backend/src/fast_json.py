@@ -0,0 +1,56 @@
+"""
+src/fast_json.py — JSON responses through orjson when it is installed.
+
+orjson encodes dicts and lists several times faster than the stdlib
+encoder behind jsonify. It also writes NumPy arrays and scalars directly
+(OPT_SERIALIZE_NUMPY), so compact forecast series can stay float arrays
+up to the wire. Without orjson the stdlib encoder is used, with a default
+hook that converts NumPy values.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Iterable, Optional
+
+import numpy as np
+from flask import Response
+
+try:
+    import orjson
+except ImportError:   # pragma: no cover - optional dependency
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+                            default=_default)
+    return json.dumps(obj, default=_default, separators=(",", ":")).encode()
+
+
+def json_response(obj: Any, status: int = 200) -> Response:
+    """Drop-in for `jsonify(obj), status` on large payloads."""
+    return Response(dumps(obj), status=status, mimetype="application/json")
+
+
+def project(result: dict, fields: Optional[Iterable[str]], keep: Iterable[str] = ()) -> dict:
+    """Only the requested top-level keys (plus `keep`); None → everything."""
+    if not fields:
+        return result
+    wanted = set(fields) | set(keep)
+    return {k: v for k, v in result.items() if k in wanted}
+
+
+def parse_fields(raw: Optional[str]) -> Optional[list]:
+    """'forecast,restock' → ['forecast', 'restock']; None/'' → None."""
+    if not raw:
+        return None
+    return [f.strip() for f in raw.split(",") if f.strip()] or None
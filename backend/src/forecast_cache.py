@@ -0,0 +1,75 @@
+"""
+src/forecast_cache.py — In-process LRU/TTL cache for full_forecast results.
+
+Keys combine the item, a content fingerprint of its sales series and every
+parameter that changes the output, so an unchanged series with the same
+request parameters is served without refitting. Writes through the items
+API also invalidate explicitly, which keeps a single process consistent
+even before the fingerprint is recomputed.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+import pandas as pd
+
+from config import Config
+
+
+def series_fingerprint(series: pd.Series) -> int:
+    """Content hash of a daily series (dates and values)."""
+    hashed = pd.util.hash_pandas_object(series, index=True).values
+    return int(hashed.sum()) ^ len(series)
+
+
+class ForecastCache:
+    def __init__(self, maxsize: int = 256, ttl: float = 600.0):
+        self.maxsize = maxsize
+        self.ttl     = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits   = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, item_pk: int) -> None:
+        """Drop every entry for an item; keys are tuples starting with item_pk."""
+        with self._lock:
+            for key in [k for k in self._data if k[0] == item_pk]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+forecast_cache = ForecastCache(
+    maxsize=Config.FORECAST_CACHE_SIZE,
+    ttl=Config.FORECAST_CACHE_TTL,
+)
@@ -2,19 +2,135 @@ from __future__ import annotations
 
 import io
 import csv
+import functools
 import pandas as pd
 import numpy as np
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Sequence
 
 from src.forecasting_engine import DemandForecaster
+from src.intervals import level_label
+from src.instrumentation import stage
+from src.downsample import downsample
 from config import Config
 
 
+METHODS = ("moving_average", "ses", "holt_winters")
+
+# include= components of a forecast response and the keys each one adds
+COMPONENTS = {
+    "historical": ("historical",),
+    "forecast":   ("forecast", "ci_upper", "ci_lower", "quantiles"),
+    "comparison": ("all_forecasts",),
+    "metrics":    ("metrics", "train_size", "test_size"),
+    "restock":    ("restock",),
+}
+
+
+def parse_include(raw: Optional[str]) -> Optional[list]:
+    """'forecast,restock' → ['forecast', 'restock']; None/'' → None (everything)."""
+    if not raw:
+        return None
+    parts   = [p.strip() for p in raw.split(",") if p.strip()]
+    unknown = [p for p in parts if p not in COMPONENTS]
+    if unknown:
+        raise ValueError(f"Unknown include component(s): {', '.join(unknown)}; "
+                         f"expected any of {', '.join(COMPONENTS)}.")
+    return parts or None
+
+
+def select_components(result: Dict[str, Any], include: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """Drop the keys of components not in `include` (e.g. from a stored snapshot)."""
+    if not include:
+        return result
+    drop = {k for c, keys in COMPONENTS.items() if c not in include for k in keys}
+    return {k: v for k, v in result.items() if k not in drop}
+
+
+def needs_full_hw(method: str, include: Optional[Sequence[str]]) -> bool:
+    """Whether full_forecast uses its full-series Holt-Winters fit (`hw_full`) for these components."""
+    return (not include or "restock" in include
+            or ("forecast" in include and method not in ("moving_average", "ses")))
+
+
 def _series_to_list(s: pd.Series) -> list[dict]:
-    return [
-        {"date": d.strftime("%Y-%m-%d"), "value": round(float(v), 2)}
-        for d, v in s.items()
-    ]
+    with stage("to_list"):
+        return [
+            {"date": d.strftime("%Y-%m-%d"), "value": round(float(v), 2)}
+            for d, v in s.items()
+        ]
+
+
+def _series_to_compact(s: pd.Series) -> dict:
+    """
+    Compact form of a daily series: start date + float array (encoded by
+    src/fast_json.py). A series with days left out (downsampled) also gets
+    `offsets`, each value's day number counted from `start`.
+    """
+    with stage("to_compact"):
+        out = {
+            "start":  s.index[0].strftime("%Y-%m-%d") if len(s) else None,
+            "freq":   "D",
+            "values": np.round(s.to_numpy(dtype=float), 2),
+        }
+        offsets = (s.index - s.index[0]).days.to_numpy() if len(s) else None
+        if offsets is not None and offsets[-1] != len(s) - 1:
+            out["offsets"] = offsets
+        return out
+
+
+def _list_to_compact(rows: list) -> dict:
+    out = {
+        "start":  rows[0]["date"] if rows else None,
+        "freq":   "D",
+        "values": [r["value"] for r in rows],
+    }
+    if rows:
+        days = np.array([r["date"] for r in rows], dtype="datetime64[D]").astype(int)
+        if days[-1] - days[0] != len(rows) - 1:
+            out["offsets"] = days - days[0]
+    return out
+
+
+# Response keys holding a series, or a dict of series
+_SERIES_KEYS      = ("historical", "forecast", "ci_upper", "ci_lower")
+_SERIES_DICT_KEYS = ("all_forecasts", "quantiles")
+
+def to_compact(result: Dict[str, Any]) -> Dict[str, Any]:
+    """A list-format response (e.g. a stored snapshot) in compact form."""
+    out = dict(result)
+    for k in _SERIES_KEYS:
+        if k in out:
+            out[k] = _list_to_compact(out[k])
+    for k in _SERIES_DICT_KEYS:
+        if k in out:
+            out[k] = {name: _list_to_compact(rows) for name, rows in out[k].items()}
+    out["format"] = "compact"
+    return out
+
+
+def _by_date(series) -> dict:
+    """{date: value} from either series format."""
+    if isinstance(series, dict):
+        if not len(series["values"]):
+            return {}
+        if "offsets" in series:
+            dates = pd.Timestamp(series["start"]) + pd.to_timedelta(series["offsets"], unit="D")
+        else:
+            dates = pd.date_range(series["start"], periods=len(series["values"]), freq=series["freq"])
+        return {d.strftime("%Y-%m-%d"): float(v) for d, v in zip(dates, series["values"])}
+    return {r["date"]: r["value"] for r in series}
+
+
+def _native_dict(d: dict) -> dict:
+    """Convert NumPy scalars to plain Python so the dict is JSON-serialisable."""
+    return {
+        k: (int(v) if isinstance(v, (np.integer,))
+            else float(v) if isinstance(v, (np.floating,))
+            else bool(v) if isinstance(v, (np.bool_,))
+            else v)
+        for k, v in d.items()
+    }
+
 
 class ForecastService:
     def __init__(self, seasonal_period: int = Config.DEFAULT_SEASONAL_PERIOD):
@@ -25,13 +141,33 @@ class ForecastService:
         """records: list of SalesRecord ORM objects."""
         if not records:
             raise ValueError("No sales data available.")
-        rows = [{"date": r.date, "sales": r.sales} for r in records]
-        df   = pd.DataFrame(rows)
-        df["date"] = pd.to_datetime(df["date"])
-        series = df.set_index("date")["sales"].sort_index()
+        return self.build_series_from_arrays(
+            [r.date for r in records], [r.sales for r in records]
+        )
+
+    def build_series_from_arrays(self, dates, sales) -> pd.Series:
+        """Columnar variant of build_series: parallel date and sales arrays."""
+        if len(dates) == 0:
+            raise ValueError("No sales data available.")
+        index  = pd.DatetimeIndex(np.asarray(dates, dtype="datetime64[ns]"), name="date")
+        values = np.asarray(sales, dtype=float)
+        series = pd.Series(values, index=index, name="sales").sort_index()
         series = series.resample("D").sum().fillna(0)
         return series
 
+    def _restock(self, res: Dict[str, Any], current_stock: int, lead_time: int,
+                 safety_factor: float, service_level: Optional[float]) -> Dict[str, Any]:
+        """Flat safety factor, or the service-level quantile of demand when one is given."""
+        if service_level is not None:
+            return self.engine.service_level_restock(res, current_stock, lead_time, service_level)
+        return self.engine.restocking_recommendation(
+            res["forecast"], current_stock, lead_time, safety_factor
+        )
+
+    def _quantiles(self, res: Dict[str, Any], levels: Sequence[float], enc=_series_to_list) -> Dict[str, Any]:
+        return {level_label(lv): enc(q)
+                for lv, q in self.engine.quantile_forecast(res, levels).items()}
+
     def full_forecast(
         self,
         series:         pd.Series,
@@ -40,67 +176,168 @@ class ForecastService:
         lead_time:      int   = Config.DEFAULT_LEAD_TIME,
         safety_factor:  float = Config.DEFAULT_SAFETY_FACTOR,
         method:         str   = "holt_winters",
+        hw_full:        Dict[str, Any] = None,
+        service_level:  Optional[float] = None,
+        quantiles:      Optional[Sequence[float]] = None,
+        compact:        bool = False,
+        include:        Optional[Sequence[str]] = None,
+        max_points:     Optional[int] = None,
     ) -> Dict[str, Any]:
+        """
+        `hw_full`: a full-series Holt-Winters result to use instead of fitting one (src/warm_start.py).
+        `service_level`: size the order from that quantile of demand instead of `safety_factor`.
+        `quantiles`: levels (e.g. [0.1, 0.9]) of per-day forecast quantiles to add to the response.
+        `compact`: series as {start, freq, values} with NumPy values instead of [{date, value}].
+        `include`: components to compute (COMPONENTS; default all). Fits are
+        made only for what they need, once each: `forecast` alone is one fit.
+        `max_points`: LTTB-downsample `historical` to this many points (src/downsample.py).
+        """
         if len(series) < 14:
             raise ValueError(f"Insufficient data: need ≥14 days, got {len(series)}.")
+        include = set(include or COMPONENTS)
+        enc     = _series_to_compact if compact else _series_to_list
 
-        test_days    = min(Config.TEST_SPLIT_DAYS, len(series) // 4)
-        train_series = series.iloc[:-test_days] if test_days > 0 else series
-        test_series  = series.iloc[-test_days:] if test_days > 0 else pd.Series([], dtype=float)
-
-        ma_res  = self.engine.moving_average_forecast(train_series, window=7, horizon=horizon)
-        ses_res = self.engine.exponential_smoothing_forecast(train_series, horizon=horizon)
-        hw_res  = self.engine.holt_winters_forecast(train_series, horizon=horizon)
-
-        hw_fitted_full = self.engine.holt_winters_forecast(series, horizon=horizon)
-        metrics = {}
-        if len(test_series) > 0:
-            try:
-                metrics["ses"] = self.engine.evaluate(test_series, ses_res.get("forecast", pd.Series([], dtype=float)))
-                metrics["hw"]  = self.engine.evaluate(test_series, hw_res.get("forecast", pd.Series([], dtype=float)))
-            except Exception:
-                metrics = {}
-
-        # Use the FULL model for actual future predictions, not the train-split model
-        primary_forecast = hw_fitted_full["forecast"]
-        restock = self.engine.restocking_recommendation(
-            primary_forecast, current_stock, lead_time, safety_factor
-        )
+        @functools.cache
+        def split():
+            test_days = min(Config.TEST_SPLIT_DAYS, len(series) // 4)
+            if test_days == 0:
+                return series, pd.Series([], dtype=float)
+            return series.iloc[:-test_days], series.iloc[-test_days:]
+
+        # Holdout fits on the train split, for `comparison` and `metrics`
+        @functools.cache
+        def train_fit(m):
+            train = split()[0]
+            if m == "moving_average":
+                return self.engine.moving_average_forecast(train, window=7, horizon=horizon)
+            if m == "ses":
+                return self.engine.exponential_smoothing_forecast(train, horizon=horizon)
+            return self.engine.holt_winters_forecast(train, horizon=horizon)
+
+        @functools.cache
+        def hw_fitted_full():
+            return hw_full or self.engine.holt_winters_forecast(series, horizon=horizon)
 
-        full_method_map = {
-            "moving_average": lambda: self.engine.moving_average_forecast(series, window=7, horizon=horizon),
-            "ses": lambda: self.engine.exponential_smoothing_forecast(series, horizon=horizon),
-            "holt_winters": lambda: hw_fitted_full
-        }
-        
         # Only compute the full model for the selected method to save time
-        selected_full = full_method_map.get(method, full_method_map["holt_winters"])()
+        @functools.cache
+        def selected_full():
+            if method == "moving_average":
+                return self.engine.moving_average_forecast(series, window=7, horizon=horizon)
+            if method == "ses":
+                return self.engine.exponential_smoothing_forecast(series, horizon=horizon)
+            return hw_fitted_full()
 
-        return {
-            "historical":   _series_to_list(series),
-            "forecast":     _series_to_list(selected_full["forecast"]),
-            "ci_upper":     _series_to_list(selected_full["ci_upper"]),
-            "ci_lower":     _series_to_list(selected_full["ci_lower"]),
-            "all_forecasts": {
-                "moving_average": _series_to_list(ma_res["forecast"]),
-                "ses":            _series_to_list(ses_res["forecast"]),
-                "holt_winters":   _series_to_list(hw_res["forecast"]),
-            },
-            "metrics":      metrics,
-            "restock":      {
-                k: (int(v) if isinstance(v, (np.integer,))
-                    else float(v) if isinstance(v, (np.floating,))
-                    else bool(v) if isinstance(v, (np.bool_,))
-                    else v)
-                for k, v in restock.items()
-            },
-            "method":       method,
+        result = {}
+        if "historical" in include:
+            result["historical"] = enc(downsample(series, max_points))
+        if "forecast" in include:
+            result["forecast"] = enc(selected_full()["forecast"])
+            result["ci_upper"] = enc(selected_full()["ci_upper"])
+            result["ci_lower"] = enc(selected_full()["ci_lower"])
+        if "comparison" in include:
+            result["all_forecasts"] = {m: enc(train_fit(m)["forecast"]) for m in METHODS}
+        if "metrics" in include:
+            metrics, test_series = {}, split()[1]
+            if len(test_series) > 0:
+                try:
+                    metrics["ses"] = self.engine.evaluate(test_series, train_fit("ses")["forecast"])
+                    metrics["hw"]  = self.engine.evaluate(test_series, train_fit("holt_winters")["forecast"])
+                except Exception:
+                    metrics = {}
+            result["metrics"] = metrics
+        if "restock" in include:
+            # Use the FULL model for actual future predictions, not the train-split model
+            restock = self._restock(hw_fitted_full(), current_stock, lead_time, safety_factor, service_level)
+            result["restock"] = _native_dict(restock)
+
+        result["method"]  = method
+        result["horizon"] = horizon
+        # Smoothing summary from the holdout fits when they were made, else from the full fits
+        holdout  = bool({"comparison", "metrics"} & include)
+        ses_made = "forecast" in include and method == "ses"
+        hw_made  = "restock" in include or ("forecast" in include and method not in ("moving_average", "ses"))
+        ses_res  = train_fit("ses") if holdout else (selected_full() if ses_made else None)
+        hw_res   = train_fit("holt_winters") if holdout else (hw_fitted_full() if hw_made else None)
+        result["alpha"]    = (float(ses_res["alpha"]) if ses_res and ses_res.get("alpha") is not None else None)
+        result["seasonal"] = (bool(hw_res["seasonal"]) if hw_res and hw_res.get("seasonal") is not None else None)
+        if holdout:
+            result["train_size"] = len(split()[0])
+            result["test_size"]  = len(split()[1])
+
+        if quantiles and "forecast" in include:
+            result["quantiles"] = self._quantiles(selected_full(), quantiles, enc)
+        if compact:
+            result["format"] = "compact"
+        return result
+
+    def champion_forecast(
+        self,
+        series:         pd.Series,
+        champion:       str,
+        metrics:        Dict[str, Dict[str, float]],
+        horizon:        int   = Config.DEFAULT_HORIZON,
+        current_stock:  int   = Config.DEFAULT_CURRENT_STOCK,
+        lead_time:      int   = Config.DEFAULT_LEAD_TIME,
+        safety_factor:  float = Config.DEFAULT_SAFETY_FACTOR,
+        hw_full:        Dict[str, Any] = None,
+        service_level:  Optional[float] = None,
+        quantiles:      Optional[Sequence[float]] = None,
+        compact:        bool = False,
+        include:        Optional[Sequence[str]] = None,
+        max_points:     Optional[int] = None,
+        params:         Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        method=auto: fit only the champion (src/model_selection.py) on the
+        full series. Same response shape and options as full_forecast;
+        `metrics` are the backtest means that chose the champion instead of
+        a single holdout. `hw_full` is used as the fit when the champion is
+        Holt-Winters. `params` are the champion's stored parameters for this
+        series: the forecast is then run from them without fitting.
+        """
+        if len(series) < 14:
+            raise ValueError(f"Insufficient data: need ≥14 days, got {len(series)}.")
+
+        if champion == "moving_average":
+            window = (params or {}).get("window", 7)
+            res    = self.engine.moving_average_forecast(series, window=window, horizon=horizon)
+            params = {"window": res["window"]}
+        elif params is not None:
+            res = self.engine.holt_winters_from_state(series, params, horizon)
+        elif champion == "ses":
+            res    = self.engine.exponential_smoothing_forecast(series, horizon=horizon)
+            params = res["state"]
+        else:
+            res    = hw_full or self.engine.holt_winters_forecast(series, horizon=horizon)
+            params = res["state"]
+
+        restock = self._restock(res, current_stock, lead_time, safety_factor, service_level)
+        short   = {"moving_average": "ma", "ses": "ses", "holt_winters": "hw"}
+        enc     = _series_to_compact if compact else _series_to_list
+
+        result = {
+            "forecast":     enc(res["forecast"]),
+            "ci_upper":     enc(res["ci_upper"]),
+            "ci_lower":     enc(res["ci_lower"]),
+            "all_forecasts": {champion: enc(res["forecast"])},
+            "metrics":      {short[m]: {k: v for k, v in s.items() if k != "folds"}
+                             for m, s in metrics.items()},
+            "restock":      _native_dict(restock),
+            "method":       "auto",
+            "champion":     {"method": champion, "params": params},
             "horizon":      horizon,
-            "alpha":        (float(ses_res.get("alpha")) if ses_res.get("alpha") is not None else None),
-            "seasonal":     (bool(hw_res.get("seasonal")) if hw_res.get("seasonal") is not None else None),
-            "train_size":   len(train_series),
-            "test_size":    len(test_series),
+            "alpha":        params.get("alpha"),
+            "seasonal":     (bool(res["seasonal"]) if champion == "holt_winters" else None),
+            "train_size":   len(series),
+            "test_size":    0,
         }
+        if not include or "historical" in include:
+            result = {"historical": enc(downsample(series, max_points)), **result}
+        if quantiles:
+            result["quantiles"] = self._quantiles(res, quantiles, enc)
+        if compact:
+            result["format"] = "compact"
+        return select_components(result, include)
 
     def fast_restock_forecast(
         self,
@@ -109,6 +346,7 @@ class ForecastService:
         current_stock:  int   = Config.DEFAULT_CURRENT_STOCK,
         lead_time:      int   = Config.DEFAULT_LEAD_TIME,
         safety_factor:  float = Config.DEFAULT_SAFETY_FACTOR,
+        service_level:  Optional[float] = None,
     ) -> Dict[str, Any]:
         """A lightweight forecasting method that ONLY fits a single Holt-Winters model on the full series
         to return the restock recommendation. This avoids out-of-memory errors on bulk evaluations."""
@@ -117,22 +355,36 @@ class ForecastService:
 
         # Fit Holt-Winters on the entire series for actual future predictions
         hw_res = self.engine.holt_winters_forecast(series, horizon=horizon)
-        
-        primary_forecast = hw_res["forecast"]
-        restock = self.engine.restocking_recommendation(
-            primary_forecast, current_stock, lead_time, safety_factor
-        )
+        restock = self._restock(hw_res, current_stock, lead_time, safety_factor, service_level)
 
         return {
-            "restock": {
-                k: (int(v) if isinstance(v, (np.integer,))
-                    else float(v) if isinstance(v, (np.floating,))
-                    else bool(v) if isinstance(v, (np.bool_,))
-                    else v)
-                for k, v in restock.items()
-            }
+            "restock": _native_dict(restock)
         }
 
+    def batch_restock_forecast(
+        self,
+        series_by_key:  Dict[Any, pd.Series],
+        current_stock:  Dict[Any, int],
+        lead_time:      Dict[Any, int],
+        horizon:        int   = Config.DEFAULT_HORIZON,
+        safety_factor:  float = Config.DEFAULT_SAFETY_FACTOR,
+        service_level:  Optional[float] = None,
+    ) -> Dict[Any, Dict[str, Any]]:
+        """fast_restock_forecast for many SKUs using the batched NumPy Holt-Winters engine."""
+        out, eligible = {}, {}
+        for key, series in series_by_key.items():
+            if len(series) < 14:
+                out[key] = {"error": f"Insufficient data: need ≥14 days, got {len(series)}."}
+            else:
+                eligible[key] = series
+
+        fits = self.engine.holt_winters_forecast_many(eligible, horizon=horizon) if eligible else {}
+        for key, hw_res in fits.items():
+            restock = self._restock(hw_res, current_stock[key], lead_time[key],
+                                    safety_factor, service_level)
+            out[key] = {"restock": _native_dict(restock)}
+        return out
+
     def decompose(self, series: pd.Series) -> Dict[str, Any]:
         decomp = self.engine.decompose_series(series)
         if decomp is None:
@@ -147,10 +399,13 @@ class ForecastService:
     def export_csv(self, forecast_data: Dict[str, Any]) -> str:
         output = io.StringIO()
         writer = csv.writer(output)
-        writer.writerow(["date", "forecast", "ci_lower", "ci_upper"])
-        fc     = {r["date"]: r["value"] for r in forecast_data["forecast"]}
-        ci_lo  = {r["date"]: r["value"] for r in forecast_data["ci_lower"]}
-        ci_hi  = {r["date"]: r["value"] for r in forecast_data["ci_upper"]}
+        quants = forecast_data.get("quantiles") or {}
+        writer.writerow(["date", "forecast", "ci_lower", "ci_upper", *quants])
+        fc     = _by_date(forecast_data["forecast"])
+        ci_lo  = _by_date(forecast_data["ci_lower"])
+        ci_hi  = _by_date(forecast_data["ci_upper"])
+        q_vals = [_by_date(rows) for rows in quants.values()]
         for d in fc:
-            writer.writerow([d, fc[d], ci_lo.get(d, ""), ci_hi.get(d, "")])
+            writer.writerow([d, fc[d], ci_lo.get(d, ""), ci_hi.get(d, ""),
+                             *(q.get(d, "") for q in q_vals)])
         return output.getvalue()
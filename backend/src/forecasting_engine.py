@@ -3,6 +3,9 @@ import numpy as np
 from statsmodels.tsa.seasonal import seasonal_decompose
 from statsmodels.tsa.holtwinters import ExponentialSmoothing, SimpleExpSmoothing
 from sklearn.metrics import mean_absolute_error, mean_squared_error
+from src.hw_state import state_from_fit, start_params, propagate, forecast_from_state
+from src import intervals
+from src.instrumentation import counted
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -25,6 +28,7 @@ class DemandForecaster:
         series = series.resample('D').sum().fillna(0)
         return series
     
+    @counted("moving_average")
     def moving_average_forecast(self, series: pd.Series,
                                  window: int = 7, horizon: int = 30) -> dict:
         ma          = series.rolling(window=window, min_periods=1).mean()
@@ -34,19 +38,19 @@ class DemandForecaster:
 
         future_idx      = pd.date_range(series.index[-1] + pd.Timedelta(days=1),
                                          periods=horizon, freq='D')
-        forecast_values = np.full(horizon, last_ma)
-        ci_upper        = forecast_values + 1.96 * last_std
-        ci_lower        = np.maximum(forecast_values - 1.96 * last_std, 0)
+        forecast        = pd.Series(np.full(horizon, last_ma), index=future_idx)
 
         return {
             'method':        'Moving Average',
             'window':        window,
             'historical_ma': ma,
-            'forecast':      pd.Series(forecast_values, index=future_idx),
-            'ci_upper':      pd.Series(ci_upper,         index=future_idx),
-            'ci_lower':      pd.Series(ci_lower,         index=future_idx),
+            'forecast':      forecast,
+            **self._intervals(forecast, last_std,
+                              intervals.moving_average_variance(window, horizon),
+                              intervals.moving_average_variance(window, horizon, cumulative=True)),
         }
         
+    @counted("ses")
     def exponential_smoothing_forecast(self, series: pd.Series,
                                         alpha: float = None,
                                         horizon: int = 30) -> dict:
@@ -54,24 +58,25 @@ class DemandForecaster:
         fit   = model.fit(smoothing_level=alpha, optimized=(alpha is None))
         forecast = fit.forecast(horizon)
 
-        residuals = series - fit.fittedvalues
-        sigma     = residuals.std()
-        ci_upper  = pd.Series(np.maximum((forecast + 1.96 * sigma).values, 0),
-                               index=forecast.index)
-        ci_lower  = pd.Series(np.maximum((forecast - 1.96 * sigma).values, 0),
-                               index=forecast.index)
+        state   = state_from_fit(fit)
+        weights = intervals.error_weights(state['alpha'], None, None, None, horizon)
 
         return {
             'method':   'Exponential Smoothing',
             'alpha':    round(fit.params['smoothing_level'], 4),
+            'state':    state,
             'fitted':   fit.fittedvalues,
             'forecast': forecast,
-            'ci_upper': ci_upper,
-            'ci_lower': ci_lower,
+            **self._intervals(forecast, self._sigma(series, fit.fittedvalues),
+                              intervals.step_variance(weights),
+                              intervals.cumulative_variance(weights)),
             'aic':      fit.aic,
         }
         
-    def holt_winters_forecast(self, series: pd.Series, horizon: int = 30) -> dict:
+    @counted("holt_winters")
+    def holt_winters_forecast(self, series: pd.Series, horizon: int = 30,
+                              start_state: dict = None) -> dict:
+        """`start_state` (an hw_state dict) seeds the optimiser and skips its brute-force grid."""
         sp = self.seasonal_period
         if len(series) >= 2 * sp:
             model    = ExponentialSmoothing(
@@ -85,27 +90,93 @@ class DemandForecaster:
             )
             seasonal = False
 
-        fit      = model.fit(optimized=True)
+        if start_state is not None and len(start_state["seasons"] or []) == (sp if seasonal else 0):
+            fit = model.fit(optimized=True, start_params=start_params(start_state), use_brute=False)
+        else:
+            fit = model.fit(optimized=True)
         forecast = fit.forecast(horizon)
 
-        residuals = series - fit.fittedvalues
-        sigma     = residuals.std()
-        ci_upper  = pd.Series(np.maximum((forecast + 1.96 * sigma).values, 0),
-                               index=forecast.index)
-        ci_lower  = pd.Series(np.maximum((forecast - 1.96 * sigma).values, 0),
-                               index=forecast.index)
+        state = state_from_fit(fit, sp if seasonal else None)
 
         return {
             'method':   'Holt-Winters',
             'seasonal': seasonal,
+            'state':    state,
             'fitted':   fit.fittedvalues,
             'forecast': forecast,
-            'ci_upper': ci_upper,
-            'ci_lower': ci_lower,
+            **self._state_intervals(forecast, state, self._sigma(series, fit.fittedvalues)),
             'aic':      fit.aic,
         }
 
+    @counted("holt_winters_propagate")
+    def holt_winters_from_state(self, series: pd.Series, state: dict, horizon: int = 30) -> dict:
+        """
+        Holt-Winters without optimisation: run a stored pre-sample state
+        (hw_state) through the whole series. Same dict shape as
+        holt_winters_forecast; `aic` is not available.
+        """
+        end_state, fitted = propagate(state, series.values)
+        fitted    = pd.Series(fitted, index=series.index)
+        future    = pd.date_range(series.index[-1] + pd.Timedelta(days=1), periods=horizon, freq='D')
+        forecast  = pd.Series(forecast_from_state(end_state, horizon), index=future)
+
+        return {
+            'method':   'Holt-Winters',
+            'seasonal': bool(state['seasons']),
+            'state':    state,
+            'fitted':   fitted,
+            'forecast': forecast,
+            **self._state_intervals(forecast, state, self._sigma(series, fitted)),
+            'aic':      None,
+        }
 
+    # ── Prediction intervals (src/intervals.py) ──────────────────────────
+    @staticmethod
+    def _sigma(series: pd.Series, fitted: pd.Series) -> float:
+        """One-step error scale: RMS of the in-sample residuals."""
+        resid = (series - fitted).to_numpy(dtype=float)
+        resid = resid[~np.isnan(resid)]
+        return float(np.sqrt(np.mean(resid ** 2))) if len(resid) else 0.0
+
+    def _state_intervals(self, forecast: pd.Series, state: dict, sigma: float) -> dict:
+        m       = len(state['seasons']) if state['seasons'] else None
+        weights = intervals.error_weights(state['alpha'], state['beta'], state['gamma'],
+                                          m, len(forecast))
+        return self._intervals(forecast, sigma, intervals.step_variance(weights),
+                               intervals.cumulative_variance(weights))
+
+    @staticmethod
+    def _intervals(forecast: pd.Series, sigma: float, variance, cum_variance) -> dict:
+        """95% band plus what quantile_forecast/demand_quantile need later."""
+        lower, upper = intervals.interval_bounds(forecast.values, sigma, variance)
+        return {
+            'ci_upper':     pd.Series(upper[0], index=forecast.index),
+            'ci_lower':     pd.Series(lower[0], index=forecast.index),
+            'sigma':        float(sigma),
+            'variance':     np.asarray(variance)[0],
+            'cum_variance': np.asarray(cum_variance)[0],
+        }
+
+    def quantile_forecast(self, res: dict, levels) -> dict:
+        """Per-day forecast quantiles {level: pd.Series} for a result of any method above."""
+        q = intervals.quantiles(res['forecast'].values, res['sigma'], res['variance'], levels)
+        return {lv: pd.Series(v[0], index=res['forecast'].index) for lv, v in q.items()}
+
+    def demand_quantile(self, res: dict, level: float, days: int) -> float:
+        """Quantile of total demand over the first `days` forecast days."""
+        days = max(1, min(days, len(res['forecast'])))
+        mean = float(res['forecast'].iloc[:days].sum())
+        q    = intervals.quantiles([[mean]], res['sigma'], [[res['cum_variance'][days - 1]]], [level])
+        return float(q[float(level)][0, 0])
+
+    @counted("holt_winters_batch")
+    def holt_winters_forecast_many(self, series_by_key: dict, horizon: int = 30) -> dict:
+        """Batched NumPy Holt-Winters over many SKUs; same per-key dict shape as above."""
+        from src.batch_holt_winters import batch_holt_winters_forecast
+        return batch_holt_winters_forecast(series_by_key, horizon=horizon,
+                                           seasonal_period=self.seasonal_period)
+
+    @counted("decompose")
     def decompose_series(self, series: pd.Series):
         sp = self.seasonal_period
         if len(series) < 2 * sp:
@@ -143,4 +214,33 @@ class DemandForecaster:
             'recommended_order_qty':   round(recommended_order, 0),
             'days_of_stock_remaining': round(days_of_stock,     1),
             'reorder_alert':           reorder_needed,
-        }
\ No newline at end of file
+        }
+
+    def service_level_restock(self, res: dict, current_stock: int,
+                              lead_time_days: int = 7,
+                              service_level: float = 0.95) -> dict:
+        """
+        restocking_recommendation sized from the forecast distribution
+        instead of a flat safety factor: order up to the `service_level`
+        quantile of total demand over the horizon, and alert when stock is
+        below that quantile of demand over the lead time. Days of stock are
+        counted at the same quantile's average daily rate.
+        """
+        if not 0 < service_level < 1:
+            raise ValueError("service_level must lie strictly between 0 and 1.")
+        forecast = res['forecast']
+        total_q  = self.demand_quantile(res, service_level, len(forecast))
+        lead_q   = self.demand_quantile(res, service_level, lead_time_days)
+        daily_q  = total_q / len(forecast)
+
+        return {
+            'current_stock':           current_stock,
+            'forecasted_demand_total': round(float(forecast.sum()), 0),
+            'demand_during_lead_time': round(float(forecast.iloc[:lead_time_days].sum()), 0),
+            'recommended_order_qty':   round(max(0, total_q - current_stock), 0),
+            'days_of_stock_remaining': round(current_stock / (daily_q + 1e-9), 1),
+            'reorder_alert':           bool(current_stock < lead_q),
+            'service_level':           service_level,
+            'safety_stock':            round(max(total_q - float(forecast.sum()), 0), 0),
+            'lead_time_demand_q':      round(lead_q, 0),
+        }
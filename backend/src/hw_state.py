@@ -0,0 +1,106 @@
+"""
+src/hw_state.py — Exponential-smoothing state that can be carried forward.
+
+A fitted SES / Holt-Winters model is fully described by its smoothing
+parameters plus the level/trend/seasonal states after the last observation.
+Keeping that state lets callers forecast from any later point by
+propagating new observations through the recursions, without re-running
+statsmodels' optimiser. The recursions match statsmodels' additive
+formulation exactly (fitted values agree to floating-point precision).
+
+State dicts are plain JSON-friendly values:
+
+    {"alpha", "beta", "gamma", "level", "trend", "seasons", "pos", "nobs"}
+
+`beta`/`trend` are None without a trend component and `gamma`/`seasons`
+are None without seasonality; `pos` is the number of observations consumed
+modulo the seasonal period, i.e. the seasonal slot the next value uses.
+"""
+from __future__ import annotations
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def state_from_fit(fit, seasonal_period: Optional[int] = None) -> dict:
+    """Initial (pre-sample) state of a statsmodels Holt-Winters / SES result."""
+    p = fit.params
+
+    def _param(name):
+        v = p.get(name)
+        return None if v is None or (np.ndim(v) == 0 and np.isnan(v)) else v
+
+    beta    = _param("smoothing_trend")
+    seasons = _param("initial_seasons")
+    has_seasons = seasons is not None and np.size(seasons) > 0 and seasonal_period
+    return {
+        "alpha":   float(p["smoothing_level"]),
+        "beta":    float(beta) if beta is not None and _param("initial_trend") is not None else None,
+        "gamma":   float(_param("smoothing_seasonal") or 0.0) if has_seasons else None,
+        "level":   float(p["initial_level"]),
+        "trend":   float(p["initial_trend"]) if _param("initial_trend") is not None else None,
+        "seasons": [float(v) for v in seasons] if has_seasons else None,
+        "pos":     0,
+        "nobs":    0,
+    }
+
+
+def propagate(state: dict, values) -> Tuple[dict, np.ndarray]:
+    """Run the recursions over `values`; returns (new_state, one-step fitted values)."""
+    alpha, beta, gamma = state["alpha"], state["beta"], state["gamma"]
+    level   = state["level"]
+    trend   = state["trend"] if beta is not None else 0.0
+    seasons = list(state["seasons"]) if gamma is not None else None
+    m       = len(seasons) if seasons else 1
+    pos     = state["pos"]
+
+    values = np.asarray(values, dtype=float)
+    fitted = np.empty(len(values))
+    for i, y in enumerate(values):
+        s  = seasons[pos] if seasons else 0.0
+        lb = level + trend
+        fitted[i] = lb + s
+        new_level = alpha * (y - s) + (1.0 - alpha) * lb
+        if beta is not None:
+            trend = beta * (new_level - level) + (1.0 - beta) * trend
+        if seasons:
+            seasons[pos] = gamma * (y - lb) + (1.0 - gamma) * s
+        level = new_level
+        pos   = (pos + 1) % m
+
+    new_state = dict(state)
+    new_state.update({
+        "level":   level,
+        "trend":   trend if beta is not None else None,
+        "seasons": seasons,
+        "pos":     pos,
+        "nobs":    state["nobs"] + len(values),
+    })
+    return new_state, fitted
+
+
+def forecast_from_state(state: dict, horizon: int) -> np.ndarray:
+    """Point forecasts for the next `horizon` steps."""
+    h      = np.arange(1, horizon + 1)
+    trend  = state["trend"] or 0.0
+    fc     = state["level"] + h * trend
+    if state["seasons"]:
+        seasons = np.asarray(state["seasons"])
+        fc = fc + seasons[(state["pos"] + h - 1) % len(seasons)]
+    return fc
+
+
+def start_params(state: dict) -> np.ndarray:
+    """Parameter vector in statsmodels' start_params order, for a warm-started fit."""
+    vec = [state["alpha"]]
+    if state["beta"] is not None:
+        vec.append(state["beta"])
+    if state["gamma"] is not None:
+        vec.append(state["gamma"])
+    vec.append(state["level"])
+    if state["trend"] is not None:
+        vec.append(state["trend"])
+    if state["seasons"]:
+        vec.extend(state["seasons"])
+    return np.asarray(vec, dtype=float)
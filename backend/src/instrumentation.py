@@ -0,0 +1,307 @@
+"""
+src/instrumentation.py — Request timing, query/fit counters and sampling profiles.
+
+init_instrumentation(app) hooks every request:
+
+  stage(name)     context manager for a named hot-path section (loading the
+                  series, building it, forecasting, serialising). Repeated
+                  stages within a request add up.
+  counted(method) decorator for DemandForecaster fits; counts and times
+                  them as the stage "fit.<method>".
+  DB queries      every cursor execute on any SQLAlchemy engine is counted
+                  and timed as the stage "db".
+
+Each response carries a `Server-Timing` header with the stages of that
+request plus `total`. They are kept on the request and added once, when
+it finishes, to the process-wide totals (a request-duration histogram per
+endpoint, stage sums, query and fit counters), which GET /api/metrics
+(routes/metrics.py) renders in Prometheus text format. Counters are per
+process, so scrape every worker; fits run on the process pool are counted
+in the pool workers and do not show up here.
+
+With PROFILE_SLOW_MS > 0, a sampler thread records the request thread's
+stack every PROFILE_INTERVAL_MS while it runs. Requests slower than the
+threshold dump their samples in collapsed-stack format ("a;b;c <count>"),
+which flamegraph.pl and speedscope read, to PROFILE_DIR.
+"""
+from __future__ import annotations
+
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional, Tuple
+
+from flask import g, has_app_context, request
+
+# Request-duration histogram buckets, seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock       = threading.Lock()
+_counters   = defaultdict(float)              # (name, labels) → value
+_summaries  = defaultdict(lambda: [0, 0.0])   # (name, labels) → [count, sum]
+_histograms = {}                              # labels → bucket counts + [count, sum]
+
+
+def _labels(**kw) -> Tuple:
+    return tuple(sorted(kw.items()))
+
+
+def _current() -> Optional[dict]:
+    """This request's instrumentation state, if inside an instrumented request."""
+    return g.get("_instr") if has_app_context() else None
+
+
+def _add_stage(name: str, seconds: float) -> None:
+    # Inside a request this only touches the request's own state; _fold adds
+    # it to the process-wide totals once, when the request finishes
+    state = _current()
+    if state is not None:
+        state["stages"][name] += seconds
+        state["calls"][name]  += 1
+        return
+    with _lock:
+        s = _summaries[("stage_duration_seconds", _labels(stage=name))]
+        s[0] += 1
+        s[1] += seconds
+
+
+def increment(name: str, value: float = 1, **labels) -> None:
+    """Add to a process-wide counter, e.g. increment("hw_refits_total", reason="drift")."""
+    with _lock:
+        _counters[(name, _labels(**labels))] += value
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add_stage(name, time.perf_counter() - start)
+
+
+def counted(method: str):
+    """Count and time calls of a model-fitting function."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            state = _current()
+            if state is not None:
+                state["fits"][method] += 1
+            else:
+                with _lock:
+                    _counters[("model_fits_total", _labels(method=method))] += 1
+            with stage(f"fit.{method}"):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+# ── DB query counting ────────────────────────────────────────────────────
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_instr_start", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("_instr_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    state   = _current()
+    if state is not None:
+        state["queries"] += 1
+    else:
+        with _lock:
+            _counters[("db_queries_total", ())] += 1
+    _add_stage("db", elapsed)
+
+
+def _listen_for_queries() -> None:
+    import sqlalchemy as sa
+    from sqlalchemy import event
+
+    if not event.contains(sa.engine.Engine, "before_cursor_execute", _before_execute):
+        event.listen(sa.engine.Engine, "before_cursor_execute", _before_execute)
+        event.listen(sa.engine.Engine, "after_cursor_execute", _after_execute)
+
+
+# ── Sampling profiler ────────────────────────────────────────────────────
+
+class SamplingProfiler:
+    """Samples one thread's Python stack on a timer into collapsed-stack counts."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval  = interval
+        self.samples   = Counter()
+        self._stop     = threading.Event()
+        self._thread   = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self) -> "SamplingProfiler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+
+def _dump_profile(directory: str, samples: Counter, seconds: float) -> str:
+    os.makedirs(directory, exist_ok=True)
+    name = (request.endpoint or "unknown").replace(".", "-")
+    path = os.path.join(
+        directory, f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{name}-{int(seconds * 1000)}ms.folded"
+    )
+    with open(path, "w") as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+    return path
+
+
+# ── Flask hooks ──────────────────────────────────────────────────────────
+
+def _server_timing(state: dict, total: float) -> str:
+    parts = []
+    for name, seconds in state["stages"].items():
+        desc = ""
+        if name == "db":
+            desc = f';desc="{state["queries"]} queries"'
+        elif name.startswith("fit.") and state["fits"].get(name[4:]):
+            n    = state["fits"][name[4:]]
+            desc = f';desc="{n} fit{"s" if n != 1 else ""}"'
+        parts.append(f"{name};dur={seconds * 1000:.1f}{desc}")
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def _fold(state: dict) -> None:
+    """Add a request's stages, queries and fits to the process-wide totals. Caller holds _lock."""
+    for name, seconds in state["stages"].items():
+        s = _summaries[("stage_duration_seconds", _labels(stage=name))]
+        s[0] += state["calls"][name]
+        s[1] += seconds
+    for method, n in state["fits"].items():
+        _counters[("model_fits_total", _labels(method=method))] += n
+    if state["queries"]:
+        _counters[("db_queries_total", ())] += state["queries"]
+
+
+def _observe_request(state: dict, endpoint: str, method: str, status: int, seconds: float) -> None:
+    labels = _labels(endpoint=endpoint, method=method)
+    with _lock:
+        _fold(state)
+        _counters[("http_requests_total", _labels(endpoint=endpoint, method=method, status=str(status)))] += 1
+        _counters[("http_request_db_queries_total", labels)] += state["queries"]
+        hist = _histograms.setdefault(labels, [0] * len(BUCKETS) + [0, 0.0])
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist[i] += 1
+        hist[-2] += 1
+        hist[-1] += seconds
+
+
+def init_instrumentation(app) -> None:
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+    _listen_for_queries()
+    slow_ms = app.config.get("PROFILE_SLOW_MS", 0)
+
+    @app.before_request
+    def _start_request():
+        g._instr = {"start": time.perf_counter(), "stages": defaultdict(float),
+                    "calls": Counter(), "queries": 0, "fits": Counter()}
+        if slow_ms > 0:
+            g._instr["profiler"] = SamplingProfiler(
+                threading.get_ident(), app.config.get("PROFILE_INTERVAL_MS", 5) / 1000
+            ).start()
+
+    @app.after_request
+    def _finish_request(response):
+        state = g.pop("_instr", None)
+        if state is None:
+            return response
+        total = time.perf_counter() - state["start"]
+        _observe_request(state, request.endpoint or "unmatched", request.method,
+                         response.status_code, total)
+        if app.config.get("SERVER_TIMING", True):
+            response.headers["Server-Timing"] = _server_timing(state, total)
+
+        profiler = state.get("profiler")
+        if profiler is not None:
+            samples = profiler.stop()
+            if total * 1000 >= slow_ms and samples:
+                _dump_profile(app.config["PROFILE_DIR"], samples, total)
+        return response
+
+    @app.teardown_request
+    def _stop_profiler(exc):
+        # after_request is skipped when a request fails outright
+        state = g.pop("_instr", None)
+        if state is None:
+            return
+        with _lock:
+            _fold(state)
+        if state.get("profiler") is not None:
+            state["profiler"].stop()
+
+
+# ── Prometheus exposition ────────────────────────────────────────────────
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(labels: Tuple, **extra) -> str:
+    items = list(labels) + sorted(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def render_metrics() -> str:
+    """All process-wide metrics in Prometheus text exposition format."""
+    with _lock:
+        counters   = dict(_counters)
+        summaries  = {k: list(v) for k, v in _summaries.items()}
+        histograms = {k: list(v) for k, v in _histograms.items()}
+
+    lines = []
+    for name in sorted({n for n, _ in counters}):
+        lines.append(f"# TYPE {name} counter")
+        for (n, labels), value in sorted(counters.items()):
+            if n == name:
+                lines.append(f"{name}{_fmt_labels(labels)} {value:g}")
+
+    lines.append("# TYPE http_request_duration_seconds histogram")
+    for labels, hist in sorted(histograms.items()):
+        for bound, count in zip(BUCKETS, hist):
+            lines.append(f"http_request_duration_seconds_bucket{_fmt_labels(labels, le=f'{bound:g}')} {count}")
+        lines.append(f"http_request_duration_seconds_bucket{_fmt_labels(labels, le='+Inf')} {hist[-2]}")
+        lines.append(f"http_request_duration_seconds_sum{_fmt_labels(labels)} {hist[-1]:.6f}")
+        lines.append(f"http_request_duration_seconds_count{_fmt_labels(labels)} {hist[-2]}")
+
+    for name in sorted({n for n, _ in summaries}):
+        lines.append(f"# TYPE {name} summary")
+        for (n, labels), (count, total) in sorted(summaries.items()):
+            if n == name:
+                lines.append(f"{name}_sum{_fmt_labels(labels)} {total:.6f}")
+                lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
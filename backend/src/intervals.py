@@ -0,0 +1,109 @@
+"""
+src/intervals.py — Closed-form prediction intervals and quantile forecasts.
+
+For the additive exponential-smoothing models used here (SES, Holt,
+additive Holt-Winters) an h-step-ahead forecast error is a weighted sum of
+the future one-step errors, so with one-step variance sigma² (Hyndman et
+al., "Forecasting with Exponential Smoothing", ch. 6):
+
+    Var(e_h)          = sigma² · Σ_{j<h} c_j²
+    Var(Σ_{k≤H} e_k)  = sigma² · Σ_{i<H} (Σ_{j≤i} c_j)²
+
+with c_0 = 1 and, in the error-correction form of statsmodels' recursions,
+
+    c_j = alpha · (1 + j·beta) + gamma · [j mod m = 0]     (j ≥ 1)
+
+(beta = 0 without a trend, gamma = 0 without seasonality). Everything is
+NumPy over a leading batch axis, so one call covers N SKUs × H steps ×
+any number of quantile levels; no simulation is involved. The cumulative
+form is what restocking needs: the distribution of total demand over a
+lead time or horizon, not of each day on its own.
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+from scipy.stats import norm
+
+DEFAULT_LEVELS = (0.1, 0.5, 0.9, 0.99)
+
+
+def error_weights(alpha, beta, gamma, period: Optional[int], horizon: int) -> np.ndarray:
+    """c_0..c_{H-1} per series: shape (N, H). alpha/beta/gamma: scalars or (N,) arrays; None → 0."""
+    alpha = np.atleast_1d(np.asarray(alpha, dtype=float))
+    beta  = np.atleast_1d(np.asarray(0.0 if beta  is None else beta,  dtype=float))
+    gamma = np.atleast_1d(np.asarray(0.0 if gamma is None else gamma, dtype=float))
+
+    j = np.arange(horizon, dtype=float)
+    c = alpha[:, None] * (1.0 + j[None, :] * beta[:, None])
+    if period:
+        c = c + gamma[:, None] * ((j % period == 0) & (j > 0))[None, :]
+    c[:, 0] = 1.0
+    return c
+
+
+def step_variance(weights: np.ndarray) -> np.ndarray:
+    """Var(e_h) / sigma² for h = 1..H, shape (N, H)."""
+    return np.cumsum(weights ** 2, axis=1)
+
+
+def cumulative_variance(weights: np.ndarray) -> np.ndarray:
+    """Var(e_1 + … + e_h) / sigma² for h = 1..H, shape (N, H)."""
+    return np.cumsum(np.cumsum(weights, axis=1) ** 2, axis=1)
+
+
+def moving_average_variance(window: int, horizon: int, cumulative: bool = False) -> np.ndarray:
+    """
+    The same multipliers for the moving-average forecaster, treating demand
+    as i.i.d. around the window mean (the mean's own error is shared by all steps).
+    """
+    h = np.arange(1, horizon + 1, dtype=float)
+    return (h + h ** 2 / window if cumulative else 1.0 + np.ones_like(h) / window)[None, :]
+
+
+def quantiles(mean, sigma, variance, levels: Iterable[float] = DEFAULT_LEVELS,
+              floor: Optional[float] = 0.0) -> Dict[float, np.ndarray]:
+    """
+    Normal quantiles mean + z_q · sigma · sqrt(variance) for every level at
+    once. mean/variance broadcast to (N, H), sigma to (N,) or scalar; demand
+    is non-negative, so results are floored at `floor` (None disables).
+    """
+    levels = np.asarray(list(levels), dtype=float)
+    if ((levels <= 0) | (levels >= 1)).any():
+        raise ValueError("Quantile levels must lie strictly between 0 and 1.")
+    mean  = np.atleast_2d(np.asarray(mean, dtype=float))
+    sd    = np.atleast_1d(np.asarray(sigma, dtype=float))[:, None] * np.sqrt(variance)
+    z     = norm.ppf(levels)
+    q     = mean[None, :, :] + z[:, None, None] * sd[None, :, :]
+    if floor is not None:
+        q = np.maximum(q, floor)
+    return {float(lv): q[i] for i, lv in enumerate(levels)}
+
+
+def interval_bounds(mean, sigma, variance, coverage: float = 0.95):
+    """(lower, upper) of the central `coverage` interval, floored at 0."""
+    tail = (1.0 - coverage) / 2.0
+    q    = quantiles(mean, sigma, variance, (tail, 1.0 - tail))
+    return q[tail], q[1.0 - tail]
+
+
+def parse_levels(raw: Optional[str]) -> Optional[list]:
+    """'0.1,0.5,0.9' or 'p10,p50,p90' → [0.1, 0.5, 0.9]; None/'' → None."""
+    if not raw:
+        return None
+    out = []
+    for tok in raw.split(","):
+        tok = tok.strip().lower()
+        if not tok:
+            continue
+        value = float(tok[1:]) / 100 if tok.startswith("p") else float(tok)
+        if not 0 < value < 1:
+            raise ValueError(f"Quantile level out of range: '{tok}'.")
+        out.append(value)
+    return out
+
+
+def level_label(level: float) -> str:
+    """0.9 → 'p90', 0.995 → 'p99.5'."""
+    return "p" + f"{level * 100:.10g}"
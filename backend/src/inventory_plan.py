@@ -0,0 +1,211 @@
+"""
+src/inventory_plan.py — Store-wide order plan from the forecast distributions.
+
+One call plans every SKU of a store. The batched NumPy Holt-Winters engine
+(src/batch_holt_winters.py) forecasts the whole store, and
+src/intervals.py gives each SKU's distribution of cumulative demand. From
+those, with arrays of shape (N,):
+
+    reorder point  = service-level quantile of demand over the lead time
+    order-up-to    = service-level quantile of demand over the horizon
+    order quantity = max(order-up-to − current stock, 0)
+
+This is the rule the per-SKU `service_level` restock recommendation uses
+(DemandForecaster.service_level_restock). With a `budget` (unit cost × quantity) and/or a `capacity`
+(units), the unconstrained orders are cut back by a greedy fractional
+knapsack. Each SKU's order is split into PLAN_TRANCHES slices. A slice is
+worth price × P(demand reaches it), the expected revenue of its units, per
+unit of the binding resource. Slices are taken in order of that density
+until the constraint is used up. Within a SKU the density only falls, so
+the sort never takes a later slice before an earlier one.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+import numpy as np
+from scipy.stats import norm
+
+from config import Config
+
+# Slices per SKU order for the constrained allocation
+PLAN_TRANCHES = 32
+
+
+def _at(matrix: np.ndarray, days: np.ndarray) -> np.ndarray:
+    """matrix[i, days[i] - 1], with days clipped to the horizon."""
+    cols = np.clip(days, 1, matrix.shape[1]) - 1
+    return matrix[np.arange(matrix.shape[0]), cols]
+
+
+def order_levels(forecast: np.ndarray, sigma: np.ndarray, cum_variance: np.ndarray,
+                 lead_time: np.ndarray, service_level: float) -> Dict[str, np.ndarray]:
+    """
+    Demand moments and service-level quantiles per SKU. forecast and
+    cum_variance are (N, H), sigma and lead_time are (N,).
+    """
+    if not 0 < service_level < 1:
+        raise ValueError("service_level must lie strictly between 0 and 1.")
+    z        = norm.ppf(service_level)
+    cum_mean = np.cumsum(forecast, axis=1)
+    cum_sd   = sigma[:, None] * np.sqrt(cum_variance)
+
+    lead_mean, lead_sd = _at(cum_mean, lead_time), _at(cum_sd, lead_time)
+    mean, sd           = cum_mean[:, -1], cum_sd[:, -1]
+    return {
+        "lead_time_demand": lead_mean,
+        "demand":           mean,
+        "demand_sd":        sd,
+        "reorder_point":    np.maximum(lead_mean + z * lead_sd, 0),
+        "order_up_to":      np.maximum(mean + z * sd, 0),
+    }
+
+
+def allocate(order_qty: np.ndarray, current_stock: np.ndarray, demand: np.ndarray,
+             demand_sd: np.ndarray, price: np.ndarray, unit_cost: np.ndarray,
+             budget: Optional[float] = None, capacity: Optional[float] = None) -> np.ndarray:
+    """
+    Greedy fractional knapsack over order slices (see module docstring).
+    Returns whole-unit quantities ≤ order_qty within budget and capacity.
+    """
+    order_qty = np.maximum(np.asarray(order_qty, dtype=float), 0)
+    if budget is None and capacity is None:
+        return np.floor(order_qty)
+
+    n, k  = len(order_qty), PLAN_TRANCHES
+    size  = np.repeat(order_qty / k, k)                          # (N*K,) units per slice
+    mid   = (current_stock[:, None]
+             + order_qty[:, None] * (np.arange(k) + 0.5)[None, :] / k).ravel()
+    sku   = np.repeat(np.arange(n), k)
+    p_hit = norm.sf((mid - np.repeat(demand, k)) / np.maximum(np.repeat(demand_sd, k), 1e-9))
+    value = np.repeat(price, k) * p_hit * size
+    cost  = np.repeat(unit_cost, k) * size
+
+    # Usage of each slice as a share of the tighter of the two limits
+    usage = np.zeros_like(size)
+    if budget is not None:
+        usage = np.maximum(usage, cost / max(budget, 1e-9))
+    if capacity is not None:
+        usage = np.maximum(usage, size / max(capacity, 1e-9))
+    density = np.where(usage > 0, value / np.maximum(usage, 1e-12), np.inf)
+    order   = np.argsort(-density, kind="stable")
+
+    frac  = np.ones(len(order))
+    limit = []
+    if budget is not None:
+        limit.append((cost[order], budget))
+    if capacity is not None:
+        limit.append((size[order], capacity))
+    for weight, cap in limit:
+        spent = np.cumsum(weight) - weight                        # used before each slice
+        frac  = np.minimum(frac, np.clip((cap - spent) / np.maximum(weight, 1e-12), 0, 1))
+    # Greedy stops at the first slice that doesn't fit whole
+    cut = np.flatnonzero(frac < 1)
+    if len(cut):
+        frac[cut[0] + 1:] = 0
+
+    taken = np.zeros(len(order))
+    taken[order] = frac * size[order]
+    qty = np.floor(np.bincount(sku, weights=taken, minlength=n) + 1e-9)
+
+    # Flooring can only lower usage; it never breaks a limit
+    return np.minimum(qty, np.floor(order_qty))
+
+
+def _unit_prices(item_pks) -> Dict[int, float]:
+    """Mean recorded sale price per item (sales_records is the system of record)."""
+    from models import db, SalesRecord
+
+    rows = (
+        db.session.query(SalesRecord.item_pk, db.func.avg(SalesRecord.price))
+        .filter(SalesRecord.item_pk.in_(list(item_pks)), SalesRecord.price.isnot(None))
+        .group_by(SalesRecord.item_pk)
+        .all()
+    )
+    return {pk: float(p) for pk, p in rows if p is not None}
+
+
+def plan_store_orders(store_id: str, horizon: int = Config.DEFAULT_HORIZON,
+                      seasonal_period: int = Config.DEFAULT_SEASONAL_PERIOD,
+                      service_level: float = Config.DEFAULT_SERVICE_LEVEL,
+                      budget: Optional[float] = None, capacity: Optional[float] = None,
+                      unit_costs: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Order plan for every item of a store. Unit costs default to each item's
+    mean recorded price (else the store median, else 1); `unit_costs` maps
+    item_id → cost to override them.
+    """
+    from models import Item
+    from src.bulk_forecast import load_store_series
+    from src.batch_holt_winters import batch_holt_winters_forecast
+
+    if (budget is not None and budget < 0) or (capacity is not None and capacity < 0):
+        raise ValueError("budget and capacity must be non-negative.")
+
+    items   = {i.id: i for i in Item.query.filter_by(store_id=store_id).order_by(Item.item_id)}
+    series  = load_store_series(store_id)
+    skipped = [
+        {"item_id": i.item_id,
+         "error": f"Insufficient data: need ≥14 days, got {len(series.get(pk, ()))}."}
+        for pk, i in items.items() if len(series.get(pk, ())) < 14
+    ]
+    pks = [pk for pk in items if len(series.get(pk, ())) >= 14]
+    out = {
+        "store_id":      store_id,
+        "horizon":       horizon,
+        "service_level": service_level,
+        "budget":        budget,
+        "capacity":      capacity,
+        "items":         [],
+        "skipped":       skipped,
+    }
+    if not pks:
+        out["totals"] = {"skus": 0, "skus_ordering": 0, "order_qty": 0, "order_cost": 0.0,
+                         "unconstrained_qty": 0, "unconstrained_cost": 0.0}
+        return out
+
+    fits  = batch_holt_winters_forecast({pk: series[pk] for pk in pks}, horizon=horizon,
+                                        seasonal_period=seasonal_period)
+    fc    = np.vstack([fits[pk]["forecast"].to_numpy() for pk in pks])
+    cumv  = np.vstack([fits[pk]["cum_variance"] for pk in pks])
+    sigma = np.array([fits[pk]["sigma"] for pk in pks])
+    stock = np.array([Config.DEFAULT_CURRENT_STOCK if items[pk].current_stock is None
+                      else items[pk].current_stock for pk in pks], dtype=float)
+    lead  = np.array([items[pk].lead_time or Config.DEFAULT_LEAD_TIME for pk in pks])
+
+    prices    = _unit_prices(pks)
+    fallback  = float(np.median(list(prices.values()))) if prices else 1.0
+    price     = np.array([prices.get(pk, fallback) for pk in pks])
+    overrides = {str(k): float(v) for k, v in (unit_costs or {}).items()}
+    cost      = np.array([overrides.get(items[pk].item_id, price[n]) for n, pk in enumerate(pks)])
+
+    lv    = order_levels(fc, sigma, cumv, lead, service_level)
+    ideal = np.floor(np.maximum(lv["order_up_to"] - stock, 0))
+    qty   = allocate(ideal, stock, lv["demand"], lv["demand_sd"], price, cost, budget, capacity)
+
+    out["items"] = [
+        {
+            "item_id":           items[pk].item_id,
+            "current_stock":     int(stock[n]),
+            "lead_time":         int(lead[n]),
+            "unit_cost":         round(float(cost[n]), 4),
+            "forecast_demand":   round(float(lv["demand"][n]), 0),
+            "reorder_point":     round(float(lv["reorder_point"][n]), 0),
+            "order_up_to":       round(float(lv["order_up_to"][n]), 0),
+            "safety_stock":      round(float(max(lv["order_up_to"][n] - lv["demand"][n], 0)), 0),
+            "unconstrained_qty": int(ideal[n]),
+            "order_qty":         int(qty[n]),
+            "order_cost":        round(float(qty[n] * cost[n]), 2),
+            "reorder_alert":     bool(stock[n] < lv["reorder_point"][n]),
+        }
+        for n, pk in enumerate(pks)
+    ]
+    out["totals"] = {
+        "skus":               len(pks),
+        "skus_ordering":      int((qty > 0).sum()),
+        "order_qty":          int(qty.sum()),
+        "order_cost":         round(float((qty * cost).sum()), 2),
+        "unconstrained_qty":  int(ideal.sum()),
+        "unconstrained_cost": round(float((ideal * cost).sum()), 2),
+    }
+    return out
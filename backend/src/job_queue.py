@@ -0,0 +1,190 @@
+"""
+src/job_queue.py — Background forecast jobs.
+
+Jobs are persisted in `forecast_jobs` / `forecast_job_results` and executed
+by a few daemon threads per web process. The pending queue is bounded: when
+it is full `submit` raises `queue.Full` and the API answers 503, so bursts
+push back on clients instead of piling up. The threads only orchestrate;
+the model fits themselves run on the shared process pool in
+src/bulk_forecast.py and each SKU is committed as soon as it finishes, which
+is what makes partial results visible while a job is running.
+
+The same threads run short database writes other background work hands
+them through `defer` (e.g. storing a tournament that finished on the pool),
+so pool callbacks never write from the executor's own thread.
+
+The in-memory queue does not survive a restart. Jobs that were still queued
+or running are then marked failed by fail_orphaned_jobs (called from
+create_app) instead of staying "running" forever.
+"""
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import queue
+import threading
+import uuid
+from datetime import datetime
+
+from flask import Flask
+
+from config import Config
+from models import db, Item, ForecastJob, ForecastJobResult
+from src.bulk_forecast import load_store_series, make_payload, iter_full_forecasts
+from src.model_selection import attach_champions, record_selection
+
+log = logging.getLogger(__name__)
+
+ORPHANED_ERROR = "Interrupted by a server restart; submit the job again."
+
+_queue_lock = threading.Lock()
+
+
+class ForecastJobQueue:
+    def __init__(self, app: Flask, workers: int, maxsize: int):
+        self.app      = app
+        self.workers  = max(1, workers)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self._threads: list[threading.Thread] = []
+        self._lock    = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for n in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"forecast-job-{n}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def create_job(self, store_id: str, skus: list[str], params: dict) -> ForecastJob:
+        """Persist a queued job and enqueue it. Raises queue.Full under backpressure."""
+        self._ensure_started()
+        job = ForecastJob(
+            id=uuid.uuid4().hex,
+            store_id=store_id,
+            params=json.dumps({"skus": skus, **params}),
+            total=len(skus),
+        )
+        db.session.add(job)
+        db.session.commit()
+        try:
+            self._queue.put_nowait(job.id)
+        except queue.Full:
+            db.session.delete(job)
+            db.session.commit()
+            raise
+        return job
+
+    def defer(self, fn, *args) -> None:
+        """Run fn(*args) on a job thread inside an app context. Raises queue.Full under backpressure."""
+        self._ensure_started()
+        self._queue.put_nowait(functools.partial(fn, *args))
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _worker(self) -> None:
+        while True:
+            task = self._queue.get()
+            try:
+                with self.app.app_context():
+                    if isinstance(task, str):
+                        run_job(task)
+                    else:
+                        task()
+            except Exception:
+                # run_job records its own failures
+                if not isinstance(task, str):
+                    log.exception("Deferred task %r failed", task)
+            finally:
+                self._queue.task_done()
+
+
+def run_job(job_id: str) -> None:
+    job = db.session.get(ForecastJob, job_id)
+    if job is None:
+        return
+
+    job.status     = "running"
+    job.started_at = datetime.utcnow()
+    db.session.commit()
+
+    try:
+        params = json.loads(job.params)
+        skus   = params.pop("skus")
+        items  = Item.query.filter(Item.store_id == job.store_id, Item.item_id.in_(skus)).all()
+        by_sku = {i.item_id: i for i in items}
+
+        for sku in skus:
+            if sku not in by_sku:
+                _record(job, sku, None, error=f"Item '{sku}' not found for store '{job.store_id}'.")
+
+        series_by_item = load_store_series(job.store_id, [i.id for i in items])
+        payloads = []
+        for item in items:
+            if item.id in series_by_item:
+                payloads.append(make_payload(item, series_by_item[item.id], **params))
+            else:
+                _record(job, item.item_id, item.id, error=f"No sales records for '{item.item_id}'.")
+
+        sp = params.get("seasonal_period", Config.DEFAULT_SEASONAL_PERIOD)
+        if params.get("method") == "auto":
+            attach_champions(payloads, sp)
+
+        for res in iter_full_forecasts(payloads):
+            record_selection(res, series_by_item[res["item_pk"]], sp)
+            _record(job, res["item_id"], res["item_pk"],
+                    result=res.get("forecast"), error=res.get("error"))
+
+        job.status = "completed"
+    except Exception as e:
+        db.session.rollback()
+        job.status = "failed"
+        job.error  = str(e)
+
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+
+def _record(job: ForecastJob, sku: str, item_pk, result=None, error=None) -> None:
+    db.session.add(ForecastJobResult(
+        job_id=job.id, sku=sku, item_pk=item_pk,
+        result=json.dumps(result) if result is not None else None,
+        error=error,
+    ))
+    if error:
+        job.failed = (job.failed or 0) + 1
+    else:
+        job.completed = (job.completed or 0) + 1
+    db.session.commit()
+
+
+def fail_orphaned_jobs() -> int:
+    """Mark jobs left queued or running by an earlier process as failed. Returns how many."""
+    n = (
+        ForecastJob.query
+        .filter(ForecastJob.status.in_(("queued", "running")))
+        .update({"status": "failed", "error": ORPHANED_ERROR, "finished_at": datetime.utcnow()},
+                synchronize_session=False)
+    )
+    db.session.commit()
+    return n
+
+
+def get_job_queue(app: Flask) -> ForecastJobQueue:
+    """One queue per app (and therefore per web process)."""
+    jq = app.extensions.get("forecast_jobs")
+    if jq is None:
+        with _queue_lock:
+            jq = app.extensions.get("forecast_jobs")
+            if jq is None:
+                jq = ForecastJobQueue(
+                    app,
+                    workers=app.config.get("JOB_WORKERS", Config.JOB_WORKERS),
+                    maxsize=app.config.get("JOB_QUEUE_SIZE", Config.JOB_QUEUE_SIZE),
+                )
+                app.extensions["forecast_jobs"] = jq
+    return jq
@@ -0,0 +1,292 @@
+"""
+src/model_selection.py — Per-SKU champion models for method=auto.
+
+Each (item, seasonal_period) gets a champion: the method with the lowest
+mean MAE over a rolling-origin backtest (src/backtest.py). The choice, the
+backtest summary and the fitted parameters of the champion's full-series
+fit are stored in `champion_models`, with the fingerprint of the series they
+were fitted on:
+
+  same series     the forecast is run from the stored parameters, no fit
+  series changed  the champion method is refitted (Holt-Winters from its
+                  stored fit, src/warm_start.py) and the parameters and
+                  fingerprint are replaced; the choice itself is kept
+  no champion     answered with Holt-Winters while the tournament for the
+                  item runs on the process pool in the background
+  (or stale)
+
+Champions are re-selected in bulk by `flask retournament` (meant to be run
+on a schedule, e.g. nightly cron) and, as a fallback, in the background once
+they are older than CHAMPION_MAX_AGE_DAYS.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+import pandas as pd
+from flask import current_app
+
+from config import Config
+from models import db, Item, ChampionModel, upsert_stmt
+from src.backtest import run_backtest
+from src.backtest_store import save_backtest
+from src.bulk_forecast import submit, load_store_series, make_payload, iter_pool
+from src.forecast_cache import forecast_cache, series_fingerprint
+from src.forecast_service import ForecastService
+from src.warm_start import holt_winters_update
+
+log = logging.getLogger(__name__)
+
+FALLBACK_METHOD = "holt_winters"
+
+# (item_pk, seasonal_period) with a background tournament in flight
+_pending: set = set()
+_pending_lock = threading.Lock()
+
+
+def is_stale(champion: ChampionModel) -> bool:
+    age = datetime.utcnow() - (champion.selected_at or datetime.min)
+    return age > timedelta(days=Config.CHAMPION_MAX_AGE_DAYS)
+
+
+def save_champion(item_pk: int, seasonal_period: int, method: str, params: dict,
+                  metrics: dict, fingerprint: str) -> None:
+    """Insert or replace the champion for (item, seasonal_period). Caller commits."""
+    stmt = upsert_stmt(
+        ChampionModel.__table__, ["item_pk", "seasonal_period"],
+        ["method", "params", "metrics", "series_hash", "selected_at"],
+    )
+    db.session.execute(stmt, [{
+        "item_pk":         item_pk,
+        "seasonal_period": seasonal_period,
+        "method":          method,
+        "params":          json.dumps(params),
+        "metrics":         json.dumps(metrics),
+        "series_hash":     fingerprint,
+        "selected_at":     datetime.utcnow(),
+    }])
+
+
+def refresh_params(item_pk: int, seasonal_period: int, params: dict, fingerprint: str) -> None:
+    """Replace a champion's fitted parameters after new data, keeping its selection. Caller commits."""
+    ChampionModel.query.filter_by(item_pk=item_pk, seasonal_period=seasonal_period).update(
+        {"params": json.dumps(params), "series_hash": fingerprint}, synchronize_session=False,
+    )
+
+
+def load_champions(item_pks: Iterable[int], seasonal_period: int) -> Dict[int, ChampionModel]:
+    """Fresh (non-stale) champions for the given items."""
+    rows = ChampionModel.query.filter(
+        ChampionModel.item_pk.in_(list(item_pks)),
+        ChampionModel.seasonal_period == seasonal_period,
+    ).all()
+    return {c.item_pk: c for c in rows if not is_stale(c)}
+
+
+def attach_champions(payloads: list, seasonal_period: int) -> None:
+    """
+    Give method=auto pool payloads their stored champion (see
+    bulk_forecast._auto_forecast), with its parameters when they were fitted
+    on the payload's series.
+    """
+    champions = load_champions([p["item_pk"] for p in payloads], seasonal_period)
+    for p in payloads:
+        c = champions.get(p["item_pk"])
+        if c is not None:
+            p["champion"] = {"method": c.method, "metrics": json.loads(c.metrics)}
+            if c.series_hash == str(series_fingerprint(p["series"])):
+                p["champion"]["params"] = json.loads(c.params)
+
+
+def record_selection(res: Dict[str, Any], series: pd.Series, seasonal_period: int) -> None:
+    """
+    Store a champion a pool worker selected for a payload without one, or the
+    parameters it refitted for a changed series. Caller commits.
+    """
+    fc = res.get("forecast")
+    if not fc:
+        return
+    if res.get("selection"):
+        save_champion(res["item_pk"], seasonal_period, res["selection"]["method"],
+                      fc["champion"]["params"], res["selection"]["metrics"],
+                      str(series_fingerprint(series)))
+    elif res.get("refit"):
+        refresh_params(res["item_pk"], seasonal_period, fc["champion"]["params"],
+                       str(series_fingerprint(series)))
+
+
+def auto_forecast(item, series: pd.Series, seasonal_period: int, horizon: int,
+                  current_stock: int, lead_time: int,
+                  safety_factor: float = Config.DEFAULT_SAFETY_FACTOR,
+                  update: str = None, service_level: float = None,
+                  quantiles=None, compact: bool = False, include=None,
+                  max_points: int = None) -> Dict[str, Any]:
+    """
+    ForecastService.champion_forecast for one item from its stored champion
+    (see the module docstring). Without a current champion the forecast is
+    Holt-Winters and a tournament is queued; result["champion"]["fit"] says
+    which case applied. An explicit `update` mode always refits a
+    Holt-Winters champion through src/warm_start.py.
+
+    The one write a forecast read makes: after a refit the champion's new
+    parameters and fingerprint are stored and committed.
+    """
+    champion    = load_champions([item.id], seasonal_period).get(item.id)
+    fingerprint = str(series_fingerprint(series))
+    params      = None
+    if champion is None:
+        queue_tournament(item, series, seasonal_period)
+        method, metrics, fit = FALLBACK_METHOD, {}, "fallback"
+    else:
+        method, metrics = champion.method, json.loads(champion.metrics)
+        if champion.series_hash == fingerprint and (update is None or method != "holt_winters"):
+            params, fit = json.loads(champion.params), "stored"
+        else:
+            fit = "refit"
+
+    hw_full = None
+    if method == "holt_winters" and params is None:
+        hw_full = holt_winters_update(item.id, series, seasonal_period, horizon, update)
+
+    service = ForecastService(seasonal_period=seasonal_period)
+    result  = service.champion_forecast(
+        series, method, metrics, horizon=horizon, current_stock=current_stock,
+        lead_time=lead_time, safety_factor=safety_factor, hw_full=hw_full,
+        service_level=service_level, quantiles=quantiles, compact=compact, include=include,
+        max_points=max_points, params=params,
+    )
+    if hw_full is not None:
+        result["hw_update"] = hw_full["update"]
+    result["champion"]["fit"]         = fit
+    result["champion"]["selected_at"] = champion.selected_at.isoformat() if champion else None
+    if fit == "refit":
+        refresh_params(item.id, seasonal_period, result["champion"]["params"], fingerprint)
+        db.session.commit()
+    return result
+
+
+def _tournament_task(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Backtest every method and fit the winner; runs in a worker process."""
+    result = {"item_pk": payload["item_pk"], "item_id": payload["item_id"]}
+    try:
+        series = payload["series"]
+        sp     = payload["seasonal_period"]
+        bt     = run_backtest(series, Config.DEFAULT_HORIZON, Config.BACKTEST_FOLDS,
+                              Config.BACKTEST_STEP, sp)
+        fit    = ForecastService(seasonal_period=sp).champion_forecast(
+            series, bt["best_method"], bt["summary"], horizon=1,
+        )
+        result.update({
+            "backtest":    bt,
+            "method":      bt["best_method"],
+            "params":      fit["champion"]["params"],
+            "fingerprint": str(series_fingerprint(series)),
+        })
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def store_tournament(res: Dict[str, Any], seasonal_period: int) -> None:
+    """Save a _tournament_task result as the item's backtest and champion, and commit."""
+    pk = res["item_pk"]
+    save_backtest(pk, res["fingerprint"], res["backtest"], Config.DEFAULT_HORIZON,
+                  seasonal_period, Config.BACKTEST_FOLDS, Config.BACKTEST_STEP)
+    save_champion(pk, seasonal_period, res["method"], res["params"],
+                  res["backtest"]["summary"], res["fingerprint"])
+    db.session.commit()
+    forecast_cache.invalidate(pk)
+
+
+def queue_tournament(item, series: pd.Series, seasonal_period: int) -> bool:
+    """
+    Run the tournament for one item on the process pool and store its result
+    when it completes. False when one is already in flight for the item.
+    """
+    key = (item.id, seasonal_period)
+    with _pending_lock:
+        if key in _pending:
+            return False
+        _pending.add(key)
+    app = current_app._get_current_object()
+    try:
+        future = submit(_tournament_task, make_payload(item, series, seasonal_period=seasonal_period))
+    except Exception:
+        log.exception("Queueing the tournament for item %s failed", item.id)
+        _release(key)
+        return False
+    future.add_done_callback(lambda f: _tournament_done(app, key, f))
+    return True
+
+
+def _release(key: tuple) -> None:
+    with _pending_lock:
+        _pending.discard(key)
+
+
+def _tournament_done(app, key: tuple, future) -> None:
+    """
+    Pool callback, on the executor's thread: hands the result to a job-queue
+    thread (src/job_queue.py), which stores it in an app context of its own.
+    """
+    from src.job_queue import get_job_queue
+
+    deferred = False
+    try:
+        res = future.result()
+        if "error" in res:
+            log.warning("Tournament for item %s failed: %s", key[0], res["error"])
+        else:
+            get_job_queue(app).defer(_store_queued_tournament, res, key)
+            deferred = True
+    except Exception:
+        log.exception("Queueing the tournament result for item %s failed", key[0])
+    finally:
+        if not deferred:
+            _release(key)
+
+
+def _store_queued_tournament(res: Dict[str, Any], key: tuple) -> None:
+    try:
+        store_tournament(res, key[1])
+    finally:
+        _release(key)
+
+
+def retournament(store_id: Optional[str] = None,
+                 seasonal_period: int = Config.DEFAULT_SEASONAL_PERIOD) -> Dict[str, int]:
+    """
+    Re-run the tournament for every item (optionally one store) on the shared
+    process pool, replacing stored backtests and champions. Returns counts.
+    """
+    stores = [store_id] if store_id else [
+        s for (s,) in db.session.query(Item.store_id).distinct().order_by(Item.store_id)
+    ]
+    counts = {"items": 0, "selected": 0, "changed": 0, "failed": 0}
+
+    for store in stores:
+        items    = {i.id: i for i in Item.query.filter_by(store_id=store)}
+        series   = load_store_series(store)
+        previous = {c.item_pk: c.method for c in ChampionModel.query.filter(
+            ChampionModel.item_pk.in_(list(items)),
+            ChampionModel.seasonal_period == seasonal_period,
+        )} if items else {}
+        payloads = [
+            make_payload(items[pk], s, seasonal_period=seasonal_period)
+            for pk, s in series.items() if pk in items
+        ]
+        counts["items"] += len(items)
+
+        for res in iter_pool(_tournament_task, payloads):
+            if "error" in res:
+                counts["failed"] += 1
+                continue
+            store_tournament(res, seasonal_period)
+            counts["selected"] += 1
+            counts["changed"]  += previous.get(res["item_pk"]) != res["method"]
+
+    return counts
@@ -0,0 +1,181 @@
+"""
+src/rollups.py — Maintained aggregates over sales_records.
+
+Read paths (items listing, dashboard) use these instead of aggregating the
+fact table per request. They are refreshed for the touched items (or store
+days) only, as part of the same transaction as the write, so their cost
+scales with the upload rather than with the catalogue.
+
+The daily store rollup is only refreshed for the days an upload touches, so
+a store whose history predates the table needs one full backfill first.
+StoreRollupState records which stores have had it; their absence, not an
+empty rollup, is what triggers it.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+import sqlalchemy as sa
+
+from models import db, Item, SalesRecord, ItemSalesSummary, DailyStoreSales, StoreRollupState, upsert_stmt
+
+# Keeps IN (...) lists well under SQLite's bound-parameter limit.
+_IN_CHUNK = 500
+
+SUMMARY_WINDOW_DAYS = 90
+
+
+def _chunks(values: List[int]):
+    for start in range(0, len(values), _IN_CHUNK):
+        yield values[start:start + _IN_CHUNK]
+
+
+def refresh_item_summaries(item_pks: Iterable[int]) -> None:
+    """Recompute ItemSalesSummary rows for the given items. Caller commits."""
+    item_pks = sorted({int(pk) for pk in item_pks})
+    now      = datetime.utcnow()
+    stmt     = upsert_stmt(
+        ItemSalesSummary.__table__, ["item_pk"],
+        ["total_sales", "record_count", "first_date", "last_date", "last_90d_sales", "updated_at"],
+    )
+
+    for chunk in _chunks(item_pks):
+        agg = (
+            db.session.query(
+                SalesRecord.item_pk,
+                sa.func.coalesce(sa.func.sum(SalesRecord.sales), 0).label("total_sales"),
+                sa.func.count(SalesRecord.id).label("record_count"),
+                sa.func.min(SalesRecord.date).label("first_date"),
+                sa.func.max(SalesRecord.date).label("last_date"),
+            )
+            .filter(SalesRecord.item_pk.in_(chunk))
+            .group_by(SalesRecord.item_pk)
+            .all()
+        )
+        by_pk = {r.item_pk: r for r in agg}
+
+        # Trailing-window totals: only rows that can fall inside some item's window
+        window = {}
+        if agg:
+            span   = timedelta(days=SUMMARY_WINDOW_DAYS - 1)
+            cutoff = min(r.last_date for r in agg) - span
+            tail   = pd.DataFrame(
+                db.session.query(SalesRecord.item_pk, SalesRecord.date, SalesRecord.sales)
+                .filter(SalesRecord.item_pk.in_(chunk), SalesRecord.date >= cutoff)
+                .all(),
+                columns=["item_pk", "date", "sales"],
+            )
+            if not tail.empty:
+                starts = tail["item_pk"].map({pk: r.last_date - span for pk, r in by_pk.items()})
+                window = tail[tail["date"] >= starts].groupby("item_pk")["sales"].sum().to_dict()
+
+        records = []
+        for pk in chunk:
+            r = by_pk.get(pk)
+            records.append({
+                "item_pk":        pk,
+                "total_sales":    float(r.total_sales) if r else 0.0,
+                "record_count":   int(r.record_count) if r else 0,
+                "first_date":     r.first_date if r else None,
+                "last_date":      r.last_date if r else None,
+                "last_90d_sales": float(window.get(pk, 0.0)),
+                "updated_at":     now,
+            })
+        db.session.execute(stmt, records)
+
+
+def ensure_item_summaries(item_pks: Iterable[int]) -> Dict[int, ItemSalesSummary]:
+    """
+    Summaries for the given items, backfilling any that are missing (items
+    written before the summary table existed).
+    """
+    item_pks = [int(pk) for pk in item_pks]
+    found: Dict[int, ItemSalesSummary] = {}
+    for chunk in _chunks(item_pks):
+        found.update({
+            s.item_pk: s
+            for s in ItemSalesSummary.query.filter(ItemSalesSummary.item_pk.in_(chunk))
+        })
+
+    missing = [pk for pk in item_pks if pk not in found]
+    if missing:
+        refresh_item_summaries(missing)
+        db.session.commit()
+        for chunk in _chunks(missing):
+            found.update({
+                s.item_pk: s
+                for s in ItemSalesSummary.query.filter(ItemSalesSummary.item_pk.in_(chunk))
+            })
+    return found
+
+
+def refresh_daily_store_sales(store_id: str, dates: Optional[Iterable] = None,
+                              start=None, end=None) -> None:
+    """
+    Recompute DailyStoreSales rows for a store: the given dates, the
+    [start, end] range, or (neither) every date. Days left with no records
+    are removed. Caller commits.
+    """
+    stmt = upsert_stmt(DailyStoreSales.__table__, ["store_id", "date"],
+                       ["total_sales", "sku_count", "updated_at"])
+    now  = datetime.utcnow()
+
+    def _refresh(in_scope):
+        """in_scope(date_column) → SQL condition selecting the days to recompute."""
+        rows = (
+            db.session.query(
+                SalesRecord.date,
+                sa.func.coalesce(sa.func.sum(SalesRecord.sales), 0).label("total"),
+                sa.func.count(SalesRecord.id).label("skus"),
+            )
+            .join(Item, Item.id == SalesRecord.item_pk)
+            .filter(Item.store_id == store_id, in_scope(SalesRecord.date))
+            .group_by(SalesRecord.date)
+            .all()
+        )
+        # Clear the scope first so days that lost all their records disappear
+        DailyStoreSales.query.filter(
+            DailyStoreSales.store_id == store_id, in_scope(DailyStoreSales.date)
+        ).delete(synchronize_session=False)
+        if rows:
+            db.session.execute(stmt, [
+                {"store_id": store_id, "date": r.date, "total_sales": float(r.total),
+                 "sku_count": int(r.skus), "updated_at": now}
+                for r in rows
+            ])
+
+    if dates is not None:
+        for chunk in _chunks(sorted(set(dates))):
+            _refresh(lambda col: col.in_(chunk))
+    else:
+        _refresh(lambda col: sa.and_(
+            col >= start if start is not None else sa.true(),
+            col <= end   if end   is not None else sa.true(),
+        ))
+
+
+def _mark_daily_complete(store_id: str) -> None:
+    stmt = upsert_stmt(StoreRollupState.__table__, ["store_id"], [])
+    db.session.execute(stmt, [{"store_id": store_id, "daily_complete_at": datetime.utcnow()}])
+
+
+def refresh_store_days(store_id: str, dates: Iterable) -> None:
+    """
+    Refresh a store's daily rollup after a write to `dates`; the whole
+    history instead if the store was never backfilled. Caller commits.
+    """
+    if db.session.get(StoreRollupState, store_id) is None:
+        refresh_daily_store_sales(store_id)
+        _mark_daily_complete(store_id)
+    else:
+        refresh_daily_store_sales(store_id, dates=dates)
+
+
+def ensure_daily_store_sales(store_id: str) -> None:
+    """Backfill a store's daily rollup once (data written before the table existed)."""
+    if db.session.get(StoreRollupState, store_id) is None:
+        refresh_daily_store_sales(store_id)
+        _mark_daily_complete(store_id)
+        db.session.commit()
@@ -0,0 +1,127 @@
+"""
+src/snapshots.py — Nightly forecast snapshots served as read-only lookups.
+
+`flask materialize` runs full_forecast for every item on the process pool
+(default horizon and seasonal period, the item's own current_stock and
+lead_time) and stores each response, zlib-compressed, in
+`forecast_snapshots`. GET /api/forecast/<sku> returns the stored response
+with four indexed lookups instead of loading the series and fitting, as
+long as the request parameters match and the item has no sales newer than
+the snapshot (its ItemSalesSummary, refreshed on every upload, is not newer
+than the snapshot). Anything else falls back to live computation.
+
+The full-series Holt-Winters fit is made the way a live request makes it:
+updated from the item's stored fit in HW_UPDATE_MODE (src/warm_start.py),
+so a snapshot and the live response agree. A snapshot older than the item's
+stored fit (replaced by `flask refit-hw`) is therefore not served either.
+"""
+from __future__ import annotations
+
+import json
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+import pandas as pd
+
+from config import Config
+from models import db, Item, ForecastSnapshot, ItemSalesSummary, HoltWintersState, upsert_stmt
+from src.bulk_forecast import load_store_series, make_payload, iter_full_forecasts
+from src.model_selection import attach_champions, record_selection
+from src.warm_start import load_fits
+
+# Flushes snapshot upserts every this many items during a materialize run
+_WRITE_BATCH = 200
+
+
+def load_snapshot(item, method: str, horizon: int, seasonal_period: int,
+                  current_stock: int, lead_time: int) -> Optional[Dict[str, Any]]:
+    """The stored response if it matches these parameters and is still current, else None."""
+    snap = ForecastSnapshot.query.filter_by(
+        item_pk=item.id, method=method, horizon=horizon, seasonal_period=seasonal_period,
+    ).first()
+    if snap is None or snap.current_stock != current_stock or snap.lead_time != lead_time:
+        return None
+
+    summary = db.session.get(ItemSalesSummary, item.id)
+    if summary is None or summary.last_date != snap.data_through:
+        return None
+    if summary.updated_at and summary.updated_at > snap.created_at:
+        return None
+    fitted = (db.session.query(HoltWintersState.updated_at)
+              .filter_by(item_pk=item.id, seasonal_period=seasonal_period).scalar())
+    if fitted and fitted > snap.created_at:
+        return None
+
+    result = json.loads(zlib.decompress(snap.payload))
+    result["snapshot"] = {
+        "created_at":   snap.created_at.isoformat(),
+        "data_through": snap.data_through.isoformat(),
+    }
+    return result
+
+
+def _snapshot_row(payload: Dict[str, Any], result: Dict[str, Any], series: pd.Series,
+                  now: datetime) -> Dict[str, Any]:
+    return {
+        "item_pk":         payload["item_pk"],
+        "method":          payload["method"],
+        "horizon":         payload["horizon"],
+        "seasonal_period": payload["seasonal_period"],
+        "current_stock":   payload["current_stock"],
+        "lead_time":       payload["lead_time"],
+        "data_through":    series.index[-1].date(),
+        "payload":         zlib.compress(json.dumps(result, separators=(",", ":")).encode()),
+        "created_at":      now,
+    }
+
+
+def materialize(store_id: Optional[str] = None, methods: Iterable[str] = ("holt_winters",),
+                horizon: int = Config.DEFAULT_HORIZON,
+                seasonal_period: int = Config.DEFAULT_SEASONAL_PERIOD) -> Dict[str, int]:
+    """Recompute snapshots for every item (optionally one store). Returns counts."""
+    stmt = upsert_stmt(
+        ForecastSnapshot.__table__, ["item_pk", "method", "horizon", "seasonal_period"],
+        ["current_stock", "lead_time", "data_through", "payload", "created_at"],
+    )
+    stores = [store_id] if store_id else [
+        s for (s,) in db.session.query(Item.store_id).distinct().order_by(Item.store_id)
+    ]
+    counts = {"written": 0, "failed": 0}
+
+    for store in stores:
+        # Taken before the series are read, so uploads during the run invalidate them
+        now    = datetime.utcnow()
+        items  = {i.id: i for i in Item.query.filter_by(store_id=store)}
+        series = load_store_series(store)
+        fits   = load_fits(list(series), seasonal_period)
+        for method in methods:
+            payloads = [
+                make_payload(items[pk], s, method=method, horizon=horizon,
+                             seasonal_period=seasonal_period,
+                             hw_update=Config.HW_UPDATE_MODE, hw_fit=fits.get(pk))
+                for pk, s in series.items() if pk in items
+            ]
+            if method == "auto":
+                attach_champions(payloads, seasonal_period)
+            by_pk = {p["item_pk"]: p for p in payloads}
+
+            rows = []
+            for res in iter_full_forecasts(payloads):
+                if "error" in res:
+                    counts["failed"] += 1
+                    continue
+                pk = res["item_pk"]
+                record_selection(res, series[pk], seasonal_period)
+                rows.append(_snapshot_row(by_pk[pk], res["forecast"], series[pk], now))
+                if len(rows) >= _WRITE_BATCH:
+                    db.session.execute(stmt, rows)
+                    db.session.commit()
+                    counts["written"] += len(rows)
+                    rows = []
+            if rows:
+                db.session.execute(stmt, rows)
+                db.session.commit()
+                counts["written"] += len(rows)
+
+    return counts
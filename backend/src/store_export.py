@@ -0,0 +1,161 @@
+"""
+src/store_export.py — Forecasts for every SKU of a store, streamed as CSV or Parquet.
+
+Items are taken EXPORT_BATCH_SKUS at a time: their series are loaded in one
+query and fanned out to the process pool (src/bulk_forecast.py) with
+include=["forecast"], a single fit per SKU. Each SKU's CSV rows are sent as
+soon as its fit completes, and the next batch is only loaded once the
+current one is done. Memory therefore depends on the batch size, not on the
+number of SKUs.
+
+Rows are (store_id, item_id, date, forecast, ci_lower, ci_upper, error). A
+SKU whose forecast failed (e.g. too little history) gets a single row with
+only item_id and error set. Parquet output (needs `pyarrow`) is compressed
+and written one row group per EXPORT_BATCH_SKUS SKUs. Each row group's bytes
+are sent as soon as it is written.
+"""
+from __future__ import annotations
+
+import csv
+import io
+from typing import Any, Dict, Iterator
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+
+COLUMNS = ["store_id", "item_id", "date", "forecast", "ci_lower", "ci_upper", "error"]
+FORMATS = ("csv", "parquet")
+
+
+def _rows(store_id: str, res: Dict[str, Any]) -> Dict[str, list]:
+    """Column lists for one pool result."""
+    fc = res.get("forecast")
+    if res.get("error") or not fc:
+        return {"store_id": [store_id], "item_id": [res["item_id"]], "date": [None],
+                "forecast": [None], "ci_lower": [None], "ci_upper": [None],
+                "error": [res.get("error") or "No forecast."]}
+    n     = len(fc["forecast"]["values"])
+    dates = pd.date_range(fc["forecast"]["start"], periods=n, freq="D").date
+    return {
+        "store_id": [store_id] * n,
+        "item_id":  [res["item_id"]] * n,
+        "date":     list(dates),
+        "forecast": np.asarray(fc["forecast"]["values"], dtype=float).tolist(),
+        "ci_lower": np.asarray(fc["ci_lower"]["values"], dtype=float).tolist(),
+        "ci_upper": np.asarray(fc["ci_upper"]["values"], dtype=float).tolist(),
+        "error":    [None] * n,
+    }
+
+
+def iter_store_forecasts(store_id: str, horizon: int = Config.DEFAULT_HORIZON,
+                         seasonal_period: int = Config.DEFAULT_SEASONAL_PERIOD,
+                         method: str = "holt_winters",
+                         batch_skus: int = Config.EXPORT_BATCH_SKUS) -> Iterator[Dict[str, list]]:
+    """Column lists of each SKU of the store, in completion order within each batch."""
+    from models import db, Item
+    from src.bulk_forecast import load_store_series, make_payload, iter_full_forecasts
+    from src.model_selection import attach_champions, record_selection
+
+    pks = [pk for (pk,) in db.session.query(Item.id).filter(Item.store_id == store_id).order_by(Item.item_id)]
+    for start in range(0, len(pks), batch_skus):
+        chunk  = pks[start:start + batch_skus]
+        items  = {i.id: i for i in Item.query.filter(Item.id.in_(chunk))}
+        series = load_store_series(store_id, chunk)
+        for pk in chunk:
+            if pk not in series:
+                yield _rows(store_id, {"item_id": items[pk].item_id, "error": "No sales records."})
+        payloads = [
+            make_payload(items[pk], series[pk], horizon=horizon, seasonal_period=seasonal_period,
+                         method=method, include=["forecast"], compact=True)
+            for pk in chunk if pk in series
+        ]
+        if method == "auto":
+            attach_champions(payloads, seasonal_period)
+        for res in iter_full_forecasts(payloads):
+            if method == "auto":
+                record_selection(res, series[res["item_pk"]], seasonal_period)
+            yield _rows(store_id, res)
+        if method == "auto":
+            db.session.commit()
+
+
+def csv_chunks(skus: Iterator[Dict[str, list]]) -> Iterator[str]:
+    yield ",".join(COLUMNS) + "\r\n"
+    for cols in skus:
+        buf = io.StringIO()
+        csv.writer(buf).writerows(zip(*(cols[c] for c in COLUMNS)))
+        yield buf.getvalue()
+
+
+class _Sink:
+    """Write-only file object for ParquetWriter; take() hands over what was written so far."""
+
+    def __init__(self):
+        self._parts = []
+        self._pos   = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        out, self._parts = b"".join(self._parts), []
+        return out
+
+
+def parquet_chunks(skus: Iterator[Dict[str, list]],
+                   batch_skus: int = Config.EXPORT_BATCH_SKUS) -> Iterator[bytes]:
+    """
+    One row group per batch, compressed with EXPORT_PARQUET_COMPRESSION.
+    Raises RuntimeError right away (before anything is streamed) without pyarrow.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:   # pragma: no cover - depends on the deployment
+        raise RuntimeError("format=parquet requires the 'pyarrow' package.") from e
+    return _parquet_stream(pa, pq, skus, batch_skus)
+
+
+def _parquet_stream(pa, pq, skus, batch_skus) -> Iterator[bytes]:
+    schema = pa.schema([
+        ("store_id", pa.string()),
+        ("item_id",  pa.string()),
+        ("date",     pa.date32()),
+        ("forecast", pa.float64()),
+        ("ci_lower", pa.float64()),
+        ("ci_upper", pa.float64()),
+        ("error",    pa.string()),
+    ])
+    sink   = _Sink()
+    writer = pq.ParquetWriter(sink, schema, compression=Config.EXPORT_PARQUET_COMPRESSION)
+    batch  = []
+
+    def row_group() -> bytes:
+        cols = {c: [v for b in batch for v in b[c]] for c in COLUMNS}
+        writer.write_table(pa.table(cols, schema=schema))
+        batch.clear()
+        return sink.take()
+
+    for cols in skus:
+        batch.append(cols)
+        if len(batch) >= batch_skus:
+            yield row_group()
+    if batch:
+        yield row_group()
+    writer.close()
+    yield sink.take()
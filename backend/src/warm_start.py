@@ -0,0 +1,217 @@
+"""
+src/warm_start.py — Holt-Winters updates from the last stored fit.
+
+Day over day a SKU gains a few observations and its optimal parameters
+barely move, so re-running the optimiser from cold on every request is
+mostly wasted. The last optimised fit (smoothing parameters and pre-sample
+level/trend/seasonal states, see src/hw_state.py) is kept per
+(item, seasonal_period) in `hw_states` and later requests update from it:
+
+  propagate — no optimisation: the stored state is run through the current
+              series with the model's recursions.
+  warm      — the optimiser is seeded with the stored optimum and skips its
+              brute-force starting grid.
+  full      — cold fit, the original behaviour.
+
+Whatever the mode, a request falls back to a cold fit when there is no
+stored fit, the series start moved, the series became long enough for (or
+lost) the seasonal component, the fit is older than HW_REFIT_MAX_AGE_DAYS,
+or drift is detected: the RMSE of the one-step residuals since the fit
+exceeds HW_DRIFT_RATIO × the in-sample residual std.
+
+Requests never write a fit inline. Stored fits are replaced by `flask
+refit-hw`, which re-optimises every item and is meant to run on a schedule
+(and after the first upload), and by the job-queue threads: when a read had
+to refit from cold because the stored fit was invalidated (drift, age, ...),
+that fit is stored in the background, so the next reads update from it. Each
+such refit counts in /api/metrics as hw_refits_total{reason}. The default mode is warm, so the parameters a read uses
+are re-optimised for the current series; the stored fit only seeds them.
+Each result's "update" entry reports when the stored fit was made and when
+it is due for a refit (`stale_after`).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import queue
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from models import db, Item, HoltWintersState, upsert_stmt
+from src.bulk_forecast import load_store_series, make_payload, iter_pool
+from src.forecasting_engine import DemandForecaster
+from src.instrumentation import increment
+
+log = logging.getLogger(__name__)
+
+UPDATE_MODES = ("propagate", "warm", "full")
+
+
+def _refit_reason(stored: Dict[str, Any], series: pd.Series,
+                  seasonal_period: int, fitted: pd.Series) -> Optional[str]:
+    """Why the stored fit can't be updated incrementally, or None if it can."""
+    if series.index[0].date() != stored["series_start"]:
+        return "series start moved"
+    if (len(series) >= 2 * seasonal_period) != bool(stored["state"]["seasons"]):
+        return "seasonality changed"
+    if datetime.utcnow() - stored["fitted_at"] > timedelta(days=Config.HW_REFIT_MAX_AGE_DAYS):
+        return "scheduled"
+
+    resid = series.values[stored["fit_nobs"]:] - fitted.values[stored["fit_nobs"]:]
+    if len(resid) >= seasonal_period and stored["fit_sigma"] > 0:
+        if np.sqrt(np.mean(resid ** 2)) > Config.HW_DRIFT_RATIO * stored["fit_sigma"]:
+            return "drift"
+    return None
+
+
+def load_fits(item_pks: Iterable[int], seasonal_period: int) -> Dict[int, Dict[str, Any]]:
+    """Stored fits as plain (picklable) dicts, for update_fit here or in a pool worker."""
+    rows = HoltWintersState.query.filter(
+        HoltWintersState.item_pk.in_(list(item_pks)),
+        HoltWintersState.seasonal_period == seasonal_period,
+    )
+    return {
+        r.item_pk: {
+            "state":        json.loads(r.state),
+            "series_start": r.series_start,
+            "fit_nobs":     r.fit_nobs,
+            "fit_sigma":    r.fit_sigma,
+            "fitted_at":    r.fitted_at,
+        }
+        for r in rows
+    }
+
+
+def save_fit(item_pk: int, seasonal_period: int, series: pd.Series, res: Dict[str, Any],
+             mode: str) -> None:
+    """Store a fresh optimised fit. Caller commits."""
+    now  = datetime.utcnow()
+    cols = ["state", "series_start", "fit_nobs", "fit_sigma", "fit_mode", "updated_at"]
+    row  = {
+        "item_pk":         item_pk,
+        "seasonal_period": seasonal_period,
+        "state":           json.dumps(res["state"]),
+        "series_start":    series.index[0].date(),
+        "fit_nobs":        len(series),
+        "fit_sigma":       float((series - res["fitted"]).std()),
+        "fit_mode":        mode,
+        "fitted_at":       now,
+        "updated_at":      now,
+    }
+    if mode == "full":
+        cols.append("fitted_at")
+    stmt = upsert_stmt(HoltWintersState.__table__, ["item_pk", "seasonal_period"], cols)
+    db.session.execute(stmt, [row])
+
+
+def holt_winters_update(item_pk: int, series: pd.Series, seasonal_period: int,
+                        horizon: int, mode: str = None) -> Dict[str, Any]:
+    """
+    DemandForecaster.holt_winters_forecast for an item, updated from its
+    stored fit according to `mode`. Adds an "update" entry describing what
+    was done and how old the stored fit is. A cold refit of an invalidated
+    fit is stored in the background (_queue_save); see also refit_all.
+    """
+    stored = load_fits([item_pk], seasonal_period).get(item_pk)
+    res    = update_fit(series, seasonal_period, horizon, mode, stored)
+    reason = res["update"].get("reason")
+    if stored is not None and reason not in (None, "requested"):
+        _queue_save(item_pk, seasonal_period, series, res, reason)
+    return res
+
+
+def _queue_save(item_pk: int, seasonal_period: int, series: pd.Series, res: Dict[str, Any],
+                reason: str) -> None:
+    """Store the cold fit a read just made in place of an invalidated one, on a job thread."""
+    from flask import current_app
+    from src.job_queue import get_job_queue
+
+    increment("hw_refits_total", reason=reason)
+    fit = {"state": res["state"], "fitted": res["fitted"]}
+    try:
+        get_job_queue(current_app._get_current_object()).defer(
+            _save_queued_fit, item_pk, seasonal_period, series, fit,
+        )
+    except queue.Full:
+        log.warning("Job queue full; not storing the refit of item %s (%s)", item_pk, reason)
+
+
+def _save_queued_fit(item_pk: int, seasonal_period: int, series: pd.Series, fit: Dict[str, Any]) -> None:
+    save_fit(item_pk, seasonal_period, series, fit, "full")
+    db.session.commit()
+
+
+def update_fit(series: pd.Series, seasonal_period: int, horizon: int,
+               mode: Optional[str], stored: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """holt_winters_update from an already loaded fit (load_fits); no database access."""
+    mode = mode or Config.HW_UPDATE_MODE
+    if mode not in UPDATE_MODES:
+        raise ValueError(f"Unknown update mode '{mode}'; expected one of {', '.join(UPDATE_MODES)}.")
+
+    engine = DemandForecaster(seasonal_period=seasonal_period)
+    reason = "requested" if mode == "full" else "no stored fit"
+    window = {}
+    if stored is not None:
+        window = {
+            "fitted_at":   stored["fitted_at"].isoformat(),
+            "stale_after": (stored["fitted_at"] + timedelta(days=Config.HW_REFIT_MAX_AGE_DAYS)).isoformat(),
+        }
+
+    if mode != "full" and stored is not None:
+        state  = stored["state"]
+        res    = engine.holt_winters_from_state(series, state, horizon)
+        reason = _refit_reason(stored, series, seasonal_period, res["fitted"])
+        if reason is None:
+            new_obs = len(series) - stored["fit_nobs"]
+            if mode == "propagate" or new_obs == 0:
+                res["update"] = {"mode": "propagate", "new_obs": new_obs, **window}
+                return res
+            res = engine.holt_winters_forecast(series, horizon=horizon, start_state=state)
+            res["update"] = {"mode": "warm", "new_obs": new_obs, **window}
+            return res
+
+    res = engine.holt_winters_forecast(series, horizon=horizon)
+    res["update"] = {"mode": "full", "reason": reason, **window}
+    return res
+
+
+def _full_fit_task(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Cold Holt-Winters fit for one item; runs in a worker process."""
+    result = {"item_pk": payload["item_pk"]}
+    try:
+        engine = DemandForecaster(seasonal_period=payload["seasonal_period"])
+        res    = engine.holt_winters_forecast(payload["series"], horizon=1)
+        result["fit"] = {"state": res["state"], "fitted": res["fitted"]}
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def refit_all(store_id: Optional[str] = None,
+              seasonal_period: int = Config.DEFAULT_SEASONAL_PERIOD) -> Dict[str, int]:
+    """Scheduled full re-optimisation of every item's stored fit, on the process pool."""
+    stores = [store_id] if store_id else [
+        s for (s,) in db.session.query(Item.store_id).distinct().order_by(Item.store_id)
+    ]
+    counts = {"fitted": 0, "failed": 0}
+
+    for store in stores:
+        items    = {i.id: i for i in Item.query.filter_by(store_id=store)}
+        series   = load_store_series(store)
+        payloads = [
+            make_payload(items[pk], s, seasonal_period=seasonal_period)
+            for pk, s in series.items() if pk in items and len(s) >= 14
+        ]
+        for res in iter_pool(_full_fit_task, payloads):
+            if "error" in res:
+                counts["failed"] += 1
+                continue
+            save_fit(res["item_pk"], seasonal_period, series[res["item_pk"]], res["fit"], "full")
+            counts["fitted"] += 1
+        db.session.commit()
+
+    return counts
@@ -0,0 +1,335 @@
+import csv
+import json
+import re
+from datetime import date, datetime, timedelta
+from io import BytesIO, StringIO
+
+import pytest
+import sqlalchemy as sa
+
+from config import Config
+from models import db, Item, SalesRecord, HoltWintersState, ForecastJob
+
+
+def _upload(client, auth, csv: str, **query):
+    return client.post("/api/items/upload", query_string=query, headers=auth,
+                       data={"file": (BytesIO(csv.encode()), "sales.csv")},
+                       content_type="multipart/form-data")
+
+
+def _csv(days: int, start: date = date(2023, 1, 1), item: str = "item_1", sales=lambda n: 10 + n % 7):
+    rows = [f"{start + timedelta(days=n)},store_1,{item},{sales(n)}" for n in range(days)]
+    return "date,store_id,item_id,sales\n" + "\n".join(rows) + "\n"
+
+
+def _metric(client, line: str) -> float:
+    """The value of one /api/metrics sample, by its name and labels; 0 when absent."""
+    text  = client.get("/api/metrics").get_data(as_text=True)
+    match = re.search(rf"^{re.escape(line)} (\S+)$", text, re.M)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_dashboard_after_upload_includes_history_written_before_the_rollup(client, auth):
+    # Sales written directly, as before daily_store_sales existed
+    item = Item(item_id="item_1", store_id="store_1")
+    db.session.add(item)
+    db.session.flush()
+    db.session.execute(sa.insert(SalesRecord), [
+        {"item_pk": item.id, "date": date(2022, 12, 1) + timedelta(days=n), "sales": 5.0}
+        for n in range(31)
+    ])
+    db.session.commit()
+
+    assert _upload(client, auth, _csv(10)).status_code == 201
+    body = client.get("/api/dashboard", headers=auth).get_json()
+
+    upload_total = sum(10 + n % 7 for n in range(10))
+    assert body["total_sales"] == 31 * 5.0 + upload_total
+    assert len(body["trend_chart"]) == 41
+
+
+def test_restock_plan_keeps_zero_stock_and_rejects_non_object_bodies(client, auth):
+    assert _upload(client, auth, _csv(60)).status_code == 201
+    Item.query.filter_by(item_id="item_1").update({"current_stock": 0})
+    db.session.commit()
+
+    plan = client.get("/api/restock/plan", query_string={"store_id": "store_1"}, headers=auth).get_json()
+    assert plan["items"][0]["current_stock"] == 0
+    assert plan["items"][0]["reorder_alert"]
+
+    for body in ([1, 2], {"unit_costs": [1, 2]}, {"unit_costs": "x"}, {"unit_costs": {"item_1": "x"}},
+                 {"horizon": 0}, {"horizon": -3}, {"seasonal_period": 0}):
+        resp = client.post("/api/restock/plan", json=body, headers=auth)
+        assert resp.status_code == 422, body
+
+
+def test_forecast_server_timing_and_metrics_counters(client, auth):
+    assert _upload(client, auth, _csv(60)).status_code == 201
+
+    fits     = 'model_fits_total{method="moving_average"}'
+    queries  = "db_queries_total"
+    stages   = 'stage_duration_seconds_count{stage="forecast"}'
+    requests = 'http_requests_total{endpoint="forecast.get_forecast",method="GET",status="200"}'
+    before   = {k: _metric(client, k) for k in (fits, queries, stages, requests)}
+
+    resp = client.get("/api/forecast/item_1", query_string={"method": "moving_average"}, headers=auth)
+    assert resp.status_code == 200
+    timing  = resp.headers["Server-Timing"]
+    names   = {part.split(";")[0] for part in timing.split(", ")}
+    assert {"load_series", "build_series", "forecast", "serialize", "db", "fit.moving_average", "total"} <= names
+    n_queries = int(re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', timing).group(1))
+    n_fits    = int(re.search(r'fit\.moving_average;dur=[\d.]+;desc="(\d+) fits?"', timing).group(1))
+
+    assert _metric(client, fits) == before[fits] + n_fits
+    assert _metric(client, stages) == before[stages] + 1
+    assert _metric(client, requests) == before[requests] + 1
+    assert _metric(client, queries) >= before[queries] + n_queries
+
+
+def test_history_pages_with_next_cursor_and_date_range(client, auth, monkeypatch):
+    assert _upload(client, auth, _csv(25)).status_code == 201
+    pk  = Item.query.filter_by(item_id="item_1").one().id
+    url = f"/api/items/{pk}/history"
+
+    dates, cursor = [], None
+    while True:
+        query = {"limit": 10, **({"cursor": cursor} if cursor else {})}
+        page  = client.get(url, query_string=query, headers=auth).get_json()
+        dates += [r["date"] for r in page["history"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+        assert cursor == page["history"][-1]["date"]
+    assert dates == [str(date(2023, 1, 1) + timedelta(days=n)) for n in range(25)]
+
+    page = client.get(url, query_string={"from": "2023-01-05", "to": "2023-01-07"}, headers=auth).get_json()
+    assert [r["date"] for r in page["history"]] == ["2023-01-05", "2023-01-06", "2023-01-07"]
+    assert page["next_cursor"] is None
+
+    monkeypatch.setattr(Config, "HISTORY_MAX_PAGE_SIZE", 20)
+    for limit in (0, 21):
+        assert client.get(url, query_string={"limit": limit}, headers=auth).status_code == 422
+    assert client.get(url, query_string={"limit": 20}, headers=auth).status_code == 200
+    assert client.get(url, query_string={"from": "01/05/2023"}, headers=auth).status_code == 422
+
+
+def test_history_streams_csv_and_ndjson(client, auth):
+    assert _upload(client, auth, _csv(25)).status_code == 201
+    pk    = Item.query.filter_by(item_id="item_1").one().id
+    url   = f"/api/items/{pk}/history"
+    query = {"from": "2023-01-03", "to": "2023-01-22"}
+
+    resp = client.get(url, query_string={**query, "format": "csv"}, headers=auth)
+    assert resp.mimetype == "text/csv"
+    rows = list(csv.DictReader(StringIO(resp.get_data(as_text=True))))
+    assert len(rows) == 20
+    assert (rows[0]["date"], rows[-1]["date"]) == ("2023-01-03", "2023-01-22")
+    assert float(rows[0]["sales"]) == 10 + 2 % 7
+
+    resp  = client.get(url, query_string={**query, "format": "ndjson"}, headers=auth)
+    lines = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert resp.mimetype == "application/x-ndjson"
+    assert [r["date"] for r in lines] == [r["date"] for r in rows]
+
+
+def test_store_parquet_export_reads_back_with_error_rows(client, auth):
+    pq = pytest.importorskip("pyarrow.parquet")
+    csv_text = _csv(60) + _csv(60, item="item_2").split("\n", 1)[1]
+    assert _upload(client, auth, csv_text).status_code == 201
+    db.session.add(Item(item_id="item_3", store_id="store_1"))
+    db.session.commit()
+
+    url  = "/api/forecast/store/store_1/export"
+    resp = client.get(url, query_string={"format": "parquet", "method": "moving_average", "horizon": 14},
+                      headers=auth)
+    assert resp.status_code == 200
+    table = pq.read_table(BytesIO(resp.get_data())).to_pandas()
+
+    assert len(table) == 2 * 14 + 1
+    errors = table[table["error"].notna()]
+    assert errors[["item_id", "error"]].values.tolist() == [["item_3", "No sales records."]]
+    assert errors["forecast"].isna().all()
+    assert table[table["error"].isna()].groupby("item_id").size().to_dict() == {"item_1": 14, "item_2": 14}
+
+    resp = client.get(url, query_string={"method": "arima"}, headers=auth)
+    assert resp.status_code == 422
+
+
+def test_restock_rejects_unknown_engines(client, auth):
+    assert _upload(client, auth, _csv(60)).status_code == 201
+    assert client.get("/api/restock", query_string={"engine": "bogus"}, headers=auth).status_code == 422
+    lines = client.get("/api/restock", query_string={"engine": "batch"}, headers=auth).get_data(as_text=True)
+    assert json.loads(lines.splitlines()[-1])["completed"] == 1
+
+
+def test_backtest_validates_step_and_horizon_and_keeps_its_shape_when_cached(client, auth):
+    assert _upload(client, auth, _csv(120)).status_code == 201
+    url = "/api/forecast/item_1/backtest"
+
+    for query in ({"step": 0}, {"step": -5}, {"horizon": 0}, {"folds": 0}):
+        resp = client.get(url, query_string=query, headers=auth)
+        assert resp.status_code == 422, query
+        assert "must be at least 1" in resp.get_json()["error"]
+
+    query  = {"horizon": 7, "folds": 3}
+    fresh  = client.get(url, query_string=query, headers=auth).get_json()
+    cached = client.get(url, query_string=query, headers=auth).get_json()
+    assert (fresh["cached"], cached["cached"]) == (False, True)
+    assert set(fresh) == set(cached)
+    assert fresh["computed_at"] == cached["computed_at"]
+    assert len({f["cutoff"] for f in fresh["folds"]}) == 3
+
+
+@pytest.mark.parametrize("mode", [None, "stream"])
+def test_upload_gap_fill_never_overwrites_stored_days(client, auth, mode):
+    assert _upload(client, auth, _csv(10)).status_code == 201
+    # item_1 only on the first and last day: the days between are gap-filled with 0
+    csv_text = (_csv(1, sales=lambda n: 99) + _csv(1, start=date(2023, 1, 10), sales=lambda n: 99)
+                .split("\n", 1)[1])
+    query = {"mode": mode} if mode else {}
+    resp  = _upload(client, auth, csv_text, **query)
+    assert resp.status_code == 201
+    assert resp.get_json()["ingest"]["inserted"] == 0
+
+    sales = dict(db.session.execute(sa.select(SalesRecord.date, SalesRecord.sales)
+                                    .order_by(SalesRecord.date)).all())
+    assert sales[date(2023, 1, 1)] == sales[date(2023, 1, 10)] == 99
+    assert [sales[date(2023, 1, 1) + timedelta(days=n)] for n in range(1, 9)] == [10 + n % 7 for n in range(1, 9)]
+
+
+def test_stream_upload_reports_measure_pass_errors_as_json(client, auth, monkeypatch):
+    from src.data_cleaner import StreamingCleaner
+
+    def broken(self, chunk):
+        raise ValueError("bad chunk")
+    monkeypatch.setattr(StreamingCleaner, "measure", broken)
+    resp = _upload(client, auth, _csv(10), mode="stream")
+    assert resp.status_code == 422
+    assert resp.get_json()["error"] == "Data validation failed: bad chunk"
+
+
+def test_forecast_stores_the_refit_of_an_expired_hw_fit_in_the_background(app, client, auth):
+    from src.job_queue import get_job_queue
+    from src.warm_start import refit_all
+
+    assert _upload(client, auth, _csv(60)).status_code == 201
+    assert refit_all("store_1")["fitted"] == 1
+    expired = datetime.utcnow() - timedelta(days=Config.HW_REFIT_MAX_AGE_DAYS + 1)
+    HoltWintersState.query.update({"fitted_at": expired})
+    db.session.commit()
+    refits = 'hw_refits_total{reason="scheduled"}'
+    before = _metric(client, refits)
+
+    body = client.get("/api/forecast/item_1", query_string={"snapshot": 0}, headers=auth).get_json()
+    assert body["hw_update"]["mode"] == "full"
+    assert body["hw_update"]["reason"] == "scheduled"
+    get_job_queue(app)._queue.join()
+
+    db.session.expire_all()
+    assert HoltWintersState.query.one().fitted_at > expired + timedelta(days=1)
+    assert _metric(client, refits) == before + 1
+    body = client.get("/api/forecast/item_1", query_string={"horizon": 14}, headers=auth).get_json()
+    assert body["hw_update"]["mode"] != "full"
+
+
+def test_forecast_cache_misses_after_an_upload_even_with_an_unchanged_series(client, auth, monkeypatch):
+    from src.forecast_cache import forecast_cache
+
+    assert _upload(client, auth, _csv(60)).status_code == 201
+    query = {"method": "moving_average", "snapshot": 0}
+
+    def cache_header():
+        return client.get("/api/forecast/item_1", query_string=query, headers=auth).headers["X-Forecast-Cache"]
+
+    assert [cache_header(), cache_header()] == ["miss", "hit"]
+
+    # Same rows again: the fingerprint is unchanged, so only the explicit invalidation misses
+    invalidated = []
+    real        = forecast_cache.invalidate
+    monkeypatch.setattr(forecast_cache, "invalidate", lambda pk: (invalidated.append(pk), real(pk)))
+    assert _upload(client, auth, _csv(60)).status_code == 201
+    assert invalidated and cache_header() == "miss"
+
+    # New day: a new fingerprint, so no entry matches even without invalidation
+    monkeypatch.setattr(forecast_cache, "invalidate", lambda pk: None)
+    assert _upload(client, auth, _csv(1, start=date(2023, 3, 2))).status_code == 201
+    assert cache_header() == "miss"
+
+
+def test_forecast_job_runs_from_queued_to_completed(app, client, auth):
+    from src.job_queue import get_job_queue
+
+    assert _upload(client, auth, _csv(60)).status_code == 201
+    resp = client.post("/api/forecast/jobs", headers=auth,
+                       json={"skus": ["item_1", "nope"], "method": "moving_average", "horizon": 7})
+    assert resp.status_code == 202
+    job = resp.get_json()["job"]
+    assert job["status"] == "queued" and job["total"] == 2
+    get_job_queue(app)._queue.join()
+
+    body = client.get(f"/api/forecast/jobs/{job['id']}", headers=auth).get_json()
+    assert body["job"]["status"] == "completed"
+    assert (body["job"]["completed"], body["job"]["failed"], body["job"]["progress"]) == (1, 1, 1.0)
+    assert body["job"]["started_at"] <= body["job"]["finished_at"]
+    by_sku = {r["sku"]: r for r in body["results"]}
+    assert by_sku["nope"]["error"] == "Item 'nope' not found for store 'store_1'."
+    assert len(by_sku["item_1"]["result"]["forecast"]) == 7
+
+
+def test_forecast_job_queue_answers_503_when_full(app, client, auth, monkeypatch):
+    from src.job_queue import ForecastJobQueue
+
+    # No worker threads: jobs stay queued
+    monkeypatch.setattr(ForecastJobQueue, "_ensure_started", lambda self: None)
+    app.config["JOB_QUEUE_SIZE"] = 1
+    body = {"sku": "item_1"}
+    assert client.post("/api/forecast/jobs", json=body, headers=auth).status_code == 202
+
+    resp = client.post("/api/forecast/jobs", json=body, headers=auth)
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "30"
+    assert ForecastJob.query.count() == 1   # the rejected job is not left behind
+
+
+def test_fail_orphaned_jobs_marks_queued_and_running_jobs_failed(app):
+    from src.job_queue import ORPHANED_ERROR, fail_orphaned_jobs
+
+    for status in ("queued", "running", "completed"):
+        db.session.add(ForecastJob(id=status, status=status, store_id="store_1", params="{}"))
+    db.session.commit()
+
+    assert fail_orphaned_jobs() == 2
+    jobs = {j.id: j for j in ForecastJob.query}
+    assert [jobs[k].status for k in ("queued", "running", "completed")] == ["failed", "failed", "completed"]
+    assert jobs["running"].error == ORPHANED_ERROR and jobs["running"].finished_at is not None
+    assert jobs["completed"].error is None
+
+
+def test_snapshot_served_until_sales_or_the_stored_fit_change(client, auth):
+    from src.snapshots import load_snapshot, materialize
+    from src.warm_start import refit_all
+
+    assert _upload(client, auth, _csv(60)).status_code == 201
+    item = Item.query.filter_by(item_id="item_1").one()
+    args = ("holt_winters", Config.DEFAULT_HORIZON, Config.DEFAULT_SEASONAL_PERIOD,
+            item.current_stock, item.lead_time or Config.DEFAULT_LEAD_TIME)
+
+    def served():
+        return client.get("/api/forecast/item_1", headers=auth).headers["X-Forecast-Snapshot"]
+
+    assert materialize("store_1")["written"] == 1
+    assert load_snapshot(item, *args)["snapshot"]["data_through"] == "2023-03-01"
+    assert served() == "hit"
+    assert load_snapshot(item, args[0], 14, *args[2:]) is None
+    assert load_snapshot(item, *args[:3], args[3] + 1, args[4]) is None
+
+    # A stored fit newer than the snapshot (flask refit-hw)
+    assert refit_all("store_1")["fitted"] == 1
+    assert load_snapshot(item, *args) is None and served() == "miss"
+
+    # Sales newer than the snapshot
+    assert materialize("store_1")["written"] == 1
+    assert served() == "hit"
+    assert _upload(client, auth, _csv(1, start=date(2023, 3, 2))).status_code == 201
+    db.session.expire_all()
+    assert load_snapshot(item, *args) is None and served() == "miss"
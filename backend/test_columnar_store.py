@@ -0,0 +1,70 @@
+import pandas as pd
+import pytest
+
+from config import Config
+from src import columnar_store
+
+
+def _frame(days, sales, item="item_1"):
+    return pd.DataFrame({
+        "store_id": "store_1",
+        "item_id":  item,
+        "date":     pd.date_range("2023-01-01", periods=days),
+        "sales":    sales,
+    })
+
+
+def test_partitions_resolve_like_the_sql_upsert(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "SALES_PARQUET_DIR", str(tmp_path))
+
+    columnar_store.append(_frame(5, [1.0, 2, 3, 4, 5]))
+    columnar_store.append(_frame(3, [10.0, 20, 30]))                # overwrites days 1-3
+    columnar_store.append(_frame(6, [0.0] * 6), filled=True)        # only fills day 6
+    columnar_store.append(_frame(2, [7.0, 7], item="item_2"))
+
+    dates, sales = columnar_store.item_history("store_1", "item_1")
+    assert list(sales) == [10, 20, 30, 4, 5, 0]
+
+    columnar_store.compact("store_1", drop_item_ids=["item_2"])
+    assert len(columnar_store._parts("store_1")) == 1
+    assert list(columnar_store.item_history("store_1", "item_1")[1]) == [10, 20, 30, 4, 5, 0]
+    assert len(columnar_store.item_history("store_1", "item_2")[0]) == 0
+
+
+def test_compact_keeps_replaced_partitions_for_open_readers(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "SALES_PARQUET_DIR", str(tmp_path))
+    monkeypatch.setattr(Config, "SALES_PARQUET_RETIRE_SECONDS", 3600)
+
+    old = columnar_store.append(_frame(3, [1.0, 2, 3]))
+    columnar_store.compact("store_1")
+    newer = columnar_store.append(_frame(1, [9.0]))          # after the compaction: still wins
+    assert all(p.exists() for p in old)
+    assert [p.name for p in columnar_store._parts("store_1")][1:] == [newer[0].name]
+    assert list(columnar_store.item_history("store_1", "item_1")[1]) == [9, 2, 3]
+
+    monkeypatch.setattr(Config, "SALES_PARQUET_RETIRE_SECONDS", 0)
+    columnar_store.maybe_compact(["store_1"])
+    assert not any(p.exists() for p in old)
+    assert list(columnar_store.item_history("store_1", "item_1")[1]) == [9, 2, 3]
+
+
+def test_reads_wait_for_backfill(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "SALES_PARQUET_DIR", str(tmp_path))
+    monkeypatch.setattr(Config, "SALES_STORE", "parquet")
+
+    columnar_store.append(_frame(2, [1.0, 2]))
+    assert not columnar_store.serves("store_1")
+    (tmp_path / "store_1" / columnar_store.BACKFILL_MARKER).write_text("")
+    assert columnar_store.serves("store_1")
+
+
+def test_eda_reads_only_stores_served_from_parquet(tmp_path, monkeypatch):
+    from src.eda import run_eda
+
+    monkeypatch.setattr(Config, "SALES_PARQUET_DIR", str(tmp_path))
+    monkeypatch.setattr(Config, "SALES_STORE", "parquet")
+    columnar_store.append(_frame(2, [1.0, 2]))
+
+    for store_id in (None, "store_1"):
+        with pytest.raises(ValueError, match="not read from Parquet"):
+            run_eda(store_id=store_id, output_dir=str(tmp_path / "eda"))
@@ -0,0 +1,53 @@
+import pandas as pd
+
+from benchmarks.bench_data_cleaner import make_raw_sales, legacy_clean_dataframe
+from src.data_cleaner import clean_dataframe, StreamingCleaner
+
+
+def test_clean_dataframe_matches_legacy_pipeline():
+    raw = make_raw_sales(3_000, seed=7)
+    new_df, new_report = clean_dataframe(raw)
+    old_df, old_report = legacy_clean_dataframe(raw)
+
+    pd.testing.assert_frame_equal(new_df, old_df)
+    assert new_report == old_report
+
+
+def test_clean_dataframe_fills_gaps_and_caps_outliers():
+    raw = pd.DataFrame({
+        "date":    ["2023-01-01", "2023-01-02", "2023-01-04", "2023-01-05", "2023-01-06"],
+        "item_id": ["a"] * 5,
+        "sales":   [10, 12, 11, 500, 9],
+    })
+    df, report = clean_dataframe(raw)
+
+    assert df["date"].dt.strftime("%Y-%m-%d").tolist() == [
+        "2023-01-01", "2023-01-02", "2023-01-03", "2023-01-04", "2023-01-05", "2023-01-06",
+    ]
+    assert df.loc[2, "sales"] == 0
+    assert df["sales"].max() < 500
+    assert "Missing calendar days filled with 0 sales: 1 rows added" in report["steps"]
+
+
+def test_streaming_cleaner_merges_duplicates_across_chunks():
+    raw = pd.DataFrame({
+        "date":    ["2023-01-01", "2023-01-02", "2023-01-03", "2023-01-05",
+                    "2023-01-06", "2023-01-02", "2023-01-04", "2023-01-07"],
+        "item_id": ["a"] * 8,
+        "sales":   [10, 12, 11, 9, 10, 40, 13, 8],
+    })
+    chunks = [raw.iloc[:4], raw.iloc[4:]]          # 2023-01-02 is split across the chunks
+    expected, expected_report = clean_dataframe(raw)
+
+    cleaner = StreamingCleaner()
+    for chunk in chunks:
+        cleaner.observe(chunk)
+    for chunk in chunks:
+        cleaner.measure(chunk)
+    cleaner.finalize()
+    parts = [cleaner.clean_chunk(chunk) for chunk in chunks] + [cleaner.merged_frame()]
+    got   = pd.concat(parts).sort_values("date")
+
+    assert got["date"].tolist() == expected["date"].tolist()
+    assert got["sales"].tolist() == expected["sales"].tolist()    # 12 + 40, capped at 20
+    assert cleaner.report(len(got), 0)["steps"][3] == expected_report["steps"][3]
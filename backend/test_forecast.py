@@ -0,0 +1,232 @@
+import json
+import numpy as np
+import pandas as pd
+
+from src.batch_holt_winters import batch_holt_winters_forecast
+
+
+def _seasonal_series(n_days=120, level=20.0, slope=0.3, seed=0):
+    rng   = np.random.default_rng(seed)
+    t     = np.arange(n_days)
+    weekly = np.array([5, 3, 0, -1, -2, -2, -3], dtype=float)
+    y     = level + slope * t + weekly[t % 7] + rng.normal(0, 0.5, n_days)
+    return pd.Series(y, index=pd.date_range("2023-01-01", periods=n_days, freq="D"))
+
+
+def test_batch_holt_winters_result_shape():
+    series = {"a": _seasonal_series(seed=1), "b": _seasonal_series(seed=2)}
+    res    = batch_holt_winters_forecast(series, horizon=14, seasonal_period=7)
+
+    assert set(res) == {"a", "b"}
+    for r in res.values():
+        assert set(r) >= {"forecast", "ci_upper", "ci_lower", "fitted", "aic"}
+        assert len(r["forecast"]) == 14
+        assert r["forecast"].index[0] == pd.Timestamp("2023-05-01")
+        assert (r["ci_upper"] >= r["forecast"]).all()
+        assert r["seasonal"] is True
+
+
+def test_batch_holt_winters_tracks_trend_and_season():
+    s   = _seasonal_series(n_days=140, seed=3)
+    res = batch_holt_winters_forecast({"x": s}, horizon=7, seasonal_period=7)["x"]
+
+    t        = np.arange(140, 147)
+    weekly   = np.array([5, 3, 0, -1, -2, -2, -3], dtype=float)
+    expected = 20.0 + 0.3 * t + weekly[t % 7]
+    assert np.abs(res["forecast"].values - expected).max() < 2.0
+
+
+def test_batch_holt_winters_groups_unaligned_series():
+    long_s  = _seasonal_series(n_days=90)
+    short_s = _seasonal_series(n_days=10)
+    res     = batch_holt_winters_forecast({"long": long_s, "short": short_s}, horizon=5)
+
+    assert res["long"]["seasonal"] is True
+    assert res["short"]["seasonal"] is False
+    assert res["short"]["forecast"].index[0] == short_s.index[-1] + pd.Timedelta(days=1)
+
+
+def test_hw_state_propagation_matches_statsmodels():
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
+    from src.hw_state import state_from_fit, propagate, forecast_from_state
+
+    s   = _seasonal_series(n_days=100, seed=4)
+    fit = ExponentialSmoothing(s, trend="add", seasonal="add", seasonal_periods=7,
+                               initialization_method="estimated").fit()
+    state, head = propagate(state_from_fit(fit, 7), s.values[:60])
+    state, tail = propagate(state, s.values[60:])
+
+    np.testing.assert_allclose(np.r_[head, tail], fit.fittedvalues.values, atol=1e-8)
+    np.testing.assert_allclose(forecast_from_state(state, 10), fit.forecast(10).values, atol=1e-8)
+
+
+def test_rolling_origin_backtest_folds():
+    from src.backtest import make_cutoffs, run_backtest
+
+    s = _seasonal_series(n_days=120, seed=5)
+    assert make_cutoffs(len(s), horizon=30, n_folds=4, step=7) == [69, 76, 83, 90]
+
+    res = run_backtest(s, horizon=30, n_folds=4, step=7, seasonal_period=7)
+    assert len(res["folds"]) == 12
+    assert set(res["summary"]) == {"moving_average", "ses", "holt_winters"}
+    assert res["best_method"] == "holt_winters"
+
+
+def test_champion_forecast_fits_only_the_champion():
+    from src.forecast_service import ForecastService
+
+    s       = _seasonal_series(n_days=100, seed=6)
+    metrics = {"ses": {"MAE": 3.0, "RMSE": 4.0, "MAPE%": 9.0, "folds": 4}}
+    res     = ForecastService(seasonal_period=7).champion_forecast(s, "ses", metrics, horizon=10)
+
+    assert res["method"] == "auto"
+    assert res["champion"]["method"] == "ses"
+    assert set(res["all_forecasts"]) == {"ses"}
+    assert len(res["forecast"]) == 10
+    assert res["metrics"] == {"ses": {"MAE": 3.0, "RMSE": 4.0, "MAPE%": 9.0}}
+    assert res["alpha"] == res["champion"]["params"]["alpha"]
+
+
+def test_holt_winters_warm_start_and_propagation():
+    from src.forecasting_engine import DemandForecaster
+
+    s      = _seasonal_series(n_days=140, seed=7)
+    engine = DemandForecaster(seasonal_period=7)
+    base   = engine.holt_winters_forecast(s.iloc[:-7], horizon=7)
+
+    # No new data: propagating the stored state reproduces the fit
+    same = engine.holt_winters_from_state(s.iloc[:-7], base["state"], horizon=7)
+    np.testing.assert_allclose(same["forecast"].values, base["forecast"].values, atol=1e-8)
+
+    cold = engine.holt_winters_forecast(s, horizon=7)
+    warm = engine.holt_winters_forecast(s, horizon=7, start_state=base["state"])
+    assert np.abs(warm["forecast"].values - cold["forecast"].values).max() < 0.5
+
+
+def test_closed_form_intervals_and_quantiles():
+    from src import intervals
+    from src.forecasting_engine import DemandForecaster
+
+    # SES: Var(e_h) = sigma² (1 + (h-1) alpha²)
+    w = intervals.error_weights(0.3, None, None, None, 5)
+    np.testing.assert_allclose(intervals.step_variance(w)[0], 1 + np.arange(5) * 0.09)
+
+    engine = DemandForecaster(seasonal_period=7)
+    res    = engine.holt_winters_forecast(_seasonal_series(n_days=140, seed=3), horizon=14)
+    width  = (res["ci_upper"] - res["ci_lower"]).values
+    assert (np.diff(width) >= -1e-9).all() and width[-1] > width[0]
+
+    q = engine.quantile_forecast(res, [0.1, 0.5, 0.9])
+    assert (q[0.1] <= q[0.5]).all() and (q[0.5] <= q[0.9]).all()
+    restock = engine.service_level_restock(res, current_stock=0, lead_time_days=7, service_level=0.95)
+    assert restock["recommended_order_qty"] >= round(res["forecast"].sum())
+
+
+def test_store_order_allocation_respects_budget_and_capacity():
+    from src.inventory_plan import allocate, order_levels
+
+    fc    = np.full((3, 10), 10.0)
+    cumv  = np.cumsum(np.ones((3, 10)), axis=1)
+    lv    = order_levels(fc, np.array([1.0, 2.0, 4.0]), cumv, np.array([3, 5, 30]), 0.95)
+    assert (lv["order_up_to"] > lv["demand"]).all()
+    assert (lv["reorder_point"][:2] < lv["order_up_to"][:2]).all()
+    # A lead time beyond the horizon is clipped to it
+    assert lv["reorder_point"][2] == lv["order_up_to"][2]
+
+    want  = np.array([100.0, 80.0, 60.0])
+    stock = np.array([0.0, 20.0, 40.0])
+    price = np.array([1.0, 5.0, 2.0])
+    np.testing.assert_array_equal(allocate(want, stock, lv["demand"], lv["demand_sd"], price, price), want)
+
+    qty = allocate(want, stock, lv["demand"], lv["demand_sd"], price, price, budget=300, capacity=120)
+    assert (qty <= want).all() and (qty * price).sum() <= 300 and qty.sum() <= 120
+    # The most valuable SKU per unit of capacity is served first
+    assert qty[1] == 60
+
+
+def test_compact_forecast_matches_list_format():
+    from src.fast_json import dumps
+    from src.forecast_service import ForecastService, to_compact
+
+    s       = _seasonal_series(n_days=120, seed=5)
+    service = ForecastService()
+    full    = service.full_forecast(s, horizon=14, quantiles=[0.9])
+    compact = service.full_forecast(s, horizon=14, quantiles=[0.9], compact=True)
+
+    assert compact["forecast"]["start"] == full["forecast"][0]["date"]
+    assert list(compact["forecast"]["values"]) == [r["value"] for r in full["forecast"]]
+    assert json.loads(dumps(compact)) == json.loads(dumps(to_compact(full)))
+
+
+def test_include_fits_only_what_it_needs():
+    from src.forecast_service import ForecastService
+
+    s       = _seasonal_series(n_days=120, seed=6)
+    service = ForecastService()
+    full    = service.full_forecast(s, horizon=14)
+
+    fits = []
+    for name in ("moving_average_forecast", "exponential_smoothing_forecast", "holt_winters_forecast"):
+        fn = getattr(service.engine, name)
+        setattr(service.engine, name, lambda *a, _fn=fn, _n=name, **kw: fits.append(_n) or _fn(*a, **kw))
+
+    lean = service.full_forecast(s, horizon=14, include=["forecast", "restock"])
+    assert fits == ["holt_winters_forecast"]
+    assert set(lean) == {"forecast", "ci_upper", "ci_lower", "restock", "method", "horizon", "alpha", "seasonal"}
+    assert lean["forecast"] == full["forecast"]
+    assert lean["restock"] == full["restock"]
+
+
+def test_incremental_decomposition_matches_statsmodels():
+    from statsmodels.tsa.seasonal import seasonal_decompose
+    from src.decomposition import build_state, extend_state, components
+
+    s = _seasonal_series(n_days=150, seed=7)
+    for period in (7, 12):
+        state = build_state(s.iloc[:100], period)
+        for stop in (101, 130, 150):
+            state = extend_state(state, s.iloc[len(state["observed"]):stop].to_numpy())
+        ours = components(state)
+        ref  = seasonal_decompose(s, model="additive", period=period)
+        np.testing.assert_allclose(ours["trend"], ref.trend, equal_nan=True)
+        np.testing.assert_allclose(ours["seasonal"], ref.seasonal)
+        np.testing.assert_allclose(ours["residual"], ref.resid, equal_nan=True)
+
+
+def test_lttb_keeps_extremes_and_endpoints():
+    from src.downsample import lttb_indices, downsample
+
+    rng = np.random.default_rng(8)
+    y   = rng.normal(10, 1, 5000)
+    y[1234], y[4321] = 60, -40
+    idx = lttb_indices(y, 200)
+    assert len(idx) == 200 and idx[0] == 0 and idx[-1] == 4999
+    assert np.all(np.diff(idx) > 0)
+    assert {1234, 4321} <= set(idx.tolist())
+
+    s = _seasonal_series(n_days=400, seed=8)
+    short = downsample(s, 100)
+    assert len(short) == 100 and short.index.is_monotonic_increasing
+    assert len(downsample(s, 1000)) == 400
+
+
+def test_forecast_cache_fingerprint_ttl_lru_and_invalidate(monkeypatch):
+    from src import forecast_cache as fc
+
+    s = _seasonal_series(n_days=30)
+    assert fc.series_fingerprint(s) == fc.series_fingerprint(s.copy())
+    assert fc.series_fingerprint(s) != fc.series_fingerprint(s.where(s.index != s.index[5], s.iloc[5] + 1))
+    assert fc.series_fingerprint(s) != fc.series_fingerprint(s.iloc[:-1])
+
+    now   = [100.0]
+    monkeypatch.setattr(fc.time, "monotonic", lambda: now[0])
+    cache = fc.ForecastCache(maxsize=2, ttl=10)
+    cache.set((1, "a"), "x")
+    cache.set((2, "a"), "y")
+    assert cache.get((1, "a")) == "x"
+    cache.set((3, "a"), "z")                  # evicts (2, "a"), the least recently used
+    assert cache.get((2, "a")) is None
+    cache.invalidate(1)
+    assert cache.get((1, "a")) is None and cache.get((3, "a")) == "z"
+    now[0] += 11
+    assert cache.get((3, "a")) is None and len(cache) == 0
@@ -11,6 +11,7 @@ const METHODS  = [
   { value: 'holt_winters',   label: 'Holt-Winters (Default)' },
   { value: 'ses',            label: 'Exponential Smoothing' },
   { value: 'moving_average', label: 'Moving Average' },
+  { value: 'auto',           label: 'Auto (Best Backtest)' },
 ]
 const SEASONS  = [{ value: 7, label: '7 (Weekly)' }, { value: 30, label: '30 (Monthly)' }, { value: 365, label: '365 (Yearly)' }]
 const HORIZONS = [{ value: 14, label: '14 Days' }, { value: 30, label: '30 Days' }, { value: 60, label: '60 Days' }]